@@ -1,20 +1,18 @@
 import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
-import json
+import sys
 from pathlib import Path
 
+sys.path.append(str(Path(__file__).resolve().parents[1]))  # Raíz del repo (paquete common)
+from common.patch_log import iter_records
+
 # Configuración de rutas (ajusta a tu BASE_DIR si es necesario)
 dataset_path = Path("dataset/multimodal_dataset.jsonl")
 
 def perform_eda(file_path):
-    # 1. Carga de datos
-    data = []
-    with open(file_path, 'r', encoding='utf-8') as f:
-        for line in f:
-            data.append(json.loads(line))
-    
-    df = pd.DataFrame(data)
+    # 1. Carga de datos (con los parches pendientes aplicados)
+    df = pd.DataFrame(list(iter_records(file_path)))
     
     # 2. Feature Engineering para el EDA
     df['char_count'] = df['content'].str.len()
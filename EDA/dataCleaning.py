@@ -1,19 +1,39 @@
 import json
+import sys
 import hashlib
 from pathlib import Path
 
-def deduplicate_news(input_file, output_file):
+sys.path.append(str(Path(__file__).resolve().parents[1]))  # Raíz del repo (paquete common)
+from common.simhash_index import SimHashIndex, simhash
+
+def deduplicate_news(input_file, output_file, near_duplicates=True):
+    """
+    Elimina duplicados exactos (MD5) y, con `near_duplicates`, también los
+    casi-duplicados usando el mismo índice SimHash que los colectores. Los
+    ficheros escritos por los colectores ya llegan limpios; esto queda para
+    datasets antiguos o importados.
+
+    El índice es el persistido junto al fichero de entrada (el que mantienen
+    los colectores): solo se pone al día con lo añadido y se consulta sin
+    escribir en él, así que limpieza e ingesta usan las mismas huellas y la
+    misma distancia. Una noticia se descarta si alguna de las que están a
+    menos de esa distancia ya se ha conservado.
+    """
     input_path = Path(input_file)
     output_path = Path(output_file)
     
     seen_hashes = set()  # Almacena los hashes únicos
+    kept_ids = set()     # IDs conservados (para los casi-duplicados)
     unique_count = 0
     duplicate_count = 0
+    near_count = 0
 
     print(f"--- Iniciando limpieza de: {input_path.name} ---")
 
     with open(input_path, 'r', encoding='utf-8') as f_in, \
          open(output_path, 'w', encoding='utf-8') as f_out:
+        # Índice compartido con los colectores (el del fichero de entrada)
+        near_dups = SimHashIndex(input_path) if near_duplicates else None
         
         for line in f_in:
             if not line.strip(): continue
@@ -25,18 +45,34 @@ def deduplicate_news(input_file, output_file):
             # Generamos un hash MD5 único del contenido
             content_hash = hashlib.md5(content.encode('utf-8')).hexdigest()
             
-            if content_hash not in seen_hashes:
-                # Es la primera vez que vemos este texto, lo guardamos
-                f_out.write(json.dumps(entry, ensure_ascii=False) + "\n")
-                seen_hashes.add(content_hash)
-                unique_count += 1
-            else:
+            if content_hash in seen_hashes:
                 # Es un duplicado (mismo contenido, diferente ID)
                 duplicate_count += 1
+                continue
+
+            aid = entry.get('article_id')
+            if near_dups is not None:
+                fp = near_dups.fingerprint(aid) if aid is not None else None
+                if fp is None:
+                    fp = simhash(content)
+                if any(m in kept_ids for m in near_dups.find_all(fp) if m != str(aid)):
+                    near_count += 1
+                    continue
+
+            # Es la primera vez que vemos este texto, lo guardamos
+            f_out.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            seen_hashes.add(content_hash)
+            if aid is not None:
+                kept_ids.add(str(aid))
+            unique_count += 1
+
+    if near_dups is not None:
+        near_dups.close()
 
     print(f"Proceso finalizado.")
     print(f"Noticias únicas guardadas: {unique_count}")
     print(f"Duplicados eliminados: {duplicate_count}")
+    print(f"Casi-duplicados eliminados: {near_count}")
 
 if __name__ == "__main__":
     # Ajusta las rutas a tu estructura de carpetas
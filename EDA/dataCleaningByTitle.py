@@ -1,22 +1,80 @@
-import pandas as pd
+import json
+import sqlite3
+import hashlib
+import tempfile
 from pathlib import Path
 
-def deduplicate_by_title(input_file, output_file):
+MAX_FINGERPRINTS = 2_000_000  # Huellas en memoria (~150 MB) antes de pasar a disco
+
+def title_fingerprint(title):
+    """Huella de 64 bits del título (con signo, para guardarla como INTEGER de SQLite)."""
+    raw = json.dumps(title, ensure_ascii=False).encode('utf-8')  # None y "" no colisionan
+    return int.from_bytes(hashlib.blake2b(raw, digest_size=8).digest(), 'big', signed=True)
+
+class SeenTitles:
+    """
+    Conjunto de huellas que empieza en memoria y, si supera `max_in_memory`,
+    se vuelca a una tabla SQLite temporal y sigue ahí (memoria constante).
+    """
+
+    def __init__(self, max_in_memory=MAX_FINGERPRINTS):
+        self.max_in_memory = max_in_memory
+        self._mem = set()
+        self._db = None
+        self._tmpdir = None
+
+    def add(self, fp):
+        """Añade la huella. Devuelve False si ya estaba."""
+        if self._db is None:
+            if fp in self._mem:
+                return False
+            self._mem.add(fp)
+            if len(self._mem) > self.max_in_memory:
+                self._spill()
+            return True
+        cur = self._db.execute("INSERT OR IGNORE INTO seen VALUES (?)", (fp,))
+        return cur.rowcount == 1
+
+    def _spill(self):
+        print(f"[*] Más de {self.max_in_memory} títulos: se pasa a un índice en disco")
+        self._tmpdir = tempfile.TemporaryDirectory(prefix="title_dedup_")
+        self._db = sqlite3.connect(Path(self._tmpdir.name) / "seen.sqlite")
+        self._db.execute("PRAGMA journal_mode=OFF")
+        self._db.execute("PRAGMA synchronous=OFF")
+        self._db.execute("CREATE TABLE seen (fp INTEGER PRIMARY KEY)")
+        self._db.executemany("INSERT INTO seen VALUES (?)", ((fp,) for fp in self._mem))
+        self._mem = set()
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._tmpdir.cleanup()
+
+def deduplicate_by_title(input_file, output_file, max_in_memory=MAX_FINGERPRINTS):
+    """
+    Elimina duplicados por título (se conserva el primero) leyendo el JSONL
+    línea a línea: solo se guarda una huella de 8 bytes por título distinto y
+    las noticias únicas se escriben según se leen, sin cargar los cuerpos.
+    """
     if not Path(input_file).exists():
         print("Archivo de entrada no encontrado.")
         return
 
-    # Cargamos el JSONL
-    df = pd.read_json(input_file, lines=True)
-    before = len(df)
+    seen = SeenTitles(max_in_memory)
+    before = after = 0
+    with open(input_file, 'r', encoding='utf-8') as f_in, \
+         open(output_file, 'w', encoding='utf-8') as f_out:
+        for line in f_in:
+            if not line.strip():
+                continue
+            before += 1
 
-    # Eliminamos duplicados por título (Canonicalization)
-    df_cleaned = df.drop_duplicates(subset=['title'], keep='first')
-    after = len(df_cleaned)
+            # Eliminamos duplicados por título (Canonicalization)
+            if seen.add(title_fingerprint(json.loads(line).get('title'))):
+                f_out.write(line if line.endswith('\n') else line + '\n')
+                after += 1
+    seen.close()
 
-    # Guardamos el resultado limpio
-    df_cleaned.to_json(output_file, orient='records', lines=True, force_ascii=False)
-    
     print(f"--- Reporte de Deduplicación ---")
     print(f"Originales: {before}")
     print(f"Únicas: {after}")
@@ -25,4 +83,4 @@ def deduplicate_by_title(input_file, output_file):
 if __name__ == "__main__":
     INPUT = "scraping/data_collection/real_news.jsonl"
     OUTPUT = "scraping/data_collection/real_news_no_duplicates.jsonl"
-    deduplicate_by_title(INPUT, OUTPUT)
\ No newline at end of file
+    deduplicate_by_title(INPUT, OUTPUT)
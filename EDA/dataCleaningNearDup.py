@@ -0,0 +1,287 @@
+"""
+dataCleaningNearDup.py
+----------------------
+Deduplicación de casi-duplicados con MinHash + LSH (banding).
+
+dataCleaning.py solo detecta contenido idéntico byte a byte (MD5) y
+dataCleaningByTitle.py títulos idénticos. Las noticias sindicadas con otra
+firma o pie de página se cuelan. Aquí:
+
+  1. Cada artículo se convierte en un conjunto de shingles (5-gramas de palabras).
+  2. Se calcula su firma MinHash (NUM_PERM permutaciones) en paralelo entre procesos.
+  3. La firma se parte en b bandas de r filas; dos artículos son candidatos si
+     coinciden en alguna banda (LSH), así que no hay comparación todos-contra-todos.
+     (b, r) se eligen minimizando falsos positivos y negativos alrededor del
+     umbral (optimal_bands).
+  4. Los candidatos se verifican con la similitud de Jaccard estimada; si supera
+     el umbral, el artículo se descarta (se conserva el primero, como en los
+     otros scripts de limpieza).
+
+El fichero se procesa en streaming (las líneas que no son JSON válido se
+omiten y se cuentan) y se escribe un informe JSONL con los clusters de
+duplicados encontrados. Las firmas y cubetas de los conservados empiezan en
+memoria y, a partir de MAX_IN_MEMORY artículos, pasan a un SQLite temporal,
+como SeenTitles en dataCleaningByTitle.py.
+"""
+
+import json
+import sqlite3
+import tempfile
+import zlib
+from multiprocessing import Pool
+from pathlib import Path
+
+import numpy as np
+
+NUM_PERM = 128
+SHINGLE_SIZE = 5
+THRESHOLD = 0.8
+# Pesos de optimal_bands: los candidatos se verifican con la firma completa, así que
+# un falso positivo solo cuesta una comparación y un falso negativo, un duplicado colado
+FP_WEIGHT = 0.2
+FN_WEIGHT = 0.8
+BATCH_SIZE = 256
+MAX_IN_MEMORY = 200_000  # Artículos conservados en memoria (~200 MB) antes de pasar a disco
+
+_MERSENNE = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+# Semilla fija: todos los procesos generan las mismas permutaciones
+_rng = np.random.RandomState(1)
+_PERM_A = _rng.randint(1, np.iinfo(np.int64).max, size=NUM_PERM, dtype=np.int64).astype(np.uint64)
+_PERM_B = _rng.randint(0, np.iinfo(np.int64).max, size=NUM_PERM, dtype=np.int64).astype(np.uint64)
+
+
+def shingles(text, k=SHINGLE_SIZE):
+    """Hashes (crc32) de los k-gramas de palabras del texto normalizado."""
+    words = text.lower().split()
+    if len(words) < k:
+        grams = {" ".join(words)}
+    else:
+        grams = {" ".join(words[i:i + k]) for i in range(len(words) - k + 1)}
+    return np.fromiter((zlib.crc32(g.encode("utf-8")) for g in grams), dtype=np.uint64, count=len(grams))
+
+
+def minhash_signature(text):
+    hv = shingles(text)
+    with np.errstate(over="ignore"):
+        phv = ((np.outer(_PERM_A, hv) + _PERM_B[:, None]) % _MERSENNE) & _MAX_HASH
+    return phv.min(axis=1).astype(np.uint32)
+
+
+def _signatures_batch(args):
+    """
+    Trabajo de cada proceso: parsea un lote de líneas y devuelve (línea, id, firma).
+    Las líneas inválidas vuelven como (None, None, None) para contarlas sin abortar.
+    """
+    lines, id_field = args
+    out = []
+    for line in lines:
+        try:
+            data = json.loads(line)
+        except ValueError:
+            out.append((None, None, None))
+            continue
+        if not isinstance(data, dict):
+            out.append((None, None, None))
+            continue
+        content = data.get("content") or ""
+        out.append((line, data.get(id_field), minhash_signature(content) if content.strip() else None))
+    return out
+
+
+def _false_positive_area(threshold, b, r, steps=200):
+    """Probabilidad media de ser candidatos con Jaccard por debajo del umbral."""
+    s = (np.arange(steps) + 0.5) * threshold / steps
+    return float(np.mean(1 - (1 - s ** r) ** b) * threshold)
+
+
+def _false_negative_area(threshold, b, r, steps=200):
+    """Probabilidad media de no ser candidatos con Jaccard por encima del umbral."""
+    s = threshold + (np.arange(steps) + 0.5) * (1 - threshold) / steps
+    return float(np.mean((1 - s ** r) ** b) * (1 - threshold))
+
+
+def optimal_bands(threshold, num_perm=NUM_PERM, fp_weight=FP_WEIGHT, fn_weight=FN_WEIGHT):
+    """
+    Elige (bandas, filas) con b * r <= num_perm que minimizan el área ponderada de
+    falsos positivos (Jaccard < umbral) y falsos negativos (Jaccard >= umbral)
+    de la curva LSH 1 - (1 - s^r)^b, como hace datasketch. No hace falta que b
+    divida a num_perm: las permutaciones sobrantes solo se usan al verificar.
+    """
+    best, best_error = None, float("inf")
+    for b in range(1, num_perm + 1):
+        for r in range(1, num_perm // b + 1):
+            error = (fp_weight * _false_positive_area(threshold, b, r)
+                     + fn_weight * _false_negative_area(threshold, b, r))
+            if error < best_error:
+                best, best_error = (b, r), error
+    return best
+
+
+class LshIndex:
+    """
+    Tablas LSH: una por banda, clave de banda -> todos los conservados con esa
+    clave. Se guardan las listas completas (no solo el primero de cada cubeta),
+    así un artículo se compara con todos los que colisionan con él.
+
+    Guarda también la firma y el id de cada conservado. Todo empieza en memoria
+    y, si se superan `max_in_memory` conservados, se vuelca a un SQLite temporal
+    y sigue ahí (memoria constante).
+    """
+
+    def __init__(self, bands, rows, max_in_memory=MAX_IN_MEMORY):
+        self.bands = bands
+        self.rows = rows
+        self.max_in_memory = max_in_memory
+        self.tables = [dict() for _ in range(bands)]
+        self._kept = []                       # idx -> (firma, id)
+        self._size = 0
+        self._db = None
+        self._tmpdir = None
+
+    def keys(self, sig):
+        r = self.rows
+        return [hash(sig[i * r:(i + 1) * r].tobytes()) for i in range(self.bands)]
+
+    def candidates(self, keys):
+        if self._db is None:
+            found = set()
+            for table, k in zip(self.tables, keys):
+                found.update(table.get(k, ()))
+            return found
+        found = set()
+        for band, k in enumerate(keys):
+            found.update(idx for (idx,) in self._db.execute(
+                "SELECT idx FROM buckets WHERE band = ? AND key = ?", (band, k)))
+        return found
+
+    def add(self, keys, sig, item_id=None):
+        """Registra un conservado y devuelve su índice."""
+        idx = self._size
+        self._size += 1
+        if self._db is None:
+            self._kept.append((sig, item_id))
+            for table, k in zip(self.tables, keys):
+                table.setdefault(k, []).append(idx)
+            if self._size > self.max_in_memory:
+                self._spill()
+            return idx
+        self._db.execute("INSERT INTO kept VALUES (?, ?, ?)", (idx, sig.tobytes(), json.dumps(item_id)))
+        self._db.executemany("INSERT INTO buckets VALUES (?, ?, ?)",
+                             ((band, k, idx) for band, k in enumerate(keys)))
+        return idx
+
+    def signature(self, idx):
+        if self._db is None:
+            return self._kept[idx][0]
+        row = self._db.execute("SELECT sig FROM kept WHERE idx = ?", (idx,)).fetchone()
+        return np.frombuffer(row[0], dtype=np.uint32)
+
+    def item_id(self, idx):
+        if self._db is None:
+            return self._kept[idx][1]
+        return json.loads(self._db.execute("SELECT item_id FROM kept WHERE idx = ?", (idx,)).fetchone()[0])
+
+    def __len__(self):
+        return self._size
+
+    def _spill(self):
+        print(f"[*] Más de {self.max_in_memory} artículos conservados: se pasa a un índice en disco")
+        self._tmpdir = tempfile.TemporaryDirectory(prefix="near_dedup_")
+        self._db = sqlite3.connect(Path(self._tmpdir.name) / "lsh.sqlite")
+        self._db.execute("PRAGMA journal_mode=OFF")
+        self._db.execute("PRAGMA synchronous=OFF")
+        self._db.execute("CREATE TABLE kept (idx INTEGER PRIMARY KEY, sig BLOB, item_id TEXT)")
+        self._db.execute("CREATE TABLE buckets (band INTEGER, key INTEGER, idx INTEGER)")
+        self._db.executemany("INSERT INTO kept VALUES (?, ?, ?)",
+                             ((i, sig.tobytes(), json.dumps(item_id)) for i, (sig, item_id) in enumerate(self._kept)))
+        self._db.executemany("INSERT INTO buckets VALUES (?, ?, ?)",
+                             ((band, k, idx) for band, table in enumerate(self.tables)
+                              for k, members in table.items() for idx in members))
+        self._db.execute("CREATE INDEX buckets_key ON buckets(band, key)")
+        self._kept = []
+        self.tables = [dict() for _ in range(self.bands)]
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._tmpdir.cleanup()
+
+
+def _read_batches(path, batch_size):
+    batch = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            batch.append(line)
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+    if batch:
+        yield batch
+
+
+def deduplicate_near(input_file, output_file, report_file, threshold=THRESHOLD,
+                     id_field="article_id", processes=None, batch_size=BATCH_SIZE,
+                     max_in_memory=MAX_IN_MEMORY):
+    input_path = Path(input_file)
+    bands, rows = optimal_bands(threshold)
+    lsh = LshIndex(bands, rows, max_in_memory)
+    clusters = {}                             # índice del representante -> [(id, similitud)]
+    total = invalid = 0
+
+    print(f"--- Deduplicación MinHash/LSH de: {input_path.name} ---")
+    print(f"Umbral Jaccard: {threshold} -> {bands} bandas x {rows} filas "
+          f"(umbral LSH ~{(1 / bands) ** (1 / rows):.2f})")
+
+    with Pool(processes) as pool, open(output_file, "w", encoding="utf-8") as f_out:
+        batches = ((lines, id_field) for lines in _read_batches(input_path, batch_size))
+        # imap conserva el orden del fichero: "se queda el primero" es determinista
+        for results in pool.imap(_signatures_batch, batches):
+            for line, article_id, sig in results:
+                if line is None:
+                    invalid += 1
+                    continue
+                total += 1
+                if sig is None:
+                    f_out.write(line)
+                    continue
+
+                keys = lsh.keys(sig)
+                best, best_sim = None, 0.0
+                for c in lsh.candidates(keys):
+                    sim = float(np.mean(lsh.signature(c) == sig))
+                    if sim > best_sim:
+                        best, best_sim = c, sim
+
+                if best is not None and best_sim >= threshold:
+                    clusters.setdefault(best, []).append((article_id, round(best_sim, 3)))
+                    continue
+
+                lsh.add(keys, sig, article_id)
+                f_out.write(line)
+
+    with open(report_file, "w", encoding="utf-8") as f_rep:
+        for idx, dups in clusters.items():
+            f_rep.write(json.dumps({
+                "kept": lsh.item_id(idx),
+                "duplicates": [{"id": d, "similarity": s} for d, s in dups],
+            }, ensure_ascii=False) + "\n")
+    lsh.close()
+
+    removed = sum(len(d) for d in clusters.values())
+    print("Proceso finalizado.")
+    print(f"Noticias analizadas: {total}")
+    print(f"Noticias conservadas: {total - removed}")
+    print(f"Casi-duplicados eliminados: {removed} en {len(clusters)} clusters")
+    if invalid:
+        print(f"Líneas inválidas omitidas: {invalid}")
+    print(f"Informe de clusters: {report_file}")
+
+
+if __name__ == "__main__":
+    INPUT = "scraping/data_collection/real_news.jsonl"
+    OUTPUT = "scraping/data_collection/real_news_near_dedup.jsonl"
+    REPORT = "scraping/data_collection/near_duplicate_clusters.jsonl"
+    deduplicate_near(INPUT, OUTPUT, REPORT, threshold=THRESHOLD)
@@ -1,9 +1,12 @@
-import json
 import re
+import sys
 from collections import Counter
 from pathlib import Path
 import pandas as pd
 
+sys.path.append(str(Path(__file__).resolve().parents[1]))  # Raíz del repo (paquete common)
+from common.patch_log import iter_records
+
 
 def analyze_artifacts(file_path):
     real_chars = Counter()
@@ -12,20 +15,18 @@ def analyze_artifacts(file_path):
     # Patrón para caracteres no alfanuméricos (excluyendo espacios)
     pattern = re.compile(r'[^a-zA-Z0-9\s]')
 
-    with open(file_path, 'r', encoding='utf-8') as f:
-        for line in f:
-            obj = json.loads(line)
-            content = obj['content']
-            
-            # Buscamos secuencias específicas como \n\n, espacios dobles, etc.
-            escapes = re.findall(r'\\n|\\t|\s{2,}', content)
-            
-            if obj['is_real'] == 1:
-                real_chars.update(pattern.findall(content))
-                real_chars.update(escapes)
-            else:
-                ai_chars.update(pattern.findall(content))
-                ai_chars.update(escapes)
+    for obj in iter_records(file_path):
+        content = obj['content']
+        
+        # Buscamos secuencias específicas como \n\n, espacios dobles, etc.
+        escapes = re.findall(r'\\n|\\t|\s{2,}', content)
+        
+        if obj['is_real'] == 1:
+            real_chars.update(pattern.findall(content))
+            real_chars.update(escapes)
+        else:
+            ai_chars.update(pattern.findall(content))
+            ai_chars.update(escapes)
 
     # Creamos un DataFrame para comparar
     df_real = pd.DataFrame.from_dict(real_chars, orient='index', columns=['Real'])
@@ -1,4 +1,4 @@
-import json
+import sys
 import torch
 import pandas as pd
 import seaborn as sns
@@ -7,6 +7,9 @@ from transformers import GPT2LMHeadModel, GPT2Tokenizer
 from tqdm import tqdm
 from pathlib import Path
 
+sys.path.append(str(Path(__file__).resolve().parents[1]))  # Raíz del repo (paquete common)
+from common.patch_log import iter_records
+
 # --- CONFIGURACIÓN DE RUTAS ---
 DATASET_PATH = Path("dataset/multimodal_dataset.jsonl")
 MODEL_ID = "gpt2" # Modelo estándar para medir entropía/perplejidad
@@ -33,12 +36,8 @@ def main():
         return
 
     print(f"[*] Cargando dataset desde {DATASET_PATH}...")
-    data = []
-    with open(DATASET_PATH, 'r', encoding='utf-8') as f:
-        for line in f:
-            data.append(json.loads(line))
-    
-    df = pd.DataFrame(data)
+    # Con los parches pendientes aplicados (imágenes y descripciones rellenadas después)
+    df = pd.DataFrame(list(iter_records(DATASET_PATH)))
     # Mapeo de labels para el gráfico
     df['label'] = df['is_real'].map({1: "Real", 0: "AI"})
 
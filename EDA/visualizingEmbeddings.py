@@ -1,23 +1,24 @@
 import pandas as pd
 import numpy as np
-import json
+import sys
 from pathlib import Path
 from sentence_transformers import SentenceTransformer
 from sklearn.manifold import TSNE
 import matplotlib.pyplot as plt
 import seaborn as sns
 
+sys.path.append(str(Path(__file__).resolve().parents[1]))  # Raíz del repo (paquete common)
+from common.patch_log import iter_records
+
 # 1. Configuración de rutas
 DATASET_PATH = Path("dataset/multimodal_dataset.jsonl")
 
 def visualize_semantic_space():
     # Cargar datos
     texts, labels = [], []
-    with open(DATASET_PATH, 'r', encoding='utf-8') as f:
-        for line in f:
-            obj = json.loads(line)
-            texts.append(obj['content'])
-            labels.append('Real' if obj['is_real'] == 1 else 'AI (Synthetic)')
+    for obj in iter_records(DATASET_PATH):
+        texts.append(obj['content'])
+        labels.append('Real' if obj['is_real'] == 1 else 'AI (Synthetic)')
 
     print(f"Generando embeddings para {len(texts)} textos...")
     
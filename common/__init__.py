@@ -0,0 +1 @@
+"""Utilidades compartidas por los scripts de scraping, generación y EDA."""
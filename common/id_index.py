@@ -0,0 +1,122 @@
+"""
+id_index.py
+-----------
+Índice persistente (SQLite) de los IDs presentes en un fichero JSONL.
+
+Sustituye al patrón `{json.loads(line)[key] for line in f}` que relee todo el
+dataset en cada arranque. El índice vive junto al JSONL (<nombre>.ids.sqlite) y
+guarda hasta qué byte del fichero está sincronizado:
+
+  - Si el JSONL ha crecido (appends de este u otro script) solo se lee el delta.
+  - Si el índice no existe, o el JSONL ha encogido o se ha reescrito (cambia su
+    cabecera o el final de lo ya indexado), se reconstruye entero automáticamente.
+
+Se usa como un set: `aid in index`, `index.add(aid)`, `len(index)`. Los IDs
+añadidos con add() solo se confirman en close(); si el proceso muere antes, se
+recuperan leyendo el delta del JSONL, así el índice nunca contiene un ID cuyo
+registro no llegó a disco.
+"""
+
+import hashlib
+import json
+import sqlite3
+from pathlib import Path
+
+HEAD_BYTES = 4096  # Bytes de cabecera usados para detectar reescrituras
+TAIL_BYTES = 256   # Bytes justo antes de la marca de agua (detectan desplazamientos)
+
+
+def file_fingerprint(path, offset):
+    """
+    Hash de la parte ya indexada: su cabecera (como mucho HEAD_BYTES) y los
+    TAIL_BYTES anteriores a `offset`. Cambia si el fichero se reescribe (aunque
+    conserve el principio, p.ej. al quitar una línea intermedia), no si solo crece.
+    """
+    with open(path, "rb") as f:
+        digest = hashlib.sha1(f.read(min(HEAD_BYTES, offset)))
+        f.seek(max(0, offset - TAIL_BYTES))
+        digest.update(f.read(min(TAIL_BYTES, offset)))
+    return digest.hexdigest()
+
+
+class IdIndex:
+    def __init__(self, jsonl_path, key):
+        self.jsonl_path = Path(jsonl_path)
+        self.key = key
+        self.index_path = self.jsonl_path.with_suffix(".ids.sqlite")
+        self._db = sqlite3.connect(self.index_path)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS ids  (id TEXT PRIMARY KEY) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS meta (k TEXT PRIMARY KEY, v TEXT);
+        """)
+        self.sync()
+
+    # ── Sincronización con el JSONL ─────────────────────────────────
+    def _meta(self, k):
+        row = self._db.execute("SELECT v FROM meta WHERE k = ?", (k,)).fetchone()
+        return row[0] if row else None
+
+    def _is_stale(self, size):
+        offset = int(self._meta("offset") or 0)
+        if self._meta("key") != self.key or size < offset:
+            return True
+        if offset and self._meta("head") != file_fingerprint(self.jsonl_path, offset):
+            return True
+        return False
+
+    def sync(self):
+        """Pone el índice al día con el JSONL (delta o reconstrucción completa)."""
+        if not self.jsonl_path.exists():
+            self._reset()
+            self._db.commit()
+            return
+        size = self.jsonl_path.stat().st_size
+        if self._is_stale(size):
+            print(f"[*] Reconstruyendo índice de IDs para {self.jsonl_path.name}...")
+            self._reset()
+        offset = int(self._meta("offset") or 0)
+        if offset >= size:
+            return
+
+        with open(self.jsonl_path, "rb") as f:
+            f.seek(offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break  # Línea a medio escribir: se reintenta en el próximo sync
+                offset += len(line)
+                try:
+                    value = json.loads(line)[self.key]
+                except (ValueError, KeyError, TypeError):
+                    continue
+                self._db.execute("INSERT OR IGNORE INTO ids VALUES (?)", (str(value),))
+
+        self._set_meta(offset=offset, head=file_fingerprint(self.jsonl_path, offset), key=self.key)
+        self._db.commit()
+
+    def _reset(self):
+        self._db.execute("DELETE FROM ids")
+        self._db.execute("DELETE FROM meta")
+
+    def _set_meta(self, **values):
+        self._db.executemany("INSERT OR REPLACE INTO meta VALUES (?, ?)",
+                             [(k, str(v)) for k, v in values.items()])
+
+    # ── Interfaz tipo set ───────────────────────────────────────────
+    def __contains__(self, value):
+        if value is None:
+            return False
+        return self._db.execute("SELECT 1 FROM ids WHERE id = ?", (str(value),)).fetchone() is not None
+
+    def add(self, value):
+        """Registra un ID recién añadido al JSONL."""
+        self._db.execute("INSERT OR IGNORE INTO ids VALUES (?)", (str(value),))
+
+    def __len__(self):
+        return self._db.execute("SELECT COUNT(*) FROM ids").fetchone()[0]
+
+    def close(self):
+        """Confirma los IDs añadidos. Llamar después de cerrar el writer del JSONL."""
+        self._db.commit()
+        self._db.close()
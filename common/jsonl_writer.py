@@ -0,0 +1,183 @@
+"""
+jsonl_writer.py
+---------------
+Escritor JSONL con buffer y commit por grupos para colectores y generadores.
+
+En vez de abrir el fichero en modo append por cada registro, `JsonlAppender`
+mantiene el descriptor abierto, acumula grupos de registros (un artículo, o un
+par real + fake) y los vuelca en una sola escritura cuando se alcanza
+`max_records` o han pasado `max_delay` segundos desde el primer grupo pendiente.
+El plazo lo vigila un temporizador, así que un writer que se queda parado
+(esperando a la red, p.ej.) no retiene registros en memoria indefinidamente;
+con idle_flush=False solo se comprueba al añadir y al cerrar.
+
+Atomicidad: antes de cada volcado se deja un fichero de intención
+(<fichero>.pending) con el offset inicial, sincronizado a disco junto con su
+directorio (salvo con fsync="never"); se borra al terminar. Si el proceso
+muere a mitad, al reabrir se trunca el JSONL a ese offset, así que nunca queda
+una línea a medias ni un par incompleto (lo que repair_dataset.py arreglaba a
+mano). Como red de seguridad también se recorta cualquier línea final sin '\\n'.
+
+Política de fsync: "flush" (tras cada volcado), "close" (solo al cerrar) o
+"never" (se confía en el sistema operativo). `on_flush` permite guardar
+checkpoints que solo deben avanzar cuando los registros ya están en disco; con
+el temporizador activo puede ejecutarse en su hilo.
+"""
+
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+FSYNC_POLICIES = ("flush", "close", "never")
+
+
+def _truncate_partial_tail(path):
+    """Recorta la última línea si no termina en '\\n' (escritura interrumpida)."""
+    size = path.stat().st_size
+    if size == 0:
+        return
+    with open(path, "rb+") as f:
+        f.seek(size - 1)
+        if f.read(1) == b"\n":
+            return
+        pos = size
+        while pos > 0:
+            step = min(65536, pos)
+            pos -= step
+            f.seek(pos)
+            cut = f.read(step).rfind(b"\n")
+            if cut != -1:
+                pos += cut + 1
+                break
+        print(f"⚠️  {path.name}: descartando {size - pos} bytes de una línea incompleta")
+        f.truncate(pos)
+
+
+def _write_intent(path, text, durable):
+    """Escribe el fichero de intención; con `durable`, sincronizado junto con su directorio."""
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        os.write(fd, text.encode("utf-8"))
+        if durable:
+            os.fsync(fd)
+    finally:
+        os.close(fd)
+    if durable:
+        _fsync_dir(path.parent)
+
+
+def _fsync_dir(directory):
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return  # Sistemas sin fsync de directorios (Windows)
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+class JsonlAppender:
+    def __init__(self, path, max_records=64, max_delay=5.0, fsync="flush", on_flush=None, idle_flush=True):
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"fsync debe ser uno de {FSYNC_POLICIES}")
+        self.path = Path(path)
+        self.intent_path = self.path.with_name(self.path.name + ".pending")
+        self.max_records = max_records
+        self.max_delay = max_delay
+        self.fsync = fsync
+        self.on_flush = on_flush  # Callback tras cada volcado (p.ej. checkpoints)
+        self._buffer = []       # Líneas ya serializadas (bytes)
+        self._first_at = None   # Momento en que entró el primer grupo pendiente
+        self.idle_flush = idle_flush
+        self._timer = None
+        self._lock = threading.RLock()
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._recover()
+        self._fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+
+    def _recover(self):
+        if self.intent_path.exists():
+            start = int(self.intent_path.read_text().strip() or 0)
+            if self.path.exists() and self.path.stat().st_size > start:
+                print(f"⚠️  {self.path.name}: deshaciendo un volcado interrumpido")
+                os.truncate(self.path, start)
+            self.intent_path.unlink()
+        if self.path.exists():
+            _truncate_partial_tail(self.path)
+
+    def append(self, *records):
+        """Añade un grupo de registros que se escribirá entero o no se escribirá."""
+        data = b"".join((json.dumps(r, ensure_ascii=False) + "\n").encode("utf-8") for r in records)
+        with self._lock:
+            self._buffer.append(data)
+            if self._first_at is None:
+                self._first_at = time.monotonic()
+                self._arm_timer()
+            if len(self._buffer) >= self.max_records or self._due():
+                self.flush()
+
+    def _due(self):
+        return self._first_at is not None and time.monotonic() - self._first_at >= self.max_delay
+
+    def _arm_timer(self):
+        if not self.idle_flush or self._timer is not None:
+            return
+        self._timer = threading.Timer(self.max_delay, self._on_timer)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _on_timer(self):
+        with self._lock:
+            self._timer = None
+            if self._fd is None:
+                return
+            if self._due():
+                self.flush()
+            elif self._buffer:
+                self._arm_timer()  # Se vació y volvió a llenarse entretanto
+
+    def flush(self):
+        with self._lock:
+            if not self._buffer:
+                return
+            data = b"".join(self._buffer)
+            durable = self.fsync != "never"
+            _write_intent(self.intent_path, str(os.fstat(self._fd).st_size), durable)
+            view = memoryview(data)
+            while view:
+                view = view[os.write(self._fd, view):]
+            if self.fsync == "flush":
+                os.fsync(self._fd)
+            self.intent_path.unlink()
+            if self.fsync == "flush":
+                # Si el borrado no llega a disco, al reabrir se desharía un volcado ya completo
+                _fsync_dir(self.path.parent)
+            self._buffer.clear()
+            self._first_at = None
+            if self.on_flush:
+                self.on_flush()
+
+    def close(self):
+        with self._lock:
+            if self._fd is None:
+                return
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            self.flush()
+            if self.fsync == "close":
+                os.fsync(self._fd)
+            os.close(self._fd)
+            self._fd = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
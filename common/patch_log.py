@@ -0,0 +1,107 @@
+"""
+patch_log.py
+------------
+Log de parches (append-only) sobre un JSONL de pares, para no reescribir el
+dataset entero cada vez que se rellenan unos pocos campos.
+
+Los cambios de un registro ya escrito (p.ej. el image_path de la fake que
+rellena ImageBackfiller) se añaden a <nombre>.patches.jsonl:
+
+    {"group_id": "...", "is_real": 0, "set": {"image_path": "..."}}
+
+  - iter_records() lee el JSONL base y aplica los parches al vuelo (gana el
+    último parche de cada clave group_id + is_real).
+  - compact() vuelca los parches en el fichero base (reescritura atómica) y
+    vacía el log. Se lanza de vez en cuando, no en cada ejecución:
+
+        python -m common.patch_log dataset/multimodal_dataset.jsonl
+
+Aplicar un parche es idempotente, así que si compact() se interrumpe entre la
+reescritura y el borrado del log no se pierde ni se duplica nada.
+"""
+
+import argparse
+import json
+from pathlib import Path
+
+from common.jsonl_writer import JsonlAppender
+
+
+def patch_path(jsonl_path):
+    return Path(jsonl_path).with_suffix(".patches.jsonl")
+
+
+def _key(record):
+    return record["group_id"], int(record["is_real"])
+
+
+def append_patches(jsonl_path, patches):
+    """Añade parches [(group_id, is_real, {campo: valor})] en un solo volcado atómico."""
+    records = [{"group_id": gid, "is_real": int(is_real), "set": fields} for gid, is_real, fields in patches]
+    if not records:
+        return 0
+    with JsonlAppender(patch_path(jsonl_path)) as log:
+        log.append(*records)
+    return len(records)
+
+
+def load_patches(jsonl_path):
+    """{(group_id, is_real): campos} con todos los parches fusionados en orden."""
+    merged = {}
+    path = patch_path(jsonl_path)
+    if not path.exists():
+        return merged
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            patch = json.loads(line)
+            merged.setdefault(_key(patch), {}).update(patch["set"])
+    return merged
+
+
+def iter_records(jsonl_path):
+    """Registros del JSONL base con los parches aplicados."""
+    patches = load_patches(jsonl_path)
+    with open(jsonl_path, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            fields = patches.get(_key(record))
+            if fields:
+                record.update(fields)
+            yield record
+
+
+def compact(jsonl_path):
+    """Aplica el log al fichero base y lo vacía. Devuelve el nº de registros parcheados."""
+    jsonl_path = Path(jsonl_path)
+    log = patch_path(jsonl_path)
+    patches = load_patches(jsonl_path)
+    if not patches:
+        log.unlink(missing_ok=True)
+        return 0
+
+    tmp = jsonl_path.with_suffix(".tmp")
+    with open(jsonl_path, "r", encoding="utf-8") as f_in, open(tmp, "w", encoding="utf-8") as f_out:
+        for line in f_in:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            fields = patches.get(_key(record))
+            if fields:
+                record.update(fields)
+                line = json.dumps(record, ensure_ascii=False) + "\n"
+            f_out.write(line)
+    tmp.replace(jsonl_path)
+    log.unlink()
+    return len(patches)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compacta el log de parches de un JSONL")
+    parser.add_argument("jsonl", type=Path)
+    args = parser.parse_args()
+    n = compact(args.jsonl)
+    print(f"✅ Compactación de {args.jsonl.name}: {n} registros parcheados")
@@ -0,0 +1,241 @@
+"""
+simhash_index.py
+----------------
+Índice persistente (SQLite) de huellas SimHash del contenido de un JSONL.
+
+Permite rechazar casi-duplicados (misma noticia con otra firma, pie o entradilla)
+en el momento de la ingesta, antes de escribirlos, en lugar de limpiar el
+fichero entero a posteriori.
+
+  - simhash(text): huella de 64 bits de los 3-gramas de palabras del texto.
+    Textos parecidos dan huellas a poca distancia de Hamming.
+  - Búsqueda con tablas permutadas (Manku et al.): la huella se parte en
+    max_distance + t bloques. Si dos huellas difieren en <= max_distance bits,
+    al menos t bloques coinciden exactamente (palomar), así que hay una tabla
+    por cada combinación de t bloques, indexada por esos bloques concatenados,
+    y basta consultar por igualdad cada tabla y verificar los candidatos. t es
+    el menor que da claves de al menos MIN_KEY_BITS bits: con max_distance=5,
+    7 bloques y 21 tablas de claves de ~18 bits (con un bloque por tabla serían
+    ~11 bits y en un corpus grande cada consulta traería miles de candidatos).
+
+Se sincroniza con el JSONL igual que IdIndex (<nombre>.simhash.sqlite): lee
+solo el delta, se reconstruye si el fichero se reescribe, y lo añadido con
+add() se confirma en close().
+"""
+
+import hashlib
+import json
+import re
+import sqlite3
+from collections import Counter
+from itertools import combinations
+from pathlib import Path
+
+from common.id_index import file_fingerprint
+
+FP_BITS = 64
+SHINGLE_SIZE = 3
+MAX_DISTANCE = 5   # Bits de diferencia tolerados (con 64 bits, dos textos sin relación difieren en ~32)
+MIN_KEY_BITS = 16  # Anchura mínima de la clave de cada tabla permutada
+
+
+def simhash(text, k=SHINGLE_SIZE):
+    """Huella SimHash (int de 64 bits) del texto, o None si no tiene palabras."""
+    words = re.findall(r"\w+", (text or "").lower())
+    if not words:
+        return None
+    grams = Counter(" ".join(words[i:i + k]) for i in range(max(1, len(words) - k + 1)))
+    weights = [0] * FP_BITS
+    for gram, w in grams.items():
+        h = int.from_bytes(hashlib.blake2b(gram.encode("utf-8"), digest_size=8).digest(), "big")
+        for i in range(FP_BITS):
+            weights[i] += w if (h >> i) & 1 else -w
+    return sum(1 << i for i, v in enumerate(weights) if v > 0)
+
+
+def hamming(a, b):
+    return bin(a ^ b).count("1")
+
+
+def _blocks(fp, n):
+    """Parte la huella en n bloques contiguos (los primeros, un bit más anchos si no es exacto)."""
+    out, start = [], 0
+    for t in range(n):
+        width = FP_BITS // n + (1 if t < FP_BITS % n else 0)
+        out.append(((fp >> start) & ((1 << width) - 1), width))
+        start += width
+    return out
+
+
+def table_layout(max_distance, min_key_bits=MIN_KEY_BITS):
+    """(nº de bloques, combinaciones de bloques que forman cada tabla)."""
+    t = 1
+    while FP_BITS * t // (max_distance + t) < min_key_bits and max_distance + t < FP_BITS:
+        t += 1
+    n = max_distance + t
+    return n, list(combinations(range(n), t))
+
+
+def _table_keys(fp, n, tables):
+    """Clave de la huella en cada tabla: sus bloques de esa combinación concatenados."""
+    blocks = _blocks(fp, n)
+    keys = []
+    for combo in tables:
+        key = 0
+        for i in combo:
+            value, width = blocks[i]
+            key = (key << width) | value
+        keys.append(key)
+    return keys
+
+
+def _to_sql(fp):
+    return fp - (1 << FP_BITS) if fp >= 1 << (FP_BITS - 1) else fp  # INTEGER de SQLite es con signo
+
+
+def _from_sql(v):
+    return v + (1 << FP_BITS) if v < 0 else v
+
+
+class SimHashIndex:
+    def __init__(self, jsonl_path, key="article_id", field="content", max_distance=MAX_DISTANCE):
+        self.jsonl_path = Path(jsonl_path)
+        self.key = key
+        self.field = field
+        self.max_distance = max_distance
+        self.n_blocks, self.tables = table_layout(max_distance)
+        # Si cambia, el índice se reconstruye
+        self._config = f"{key}:{field}:{max_distance}:{self.n_blocks}x{len(self.tables[0])}"
+        self.index_path = self.jsonl_path.with_suffix(".simhash.sqlite")
+        self._db = sqlite3.connect(self.index_path)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS fps    (id TEXT PRIMARY KEY, fp INTEGER) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS blocks (tbl INTEGER, block INTEGER, fp INTEGER,
+                                               PRIMARY KEY (tbl, block, fp)) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS meta   (k TEXT PRIMARY KEY, v TEXT);
+            CREATE INDEX IF NOT EXISTS fps_fp ON fps (fp);
+        """)
+        self.rejected = 0
+        self.sync()
+
+    # ── Sincronización con el JSONL ─────────────────────────────────
+    def _meta(self, k):
+        row = self._db.execute("SELECT v FROM meta WHERE k = ?", (k,)).fetchone()
+        return row[0] if row else None
+
+    def _is_stale(self, size):
+        offset = int(self._meta("offset") or 0)
+        if self._meta("config") != self._config or size < offset:
+            return True
+        if offset and self._meta("head") != file_fingerprint(self.jsonl_path, offset):
+            return True
+        return False
+
+    def sync(self):
+        """Pone el índice al día con el JSONL (delta o reconstrucción completa)."""
+        if not self.jsonl_path.exists():
+            self._reset()
+            self._set_meta(offset=0, config=self._config)
+            self._db.commit()
+            return
+        size = self.jsonl_path.stat().st_size
+        stale = self._is_stale(size)
+        if stale:
+            print(f"[*] Reconstruyendo índice SimHash para {self.jsonl_path.name}...")
+            self._reset()
+        offset = int(self._meta("offset") or 0)
+        if offset >= size and not stale:
+            return
+
+        with open(self.jsonl_path, "rb") as f:
+            f.seek(offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break  # Línea a medio escribir: se reintenta en el próximo sync
+                offset += len(line)
+                try:
+                    data = json.loads(line)
+                    value = data[self.key]
+                except (ValueError, KeyError, TypeError):
+                    continue
+                if value is None:
+                    continue
+                value = str(value)
+                # Lo añadido con add() en la sesión anterior ya tiene huella: no se recalcula
+                if self._db.execute("SELECT 1 FROM fps WHERE id = ?", (value,)).fetchone():
+                    continue
+                fp = simhash(data.get(self.field))
+                if fp is not None:
+                    self.add(value, fp)
+
+        self._set_meta(offset=offset, head=file_fingerprint(self.jsonl_path, offset), config=self._config)
+        self._db.commit()
+
+    def _reset(self):
+        self._db.execute("DELETE FROM fps")
+        self._db.execute("DELETE FROM blocks")
+        self._db.execute("DELETE FROM meta")
+
+    def _set_meta(self, **values):
+        self._db.executemany("INSERT OR REPLACE INTO meta VALUES (?, ?)",
+                             [(k, str(v)) for k, v in values.items()])
+
+    # ── Consultas ───────────────────────────────────────────────────
+    def _close_fps(self, fp):
+        """Huellas del índice a <= max_distance bits de `fp`, de la más cercana a la más lejana."""
+        candidates = set()
+        for tbl, block in enumerate(_table_keys(fp, self.n_blocks, self.tables)):
+            rows = self._db.execute("SELECT fp FROM blocks WHERE tbl = ? AND block = ?", (tbl, _to_sql(block)))
+            candidates.update(_from_sql(r[0]) for r in rows)
+        close = [c for c in candidates if hamming(fp, c) <= self.max_distance]
+        return sorted(close, key=lambda c: hamming(fp, c))
+
+    def find(self, fp):
+        """ID de un registro a <= max_distance bits de `fp`, o None."""
+        if fp is None:
+            return None
+        for c in self._close_fps(fp)[:1]:
+            row = self._db.execute("SELECT id FROM fps WHERE fp = ?", (_to_sql(c),)).fetchone()
+            return row[0] if row else None
+        return None
+
+    def find_all(self, fp):
+        """IDs de todos los registros a <= max_distance bits de `fp`."""
+        if fp is None:
+            return []
+        return [row[0] for c in self._close_fps(fp)
+                for row in self._db.execute("SELECT id FROM fps WHERE fp = ?", (_to_sql(c),))]
+
+    def fingerprint(self, value):
+        """Huella ya indexada del registro `value`, o None."""
+        row = self._db.execute("SELECT fp FROM fps WHERE id = ?", (str(value),)).fetchone()
+        return _from_sql(row[0]) if row else None
+
+    def is_near_duplicate(self, text):
+        """Calcula la huella del texto. Devuelve (ID del casi-duplicado o None, huella)."""
+        fp = simhash(text)
+        match = self.find(fp)
+        if match is not None:
+            self.rejected += 1
+        return match, fp
+
+    def add(self, value, fp):
+        """Registra la huella de un registro recién añadido al JSONL."""
+        if value is None:
+            raise ValueError("SimHashIndex.add necesita un ID (se recibió None)")
+        if fp is None:
+            return
+        self._db.execute("INSERT OR IGNORE INTO fps VALUES (?, ?)", (str(value), _to_sql(fp)))
+        keys = _table_keys(fp, self.n_blocks, self.tables)
+        self._db.executemany("INSERT OR IGNORE INTO blocks VALUES (?, ?, ?)",
+                             [(t, _to_sql(k), _to_sql(fp)) for t, k in enumerate(keys)])
+
+    def __len__(self):
+        return self._db.execute("SELECT COUNT(*) FROM fps").fetchone()[0]
+
+    def close(self):
+        """Confirma las huellas añadidas. Llamar después de cerrar el writer del JSONL."""
+        self._db.commit()
+        self._db.close()
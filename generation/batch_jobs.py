@@ -0,0 +1,313 @@
+"""
+batch_jobs.py
+-------------
+Modo por lotes diferido (batch jobs) para las etapas de Gemini.
+
+En lugar de miles de llamadas interactivas, las peticiones pendientes se
+serializan en un fichero de trabajo JSONL (una línea por group_id), se envían
+de una vez y se recogen los resultados cuando el trabajo termina:
+
+    {"key": "<group_id>", "request": {"contents": [...], "generation_config": {...}}}
+
+  1. submit() escribe JOBS_DIR/<nombre>.requests.jsonl (en trozos de JOB_SIZE
+     peticiones) y su manifiesto <nombre>.json con las claves que contiene
+     ANTES de enviarlo; después guarda en él el id del trabajo en el backend.
+     El nombre lleva un sufijo aleatorio: dos envíos en el mismo segundo no
+     chocan.
+  2. wait() consulta el estado cada `poll_interval` segundos, como mucho
+     `timeout` segundos; si vence devuelve RUNNING y el trabajo sigue
+     pendiente para la próxima ejecución.
+  3. results() devuelve {group_id: respuesta validada con el esquema, o None}.
+  4. El llamante fusiona por group_id (el par real + fake en un solo volcado)
+     y marca el manifiesto como fusionado con mark_merged().
+
+Si el proceso muere con trabajos enviados, pending() devuelve los manifiestos
+sin fusionar para retomarlos en la siguiente ejecución en vez de reenviarlos.
+Si murió entre el envío y guardar el id, attach() busca el trabajo en el
+backend por su nombre y solo lo envía si de verdad no llegó.
+
+Backends (mismo interfaz: submit / find / state / download):
+  - GeminiBatchBackend: Batch API de Gemini (`client.batches`), más barata que
+    las llamadas interactivas y sin sus rate limits.
+  - LocalBatchBackend: sustituto en disco para probar el flujo sin red. Resuelve
+    cada petición con un cliente compatible (`client.models.generate_content`)
+    o, sin cliente, con una respuesta de relleno válida para el esquema.
+
+GEMINI_BATCH_BACKEND=local hace que default_backend() use el local.
+"""
+
+import json
+import os
+import shutil
+import time
+import uuid
+from pathlib import Path
+
+JOBS_DIR = Path(__file__).resolve().parents[1] / "dataset" / "batch_jobs"
+JOB_SIZE = 2000             # Peticiones por fichero de trabajo
+POLL_INTERVAL = 60          # s entre consultas de estado
+WAIT_TIMEOUT = 48 * 3600    # s máximos de wait() (la Batch API promete < 24 h)
+
+SUBMITTING, RUNNING, SUCCEEDED, FAILED = "SUBMITTING", "RUNNING", "SUCCEEDED", "FAILED"
+
+
+def build_request(key, prompt, schema, max_output_tokens):
+    """Línea del fichero de trabajo: petición con salida JSON según `schema` (Pydantic)."""
+    return {"key": key, "request": {
+        "contents": [{"role": "user", "parts": [{"text": prompt}]}],
+        "generation_config": {
+            "response_mime_type": "application/json",
+            "response_json_schema": schema.model_json_schema(),
+            "max_output_tokens": max_output_tokens,
+        },
+    }}
+
+
+def response_text(result):
+    """Texto de la primera candidata de una línea de resultados (o None)."""
+    candidates = (result.get("response") or {}).get("candidates") or []
+    if not candidates:
+        return None
+    parts = (candidates[0].get("content") or {}).get("parts") or []
+    return "".join(p.get("text", "") for p in parts) or None
+
+
+# ── Backends ──────────────────────────────────────────────────────
+class GeminiBatchBackend:
+    name = "gemini"
+    _FAILED = {"JOB_STATE_FAILED", "JOB_STATE_CANCELLED", "JOB_STATE_EXPIRED"}
+
+    def __init__(self, client):
+        self.client = client  # genai.Client (la Batch API no pasa por la caché ni el pool)
+
+    def submit(self, job_file, model, display_name):
+        from google.genai import types
+        uploaded = self.client.files.upload(
+            file=str(job_file), config=types.UploadFileConfig(display_name=display_name, mime_type="jsonl"))
+        job = self.client.batches.create(model=model, src=uploaded.name, config={"display_name": display_name})
+        return job.name
+
+    def find(self, display_name):
+        """Id de un trabajo ya creado con ese nombre (o None)."""
+        for job in self.client.batches.list():
+            if getattr(job, "display_name", None) == display_name:
+                return job.name
+        return None
+
+    def state(self, job_id):
+        state = self.client.batches.get(name=job_id).state.name
+        if state == "JOB_STATE_SUCCEEDED":
+            return SUCCEEDED
+        return FAILED if state in self._FAILED else RUNNING
+
+    def download(self, job_id):
+        job = self.client.batches.get(name=job_id)
+        return self.client.files.download(file=job.dest.file_name).decode("utf-8").splitlines()
+
+
+class LocalBatchBackend:
+    name = "local"
+
+    def __init__(self, root=None, client=None, turnaround=0.0):
+        self.root = Path(root or JOBS_DIR / "local_backend")
+        self.client = client
+        self.turnaround = turnaround  # s que tarda en "terminar" un trabajo
+
+    def _dir(self, job_id):
+        return self.root / job_id
+
+    def submit(self, job_file, model, display_name):
+        job_dir = self._dir(f"local-{display_name}")
+        job_dir.mkdir(parents=True, exist_ok=True)
+        shutil.copyfile(job_file, job_dir / "input.jsonl")
+        status = {"state": RUNNING, "model": model, "ready_at": time.time() + self.turnaround}
+        (job_dir / "status.json").write_text(json.dumps(status), encoding="utf-8")
+        return job_dir.name
+
+    def find(self, display_name):
+        job_dir = self._dir(f"local-{display_name}")
+        return job_dir.name if (job_dir / "status.json").exists() else None
+
+    def state(self, job_id):
+        status_file = self._dir(job_id) / "status.json"
+        status = json.loads(status_file.read_text(encoding="utf-8"))
+        if status["state"] == RUNNING and time.time() >= status["ready_at"]:
+            self._run(self._dir(job_id), status["model"])
+            status["state"] = SUCCEEDED
+            status_file.write_text(json.dumps(status), encoding="utf-8")
+        return status["state"]
+
+    def download(self, job_id):
+        with open(self._dir(job_id) / "output.jsonl", "r", encoding="utf-8") as f:
+            return f.read().splitlines()
+
+    def _run(self, job_dir, model):
+        with open(job_dir / "input.jsonl", "r", encoding="utf-8") as f_in, \
+             open(job_dir / "output.jsonl", "w", encoding="utf-8") as f_out:
+            for line in f_in:
+                line = json.loads(line)
+                try:
+                    text = self._answer(model, line["key"], line["request"])
+                    result = {"key": line["key"], "response": {
+                        "candidates": [{"content": {"parts": [{"text": text}]}, "finishReason": "STOP"}]}}
+                except Exception as e:
+                    result = {"key": line["key"], "error": {"message": str(e)}}
+                f_out.write(json.dumps(result, ensure_ascii=False) + "\n")
+
+    def _answer(self, model, key, request):
+        config = request["generation_config"]
+        prompt = "".join(p.get("text", "") for c in request["contents"] for p in c["parts"])
+        if self.client is None:
+            return json.dumps(_placeholder(config["response_json_schema"], key))
+        from google.genai import types
+        response = self.client.models.generate_content(
+            model=model, contents=prompt, config=types.GenerateContentConfig(**config))
+        return response.text
+
+
+def _placeholder(schema, key, defs=None):
+    """Instancia mínima que cumple un JSON Schema de Pydantic."""
+    defs = defs or schema.get("$defs", {})
+    if "$ref" in schema:
+        return _placeholder(defs[schema["$ref"].split("/")[-1]], key, defs)
+    kind = schema.get("type")
+    if kind == "object":
+        return {name: _placeholder(sub, key, defs) for name, sub in schema.get("properties", {}).items()}
+    if kind == "array":
+        return [_placeholder(schema.get("items", {}), key, defs)]
+    if kind in ("integer", "number"):
+        return 0
+    if kind == "boolean":
+        return False
+    return f"local {key}"
+
+
+def default_backend():
+    if os.getenv("GEMINI_BATCH_BACKEND") == "local":
+        return LocalBatchBackend()
+    from google import genai
+    from provider_pool import gemini_keys
+    keys = gemini_keys()
+    return GeminiBatchBackend(genai.Client(api_key=keys[0] if keys else None))
+
+
+# ── Ciclo de vida de los trabajos ─────────────────────────────────
+def _save(manifest, jobs_dir):
+    path = Path(jobs_dir) / f"{manifest['name']}.json"
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps(manifest, ensure_ascii=False), encoding="utf-8")
+    tmp.replace(path)
+
+
+def _send(backend, manifest, jobs_dir):
+    job_file = Path(jobs_dir) / f"{manifest['name']}.requests.jsonl"
+    manifest["job_id"] = backend.submit(job_file, manifest["model"], manifest["name"])
+    manifest["submitted"] = time.time()
+    manifest["state"] = RUNNING
+    _save(manifest, jobs_dir)
+
+
+def submit(backend, kind, requests, model, extra=None, jobs_dir=JOBS_DIR, on_saved=None):
+    """
+    Envía `requests` (de build_request) en trabajos de hasta JOB_SIZE líneas.
+    `extra` ({key: datos}) se guarda en el manifiesto para la fusión posterior.
+    `on_saved(manifest)` se llama con cada manifiesto ya guardado y antes de
+    enviarlo, para que quien llama registre qué claves tiene ese trabajo.
+    """
+    jobs_dir = Path(jobs_dir)
+    jobs_dir.mkdir(parents=True, exist_ok=True)
+    batch = f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}"
+    manifests = []
+    for start in range(0, len(requests), JOB_SIZE):
+        chunk = requests[start:start + JOB_SIZE]
+        name = f"{kind}-{batch}-{start // JOB_SIZE:03d}"
+        with open(jobs_dir / f"{name}.requests.jsonl", "w", encoding="utf-8") as f:
+            for request in chunk:
+                f.write(json.dumps(request, ensure_ascii=False) + "\n")
+        keys = [r["key"] for r in chunk]
+        manifest = {
+            "name": name, "kind": kind, "backend": backend.name, "model": model,
+            "job_id": None, "submitted": None,
+            "keys": keys, "extra": {k: extra[k] for k in keys} if extra else {},
+            "state": SUBMITTING, "merged": False,
+        }
+        # Primero el manifiesto: si el proceso muere durante el envío, attach() lo retoma
+        _save(manifest, jobs_dir)
+        if on_saved:
+            on_saved(manifest)
+        _send(backend, manifest, jobs_dir)
+        manifests.append(manifest)
+        print(f"[*] Trabajo {name} enviado ({len(chunk)} peticiones, backend {backend.name})")
+    return manifests
+
+
+def attach(backend, manifest, jobs_dir=JOBS_DIR):
+    """Asegura que un manifiesto retomado tiene trabajo en el backend (sin duplicarlo)."""
+    if manifest["job_id"] is not None:
+        return manifest
+    job_id = backend.find(manifest["name"])
+    if job_id is not None:
+        print(f"[*] {manifest['name']}: el envío llegó antes de la caída, se retoma {job_id}")
+        manifest.update(job_id=job_id, state=RUNNING)
+        _save(manifest, jobs_dir)
+    else:
+        print(f"[*] {manifest['name']}: no llegó a enviarse, se envía ahora")
+        _send(backend, manifest, jobs_dir)
+    return manifest
+
+
+def pending(kind, backend, jobs_dir=JOBS_DIR):
+    """Manifiestos de `kind` de este backend aún sin fusionar (re-enganchados si hace falta)."""
+    jobs_dir = Path(jobs_dir)
+    if not jobs_dir.exists():
+        return []
+    manifests = []
+    for path in sorted(jobs_dir.glob(f"{kind}-*.json")):
+        manifest = json.loads(path.read_text(encoding="utf-8"))
+        if not manifest["merged"] and manifest["backend"] == backend.name:
+            manifests.append(attach(backend, manifest, jobs_dir))
+    return manifests
+
+
+def wait(backend, manifest, poll_interval=POLL_INTERVAL, jobs_dir=JOBS_DIR, timeout=WAIT_TIMEOUT):
+    """
+    Espera a que el trabajo termine; devuelve SUCCEEDED o FAILED, o RUNNING si
+    pasan `timeout` segundos (el manifiesto queda pendiente para otra ejecución).
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        state = backend.state(manifest["job_id"])
+        if state != RUNNING:
+            manifest["state"] = state
+            _save(manifest, jobs_dir)
+            return state
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            print(f"⌛ {manifest['name']}: sigue en curso tras {timeout}s, se retomará en la próxima ejecución")
+            return RUNNING
+        print(f"⏳ {manifest['name']}: en curso, nueva consulta en {poll_interval}s")
+        time.sleep(min(poll_interval, remaining))
+
+
+def results(backend, manifest, schema):
+    """{key: instancia de `schema`, o None si falta, dio error o no valida}."""
+    parsed = dict.fromkeys(manifest["keys"])
+    if manifest["state"] != SUCCEEDED:
+        return parsed
+    for line in backend.download(manifest["job_id"]):
+        if not line.strip():
+            continue
+        result = json.loads(line)
+        text = response_text(result)
+        if result.get("key") not in parsed or not text:
+            continue
+        try:
+            parsed[result["key"]] = schema.model_validate_json(text)
+        except ValueError:
+            pass
+    return parsed
+
+
+def mark_merged(manifest, jobs_dir=JOBS_DIR):
+    manifest["merged"] = True
+    _save(manifest, jobs_dir)
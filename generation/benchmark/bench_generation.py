@@ -0,0 +1,215 @@
+"""
+bench_generation.py
+-------------------
+Benchmark del pipeline de generación contra los stand-ins de fake_backend.py:
+DatasetGenerator (texto + imagen), TextOnlyGenerator, TitleGenerator e
+ImageProcessor, con distintos niveles de concurrencia.
+
+Para cada ejecución reporta pares/s, latencia p50/p99 de las llamadas a cada
+proveedor y el comportamiento ante fallos inyectados: 429 y 402 recibidos,
+failovers entre keys, pausas del limitador y si se llegó al objetivo.
+
+Todo se escribe en un directorio temporal (noticias de origen, estado, caché,
+métricas, imágenes), así que no toca los datos reales ni gasta cuota.
+
+Uso:
+    python generation/benchmark/bench_generation.py --pipeline textonly --goal 40 --concurrency 1,4,8
+    python generation/benchmark/bench_generation.py --rate-limit-rate 0.1 --quota 30 --keys 2 --json
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+sys.path.append(str(BENCH_DIR.parent))
+
+import call_metrics
+import datasetGenerator
+import datasetTitleGenerator
+import gemini_cache
+import imageProcessor
+import provider_pool
+from fake_backend import WORDS, FakeConfig, install, uninstall
+
+PIPELINES = ("dataset", "textonly", "titles", "images")
+
+
+def _percentile(values, q):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q * (len(values) - 1))))]
+
+
+def write_source(path, n, seed=0):
+    """Noticias reales sintéticas con el formato de pending_real_news.jsonl."""
+    rng = random.Random(seed)
+    with open(path, "w", encoding="utf-8") as f:
+        for i in range(n):
+            n_words, sentences = rng.randint(150, 900), []
+            while n_words > 0:
+                n = min(n_words, rng.randint(8, 30))
+                sentences.append(" ".join(rng.choice(WORDS) for _ in range(n)).capitalize() + ".")
+                n_words -= n
+            f.write(json.dumps({
+                "article_id": f"bench{i:05d}",
+                "title": " ".join(rng.choice(WORDS) for _ in range(10)).capitalize(),
+                "content": " ".join(sentences),
+                "image_url": f"http://127.0.0.1/img/bench{i:05d}.jpg",
+            }) + "\n")
+
+
+def write_titles(source, path):
+    """titles_data.jsonl (real + fake por grupo) para ImageProcessor."""
+    with open(source, encoding="utf-8") as f_in, open(path, "w", encoding="utf-8") as f_out:
+        for line in f_in:
+            data = json.loads(line)
+            f_out.write(json.dumps({"group_id": data["article_id"], "title": data["title"], "is_real": 1}) + "\n")
+            f_out.write(json.dumps({"group_id": data["article_id"], "title": data["title"][::-1], "is_real": 0}) + "\n")
+
+
+def _redirect(run_dir, source):
+    """Apunta todas las rutas de los scripts de generación al directorio temporal."""
+    gemini_cache.CACHE_FILE = run_dir / "gemini_cache.sqlite"
+    call_metrics._default = call_metrics.CallRecorder(run_dir / "call_metrics.jsonl")
+
+    images = run_dir / "fake_images"
+    images.mkdir()
+    datasetGenerator.REAL_NEWS_FILE = source
+    datasetGenerator.FINAL_DATASET_FILE = run_dir / "multimodal_dataset.jsonl"
+    datasetGenerator.STATE_FILE = run_dir / "pipeline_state.sqlite"
+    datasetGenerator.IMAGES_DIR = images
+
+    datasetTitleGenerator.REAL_NEWS_PATH = source
+    datasetTitleGenerator.OUTPUT_PATH = run_dir / "titles_data.jsonl"
+
+    imageProcessor.REAL_NEWS_FILE = source
+    imageProcessor.TITLES_FILE = run_dir / "bench_titles.jsonl"
+    imageProcessor.OUTPUT_FILE = run_dir / "titles_img_data.jsonl"
+    imageProcessor.FAKE_IMAGES_DIR = images
+    write_titles(source, imageProcessor.TITLES_FILE)
+
+
+def _count_pairs(path):
+    if not path.exists():
+        return 0
+    with open(path, encoding="utf-8") as f:
+        return sum(1 for line in f if line.strip() and json.loads(line)["is_real"] == 0)
+
+
+def run_pipeline(name, level, workdir, args):
+    """Ejecuta un pipeline con `level` (en vuelo o tamaño de lote) y devuelve sus métricas."""
+    run_dir = Path(workdir) / f"{name}-{level}"
+    run_dir.mkdir()
+    source = run_dir / "real_news.jsonl"
+    write_source(source, args.goal * 2, seed=args.seed)
+    _redirect(run_dir, source)
+
+    limiters = []
+    wall_start = time.perf_counter()
+    if name in ("dataset", "textonly"):
+        cls = datasetGenerator.DatasetGenerator if name == "dataset" else datasetGenerator.TextOnlyGenerator
+        gen = cls(text_in_flight=level, image_in_flight=max(1, level // 2))
+        gen.courtesy_delay = 0
+        limiters = [gen.text_limiter, gen.image_limiter]
+        for limiter in limiters:
+            limiter.base_delay = args.backoff
+        gen.process_pipeline(goal=args.goal, concurrent=level > 1)
+        output = datasetGenerator.FINAL_DATASET_FILE
+    elif name == "titles":
+        gen = datasetTitleGenerator.TitleGenerator()
+        gen.run(limit=args.goal, batch_size=level)
+        output = datasetTitleGenerator.OUTPUT_PATH
+    else:
+        gen = imageProcessor.ImageProcessor()
+        gen.courtesy_delay = 0
+        gen.run(goal=args.goal)
+        output = imageProcessor.OUTPUT_FILE
+    wall = time.perf_counter() - wall_start
+
+    records = call_metrics.default_recorder().records
+    pairs = _count_pairs(output)
+    result = {
+        "pipeline": name,
+        "level": level,
+        "pairs": pairs,
+        "goal": args.goal,
+        "wall_s": round(wall, 3),
+        "pairs_per_s": round(pairs / wall, 2) if wall else 0.0,
+        "calls": len(records),
+        "http_429": sum(1 for r in records if r["status"] == 429),
+        "http_402": sum(1 for r in records if r["status"] == 402),
+        "failovers": sum(1 for r in records if r["attempt"] > 0),
+        "throttled": sum(l.throttled for l in limiters),
+        "finish_max_tokens": sum(1 for r in records if r.get("finish_reason") == "MAX_TOKENS"),
+    }
+    prompt_tokens = [r["prompt_tokens"] for r in records if r.get("prompt_tokens") is not None]
+    result["prompt_tokens_avg"] = round(sum(prompt_tokens) / len(prompt_tokens)) if prompt_tokens else 0
+    for provider in ("Gemini", "HF"):
+        latencies = [r["latency_s"] for r in records if r["provider"] == provider and r["ok"]]
+        result[f"{provider.lower()}_p50_ms"] = round(_percentile(latencies, 0.50) * 1000, 1)
+        result[f"{provider.lower()}_p99_ms"] = round(_percentile(latencies, 0.99) * 1000, 1)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark del pipeline de generación contra stand-ins locales")
+    parser.add_argument("--pipeline", choices=PIPELINES + ("all",), default="all")
+    parser.add_argument("--goal", type=int, default=20)
+    parser.add_argument("--concurrency", default="1,4",
+                        help="Llamadas a Gemini en vuelo (1 = secuencial); para titles, tamaño de lote")
+    parser.add_argument("--keys", type=int, default=1, help="Keys falsas por proveedor")
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--image-latency", type=float, default=1.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--max-in-flight", type=int, default=None, help="429 por encima de esto (por key)")
+    parser.add_argument("--quota", type=int, default=None, help="Llamadas por key antes del 402")
+    parser.add_argument("--backoff", type=float, default=0.5, help="Pausa base del limitador tras un 429 (s)")
+    parser.add_argument("--cooldown", type=float, default=1.0, help="Enfriamiento de una key tras un 429 (s)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", action="store_true", help="Imprime los resultados como JSON")
+    args = parser.parse_args()
+
+    cfg = FakeConfig(latency=args.latency, image_latency=args.image_latency, error_rate=args.error_rate,
+                     rate_limit_rate=args.rate_limit_rate, max_in_flight=args.max_in_flight,
+                     quota=args.quota, seed=args.seed)
+    provider_pool.RATE_COOLDOWN = args.cooldown
+    # TitleGenerator exige una key configurada; los stand-ins no la usan
+    os.environ.setdefault("GEMINI_API_KEY", "fake-gemini")
+    names = PIPELINES if args.pipeline == "all" else [args.pipeline]
+    levels = [int(c) for c in args.concurrency.split(",")]
+
+    results = []
+    with tempfile.TemporaryDirectory(prefix="bench_generation_") as workdir:
+        for name in names:
+            for level in levels if name != "images" else levels[:1]:
+                install(cfg, gemini_keys=args.keys, hf_keys=args.keys)  # Cuota nueva en cada ejecución
+                try:
+                    results.append(run_pipeline(name, level, workdir, args))
+                finally:
+                    uninstall()
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print("\n" + "═" * 60)
+    for r in results:
+        print(f"  {r['pipeline']:<9} x{r['level']:<3} {r['pairs']:>4}/{r['goal']} pares en {r['wall_s']:>7.2f}s "
+              f"-> {r['pairs_per_s']:>6.2f} pares/s")
+        print(f"              Gemini p50 {r['gemini_p50_ms']:.0f} ms | p99 {r['gemini_p99_ms']:.0f} ms "
+              f"| HF p50 {r['hf_p50_ms']:.0f} ms | p99 {r['hf_p99_ms']:.0f} ms")
+        print(f"              {r['calls']} llamadas | 429: {r['http_429']} | 402: {r['http_402']} "
+              f"| failovers {r['failovers']} | pausas {r['throttled']} | MAX_TOKENS {r['finish_max_tokens']} "
+              f"| tokens entrada/llamada {r['prompt_tokens_avg']}")
+    print("═" * 60)
+
+
+if __name__ == "__main__":
+    main()
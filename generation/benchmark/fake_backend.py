@@ -0,0 +1,242 @@
+"""
+fake_backend.py
+---------------
+Stand-ins locales y deterministas de genai.Client e InferenceClient, para
+medir el pipeline de generación sin gastar cuota.
+
+  - FakeGeminiClient: `.models.generate_content(model, contents, config)`
+    devuelve respuestas válidas para el esquema pedido (SyntheticNews,
+    SyntheticTitle, SyntheticTitleBatch...) con `.text`, `.parsed`,
+    `.candidates[0].finish_reason` y `.usage_metadata`, como el SDK. Sin
+    esquema devuelve un párrafo (img-to-text). Si la salida no cabe en
+    max_output_tokens se corta y termina con MAX_TOKENS, como la API real.
+  - FakeHFClient: `.text_to_image(prompt, model)` devuelve un PNG de relleno
+    (un objeto con `.save(path)`, igual que la imagen PIL del SDK).
+
+El contenido depende solo del prompt (misma entrada, misma salida); la
+latencia y los fallos se sortean con una semilla fija por key:
+
+  - latency / image_latency: segundos por llamada (±50%)
+  - error_rate: 500 genérico        - rate_limit_rate: 429 aleatorio
+  - max_in_flight: 429 si una key tiene más llamadas simultáneas
+  - quota: llamadas por key antes de responder 402
+
+install() registra ambos en provider_pool, así DatasetGenerator,
+TitleGenerator e ImageProcessor los usan sin cambiar nada.
+"""
+
+import hashlib
+import json
+import random
+import re
+import struct
+import threading
+import time
+import zlib
+from pathlib import Path
+
+import provider_pool
+
+WORDS = ("market government climate research company energy policy data report "
+         "officials technology growth analysts election science industry").split()
+FIELD_WORDS = {"content": 300}   # Palabras por campo de texto (el resto, DEFAULT_WORDS)
+DEFAULT_WORDS = 10
+IMAGE_TOKENS = 258               # Tokens que cuenta Gemini por imagen de entrada
+
+
+class FakeConfig:
+    def __init__(self, latency=0.2, image_latency=1.0, error_rate=0.0, rate_limit_rate=0.0,
+                 max_in_flight=None, quota=None, seed=0):
+        self.latency = latency
+        self.image_latency = image_latency
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.max_in_flight = max_in_flight
+        self.quota = quota
+        self.seed = seed
+
+
+class FakeAPIError(Exception):
+    def __init__(self, code, message):
+        super().__init__(f"{code} {message}")
+        self.code = code
+
+
+class _FakeKey:
+    """Estado compartido de una key: llamadas en vuelo, consumo y sorteo de fallos."""
+
+    def __init__(self, key, cfg):
+        self.cfg = cfg
+        self.rng = random.Random(f"{cfg.seed}-{key}")
+        self.lock = threading.Lock()
+        self.active = 0
+        self.calls = 0
+
+    def call(self, latency, produce):
+        with self.lock:
+            self.calls += 1
+            self.active += 1
+            roll = self.rng.random()
+            jitter = self.rng.uniform(0.5, 1.5)
+            over_quota = self.cfg.quota is not None and self.calls > self.cfg.quota
+            crowded = self.cfg.max_in_flight is not None and self.active > self.cfg.max_in_flight
+        try:
+            if over_quota:
+                raise FakeAPIError(402, "Payment Required: monthly credits exhausted")
+            time.sleep(latency * jitter)
+            if crowded or roll < self.cfg.rate_limit_rate:
+                raise FakeAPIError(429, "RESOURCE_EXHAUSTED")
+            if roll > 1 - self.cfg.error_rate:
+                raise FakeAPIError(500, "INTERNAL")
+            return produce()
+        finally:
+            with self.lock:
+                self.active -= 1
+
+
+# ── Gemini ────────────────────────────────────────────────────────
+class _Reason:
+    def __init__(self, name):
+        self.name = name
+
+
+class _Candidate:
+    def __init__(self, finish_reason):
+        self.finish_reason = _Reason(finish_reason)
+
+
+class _Usage:
+    def __init__(self, prompt_tokens, output_tokens):
+        self.prompt_token_count = prompt_tokens
+        self.candidates_token_count = output_tokens
+        self.thoughts_token_count = 0
+        self.total_token_count = prompt_tokens + output_tokens
+
+
+class FakeResponse:
+    def __init__(self, text, parsed, finish_reason, prompt_tokens, output_tokens):
+        self.text = text
+        self.parsed = parsed
+        self.candidates = [_Candidate(finish_reason)]
+        self.usage_metadata = _Usage(prompt_tokens, output_tokens)
+
+
+def _prompt_parts(contents):
+    """(texto del prompt, nº de imágenes) de un `contents` de generate_content."""
+    if isinstance(contents, str):
+        return contents, 0
+    texts, images = [], 0
+    for part in contents:
+        if isinstance(part, str):
+            texts.append(part)
+        else:
+            images += 1
+    return "\n".join(texts), images
+
+
+def _words(rng, n):
+    return " ".join(rng.choice(WORDS) for _ in range(n)).capitalize()
+
+
+def _fill(schema, rng, prompt, name=None, defs=None):
+    """Instancia de un JSON Schema (Pydantic) con texto pseudoaleatorio."""
+    defs = defs if defs is not None else schema.get("$defs", {})
+    if "$ref" in schema:
+        return _fill(defs[schema["$ref"].split("/")[-1]], rng, prompt, name, defs)
+    kind = schema.get("type")
+    if kind == "object":
+        return {field: _fill(sub, rng, prompt, field, defs) for field, sub in schema.get("properties", {}).items()}
+    if kind == "array":
+        items = schema.get("items", {})
+        item_props = (defs.get(items.get("$ref", "").split("/")[-1]) or items).get("properties", {})
+        # Lotes de TitleGenerator: un elemento por cada [group_id: ...] del prompt
+        ids = re.findall(r"\[group_id: ([^\]]+)\]", prompt) if "group_id" in item_props else []
+        rows = [_fill(items, rng, prompt, name, defs) for _ in ids or [None]]
+        for row, gid in zip(rows, ids):
+            row["group_id"] = gid
+        return rows
+    if kind in ("integer", "number"):
+        return rng.randint(0, 100)
+    if kind == "boolean":
+        return rng.random() < 0.5
+    return _words(rng, FIELD_WORDS.get(name, DEFAULT_WORDS))
+
+
+class _FakeModels:
+    def __init__(self, key):
+        self._key = key
+
+    def generate_content(self, *, model, contents, config=None):
+        return self._key.call(self._key.cfg.latency, lambda: self._answer(contents, config))
+
+    def _answer(self, contents, config):
+        prompt, images = _prompt_parts(contents)
+        rng = random.Random(hashlib.sha256(prompt.encode("utf-8")).hexdigest() + str(images))
+        schema = getattr(config, "response_schema", None)
+        json_schema = schema.model_json_schema() if hasattr(schema, "model_json_schema") \
+            else getattr(config, "response_json_schema", None)
+        if json_schema:
+            text = json.dumps(_fill(json_schema, rng, prompt))
+        else:
+            text = _words(rng, 80) + "."
+
+        prompt_tokens = len(prompt) // 4 + IMAGE_TOKENS * images
+        output_tokens = len(text) // 4
+        limit = getattr(config, "max_output_tokens", None)
+        if limit and output_tokens > limit:
+            # Respuesta cortada: JSON inválido, como cuando la API agota max_output_tokens
+            return FakeResponse(text[:limit * 4], None, "MAX_TOKENS", prompt_tokens, limit)
+        parsed = schema.model_validate_json(text) if hasattr(schema, "model_validate_json") else None
+        return FakeResponse(text, parsed, "STOP", prompt_tokens, output_tokens)
+
+
+class FakeGeminiClient:
+    def __init__(self, api_key=None, cfg=None):
+        self.models = _FakeModels(_FakeKey(api_key, cfg or FakeConfig()))
+
+
+# ── HF ────────────────────────────────────────────────────────────
+def _png(width, height, rgb):
+    def chunk(tag, data):
+        return struct.pack(">I", len(data)) + tag + data + struct.pack(">I", zlib.crc32(tag + data) & 0xFFFFFFFF)
+    raw = b"".join(b"\x00" + bytes(rgb) * width for _ in range(height))
+    return (b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0))
+            + chunk(b"IDAT", zlib.compress(raw)) + chunk(b"IEND", b""))
+
+
+class PlaceholderImage:
+    def __init__(self, data, size):
+        self.data = data
+        self.size = size
+
+    def save(self, fp, format=None, **options):
+        if hasattr(fp, "write"):
+            fp.write(self.data)
+        else:
+            Path(fp).write_bytes(self.data)
+
+
+class FakeHFClient:
+    def __init__(self, api_key=None, cfg=None, size=(64, 64)):
+        self._key = _FakeKey(api_key, cfg or FakeConfig())
+        self._size = size
+
+    def text_to_image(self, prompt, model=None):
+        def produce():
+            rgb = hashlib.sha256(prompt.encode("utf-8")).digest()[:3]
+            return PlaceholderImage(_png(*self._size, rgb), self._size)
+        return self._key.call(self._key.cfg.image_latency, produce)
+
+
+def install(cfg=None, gemini_keys=1, hf_keys=1):
+    """Registra los stand-ins en provider_pool con `n` keys falsas por proveedor."""
+    cfg = cfg or FakeConfig()
+    provider_pool.set_client_factory("Gemini", lambda k: FakeGeminiClient(k, cfg),
+                                     keys=[f"fake-gemini-{i}" for i in range(gemini_keys)])
+    provider_pool.set_client_factory("HF", lambda k: FakeHFClient(k, cfg),
+                                     keys=[f"fake-hf-{i}" for i in range(hf_keys)])
+
+
+def uninstall():
+    provider_pool.set_client_factory("Gemini", None)
+    provider_pool.set_client_factory("HF", None)
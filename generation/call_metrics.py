@@ -0,0 +1,199 @@
+"""
+call_metrics.py
+---------------
+Instrumentación de cada llamada real a un proveedor (Gemini generate_content,
+HF text_to_image): latencia, tokens, motivo de fin, reintentos y bytes enviados.
+
+ProviderPool registra aquí cada intento (también los que fallan con 402/429,
+con su nº de intento), así que lo que sirve la caché de Gemini no cuenta como
+llamada. Cada registro se añade como una línea de METRICS_FILE:
+
+    {"ts": ..., "provider": "Gemini", "key": "key#1", "model": "...",
+     "latency_s": 1.23, "ok": true, "status": null, "attempt": 0,
+     "bytes_sent": 5120, "prompt_tokens": 1400, "output_tokens": 620,
+     "thoughts_tokens": 0, "finish_reason": "STOP", "cost_usd": 0.00039}
+
+Al final de cada script se imprime el resumen de la sesión (report) y el del
+histórico completo se saca con:
+
+    python generation/call_metrics.py [call_metrics.jsonl]
+
+que muestra, por proveedor y modelo, percentiles e histogramas de latencia,
+tokens de entrada y de salida. Sirve para ajustar max_output_tokens, el
+recorte del prompt y la concurrencia con datos.
+"""
+
+import argparse
+import json
+import threading
+import time
+from collections import defaultdict
+from pathlib import Path
+
+METRICS_FILE = Path(__file__).resolve().parent / "call_metrics.jsonl"
+
+# USD por millón de tokens (entrada, salida), precios de lista. Actualizar si cambian.
+PRICES = {
+    "gemini-2.5-flash-lite": (0.10, 0.40),
+    "gemini-2.5-flash": (0.30, 2.50),
+    "gemini-2.0-flash": (0.10, 0.40),
+}
+
+LATENCY_BUCKETS = [0.5, 1, 2, 4, 8, 16, 32, 64]
+TOKEN_BUCKETS = [64, 128, 256, 512, 1024, 2048, 4096, 8192]
+
+
+def payload_bytes(obj):
+    """Tamaño aproximado de lo que se envía (texto en UTF-8 e imágenes en línea)."""
+    if obj is None or isinstance(obj, (bool, int, float)):
+        return 0
+    if isinstance(obj, str):
+        return len(obj.encode("utf-8"))
+    if isinstance(obj, (bytes, bytearray)):
+        return len(obj)
+    if isinstance(obj, (list, tuple)):
+        return sum(payload_bytes(x) for x in obj)
+    if isinstance(obj, dict):
+        return sum(payload_bytes(v) for v in obj.values())
+    if hasattr(obj, "__dict__") and not isinstance(obj, type):
+        return payload_bytes(vars(obj))
+    return 0
+
+
+def _usage(response):
+    """Tokens y motivo de fin de una respuesta de Gemini (None si no aplica)."""
+    usage = getattr(response, "usage_metadata", None)
+    candidates = getattr(response, "candidates", None) or []
+    reason = getattr(candidates[0], "finish_reason", None) if candidates else None
+    return {
+        "prompt_tokens": getattr(usage, "prompt_token_count", None),
+        "output_tokens": getattr(usage, "candidates_token_count", None),
+        "thoughts_tokens": getattr(usage, "thoughts_token_count", None),
+        "finish_reason": getattr(reason, "name", reason),
+    }
+
+
+def _cost(model, prompt_tokens, output_tokens):
+    price = PRICES.get(model)
+    if price is None or prompt_tokens is None:
+        return None
+    return (prompt_tokens * price[0] + (output_tokens or 0) * price[1]) / 1e6
+
+
+class CallRecorder:
+    def __init__(self, path=None):
+        self.path = Path(path or METRICS_FILE)
+        self.records = []
+        self._lock = threading.Lock()
+
+    def record(self, provider, key, kwargs, started, response=None, status=None, error=None, attempt=0):
+        """Registra un intento; `kwargs` son los argumentos de la llamada (model, contents, prompt...)."""
+        model = kwargs.get("model")
+        entry = {
+            "ts": round(time.time(), 3),
+            "provider": provider,
+            "key": key,
+            "model": model,
+            "latency_s": round(time.monotonic() - started, 3),
+            "ok": error is None,
+            "status": status,
+            "error": str(error)[:200] if error is not None else None,
+            "attempt": attempt,
+            "bytes_sent": payload_bytes(kwargs.get("contents", kwargs.get("prompt"))),
+        }
+        if response is not None:
+            entry.update(_usage(response))
+            entry["cost_usd"] = _cost(model, entry["prompt_tokens"], entry["output_tokens"])
+        line = json.dumps(entry, ensure_ascii=False) + "\n"
+        with self._lock:
+            self.records.append(entry)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line)
+
+    def report(self):
+        if self.records:
+            print("Llamadas a proveedores (esta ejecución):")
+            summarize(self.records, histograms=False)
+
+
+_default = None
+_default_lock = threading.Lock()
+
+
+def default_recorder():
+    """Recorder compartido por todos los pools del proceso."""
+    global _default
+    with _default_lock:
+        if _default is None:
+            _default = CallRecorder()
+        return _default
+
+
+# ── Resumen e histogramas ─────────────────────────────────────────
+def _percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def _histogram(title, values, buckets, unit=""):
+    counts = [0] * (len(buckets) + 1)
+    for v in values:
+        counts[next((i for i, b in enumerate(buckets) if v <= b), len(buckets))] += 1
+    top = max(counts) or 1
+    print(f"     {title}")
+    labels = [f"<= {b}{unit}" for b in buckets] + [f">  {buckets[-1]}{unit}"]
+    for label, n in zip(labels, counts):
+        if n:
+            print(f"       {label:>10} {'█' * max(1, round(30 * n / top))} {n}")
+
+
+def summarize(records, histograms=True):
+    groups = defaultdict(list)
+    for r in records:
+        groups[(r["provider"], r["model"])].append(r)
+    for (provider, model), rows in sorted(groups.items(), key=lambda kv: str(kv[0])):
+        ok = [r for r in rows if r["ok"]]
+        latencies = [r["latency_s"] for r in ok]
+        prompt = [r["prompt_tokens"] for r in ok if r.get("prompt_tokens") is not None]
+        output = [r["output_tokens"] for r in ok if r.get("output_tokens") is not None]
+        cost = sum(r.get("cost_usd") or 0 for r in ok)
+        retried = sum(1 for r in rows if r["attempt"] > 0)
+        line = f"   - {provider} {model}: {len(ok)}/{len(rows)} ok, {retried} reintentos"
+        if latencies:
+            line += f", latencia p50 {_percentile(latencies, .5):.2f}s p95 {_percentile(latencies, .95):.2f}s"
+        if prompt:
+            line += f", tokens {sum(prompt)} in / {sum(output)} out"
+        if cost:
+            line += f", ~{cost:.4f} USD"
+        print(line)
+        reasons = defaultdict(int)
+        for r in ok:
+            if r.get("finish_reason"):
+                reasons[r["finish_reason"]] += 1
+        if reasons:
+            print("     finish_reason: " + ", ".join(f"{k}={v}" for k, v in sorted(reasons.items())))
+        errors = defaultdict(int)
+        for r in rows:
+            if not r["ok"]:
+                errors[r["status"] or "otro"] += 1
+        if errors:
+            print("     errores: " + ", ".join(f"{k}={v}" for k, v in sorted(errors.items(), key=str)))
+        if histograms:
+            _histogram("latencia", latencies, LATENCY_BUCKETS, "s")
+            if prompt:
+                _histogram("tokens de entrada", prompt, TOKEN_BUCKETS)
+                _histogram("tokens de salida", output, TOKEN_BUCKETS)
+
+
+def load(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Resumen de las llamadas registradas a Gemini / HF")
+    parser.add_argument("metrics", nargs="?", type=Path, default=METRICS_FILE)
+    args = parser.parse_args()
+    records = load(args.metrics)
+    print(f"{len(records)} llamadas en {args.metrics.name}")
+    summarize(records)
@@ -1,13 +1,23 @@
-import os
-import json
+import argparse
+import sys
 import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from dotenv import load_dotenv
-from google import genai
 from google.genai import types
-from huggingface_hub import InferenceClient
 from pydantic import BaseModel
 
+sys.path.append(str(Path(__file__).resolve().parents[1]))  # Raíz del repo (paquete common)
+import batch_jobs
+from gemini_cache import cached_client
+from imageProcessor import ImageProcessor
+from image_store import ImageStore
+from prompt_budget import default_budget, target_words
+from provider_pool import gemini_pool, hf_pool
+from stage_state import StageStore
+from throttle import AdaptiveLimiter, QuotaExhausted
+
 load_dotenv()
 
 # --- ESQUEMAS ---
@@ -23,35 +33,28 @@ DATASET_ROOT = ROOT_DIR / "dataset"
 IMAGES_DIR = DATASET_ROOT / "fake_images"
 FINAL_DATASET_FILE = DATASET_ROOT / "multimodal_dataset.jsonl"
 REAL_NEWS_FILE = ROOT_DIR / "scraping" / "data_collection" / "pending_real_news.jsonl"
+STATE_FILE = DATASET_ROOT / "pipeline_state.sqlite"
 
 IMAGES_DIR.mkdir(parents=True, exist_ok=True)
 
+# --- CONCURRENCIA (modo concurrent=True) ---
+TEXT_IN_FLIGHT = 4    # Llamadas simultáneas a Gemini
+IMAGE_IN_FLIGHT = 2   # Llamadas simultáneas a HF FLUX
 
-class DatasetGenerator:
-    def __init__(self):
-        self.gemini_client = genai.Client(api_key=os.getenv("GEMINI_API_KEY"))
-        self.hf_client = InferenceClient(api_key=os.getenv('FIRST_HF_TK'))
-        self.processed_ids = self._load_processed_ids()
-
-    def _load_processed_ids(self):
-        """Carga IDs ya procesados para evitar re-trabajo y gasto de API."""
-        if not FINAL_DATASET_FILE.exists():
-            return set()
-        with open(FINAL_DATASET_FILE, "r", encoding="utf-8") as f:
-            # Usamos group_id para verificar si el par ya existe
-            return {json.loads(line)["group_id"] for line in f}
-
-    def generate_fake_text(self, real_title, real_content):
-        words = real_content.split()
-        if len(words) > 800:
-            real_content = " ".join(words[:800])
-        
-        target_words = len(real_content.split())
+TEXT_MODEL = "gemini-2.5-flash-lite"
+TEXT_MAX_TOKENS = 1500
+
+
+def paraphrase_prompt(real_title, real_content, group_id=None):
+    # La longitud objetivo sale del artículo real (tope de 800 palabras), no del recorte enviado
+    target = target_words(real_content)
+    # Frases completas hasta el presupuesto de tokens
+    real_content = default_budget().fit_lead(real_content, group_id=group_id)
 
-        prompt = f"""
+    return f"""
             [CRITICAL INSTRUCTION]
             You must paraphrase the following news article. 
-            The generated content MUST HAVE between {int(target_words*0.9)} and {int(target_words)} words.
+            The generated content MUST HAVE between {int(target*0.9)} and {int(target)} words.
             Do not be concise. Mimic the original news length and detail density.
 
             REAL TITULAR: {real_title}
@@ -59,15 +62,34 @@ class DatasetGenerator:
             
             OUTPUT FORMAT: JSON {{headline, content, technique}}
             """
+
+
+class DatasetGenerator:
+    courtesy_delay = 1  # Segundos entre pares en modo secuencial
+
+    def __init__(self, text_in_flight=TEXT_IN_FLIGHT, image_in_flight=IMAGE_IN_FLIGHT):
+        # Todas las keys disponibles, con failover; las reejecuciones sobre
+        # noticias ya vistas no vuelven a pagar la llamada (caché)
+        self.gemini_client = cached_client(gemini_pool())
+        self.hf_client = hf_pool()
+        self.store = open_store()
+        self.images = ImageStore(IMAGES_DIR)
+        # Límite en vuelo por proveedor, que se reduce solo ante rate limits
+        self.text_limiter = AdaptiveLimiter("Gemini", text_in_flight)
+        self.image_limiter = AdaptiveLimiter("HF FLUX", image_in_flight)
+
+    def generate_fake_text(self, real_title, real_content, group_id=None):
+        prompt = paraphrase_prompt(real_title, real_content, group_id)
         
         try:
-            response = self.gemini_client.models.generate_content(
-                model="gemini-2.5-flash-lite", 
+            response = self.text_limiter.call(
+                self.gemini_client.models.generate_content,
+                model=TEXT_MODEL, 
                 contents=prompt,
                 config=types.GenerateContentConfig(
                     response_mime_type="application/json",
                     response_schema=SyntheticNews,
-                    max_output_tokens=1500
+                    max_output_tokens=TEXT_MAX_TOKENS
                 ),
             )
 
@@ -85,165 +107,306 @@ class DatasetGenerator:
 
     def generate_fake_image(self, fake_headline, article_id):
         """Genera imagen sintética y devuelve la ruta relativa para el JSONL."""
-        file_name = f"{article_id}_fake.png"
-        image_path = IMAGES_DIR / file_name
-        if not image_path.exists():
-            try:
-                image = self.hf_client.text_to_image(
-                    prompt=f"Professional photojournalism, high quality, realistic news photo: {fake_headline}",
-                    model="black-forest-labs/FLUX.1-schnell",
-                )
-                image.save(image_path)
-            except Exception as e:
-                print(f"Image Error: {e}")
-                return None
-        return f"dataset/fake_images/{file_name}"
+        existing = self.images.get(article_id)
+        if existing:
+            return existing
+        try:
+            image = self.image_limiter.call(
+                self.hf_client.text_to_image,
+                prompt=f"Professional photojournalism, high quality, realistic news photo: {fake_headline}",
+                model="black-forest-labs/FLUX.1-schnell",
+            )
+            return self.images.put(article_id, image)
+        except Exception as e:
+            print(f"Image Error: {e}")
+            return None
         
-    def process_pipeline(self, goal=10):
+    def build_pair(self, real_data):
+        """Genera el par (real, fake) de una noticia, o None si algo falla. Seguro entre hilos."""
+        group_id = real_data["article_id"]
+
+        # 1. Generar Texto Fake (English)
+        fake_data = self.generate_fake_text(real_data["title"], real_data["content"], group_id)
+        if not fake_data:
+            return None
+
+        # 2. Generar Imagen Fake
+        rel_image_path = self.generate_fake_image(fake_data.headline, group_id)
+        if not rel_image_path:
+            return None
+
+        # 3. Registros (Pairwise format)
+        entry_real = {
+            "group_id": group_id,
+            "is_real": 1,
+            "title": real_data["title"],
+            "content": real_data["content"],
+            "image_path": real_data["image_url"],
+            "model": "human"
+        }
+
+        entry_fake = {
+            "group_id": group_id,
+            "is_real": 0,
+            "title": fake_data.headline,
+            "content": fake_data.content,
+            "image_path": rel_image_path,
+            "technique": fake_data.technique,
+            "model": "gemini-2.0-flash-lite"
+        }
+        return entry_real, entry_fake
+
+    def process_pipeline(self, goal=10, concurrent=False):
+        """
+        Genera `goal` pares nuevos. En modo secuencial procesa una noticia cada
+        vez; con `concurrent=True` mantiene varias en vuelo (limitadas por
+        proveedor). Solo se recorren las noticias con la etapa text pendiente
+        y, al terminar, se exportan los pares nuevos en el orden de origen.
+        """
         if not REAL_NEWS_FILE.exists():
             print(f"Source file not found: {REAL_NEWS_FILE}")
             return
 
-        new_pairs_count = 0
-        print(f"Starting pipeline. Already processed: {len(self.processed_ids)} groups. Goal: +{goal}")
+        self.store.import_source(REAL_NEWS_FILE)
+        print(f"Starting pipeline. Already processed: {self.store.count('text', 'done')} groups. "
+              f"Pending: {self.store.count('text', 'pending')}. Goal: +{goal}")
 
-        with open(REAL_NEWS_FILE, "r", encoding="utf-8") as f:
-            for line in f:
-                if new_pairs_count >= goal:
+        claims = self.store.iter_claims("text")
+        pending = (row["source"] for row in claims)
+        try:
+            if concurrent:
+                new_pairs_count = self._run_concurrent(pending, goal)
+            else:
+                new_pairs_count = self._run_sequential(pending, goal)
+        finally:
+            claims.close()
+
+        exported = self.store.export(FINAL_DATASET_FILE)
+        print(f"Finished. Generated {new_pairs_count} new pairs ({exported} exported to {FINAL_DATASET_FILE.name}).")
+        self.store.report()
+        self.gemini_client.cache.report()
+        self.gemini_client.report()
+        self.hf_client.report()
+        self.hf_client.recorder.report()
+
+    def _save_pair(self, pair):
+        entry_real, entry_fake = pair
+        gid = entry_real["group_id"]
+        self.store.complete(gid, "text", real=entry_real, fake=entry_fake)
+        if entry_fake.get("image_path"):
+            self.store.complete(gid, "image")
+
+    def _run_sequential(self, pending, goal):
+        new_pairs_count = 0
+        for real_data in pending:
+            if new_pairs_count >= goal:
+                self.store.release(real_data["article_id"], "text")
+                break
+            print(f"[*] Processing pair {new_pairs_count + 1}/{goal}: {real_data['article_id']}")
+
+            pair = self.build_pair(real_data)
+            if not pair:
+                self.store.fail(real_data["article_id"], "text", "generation failed")
+                continue
+            self._save_pair(pair)
+            new_pairs_count += 1
+
+            # Courtesy delay para no saturar APIs
+            time.sleep(self.courtesy_delay)
+        return new_pairs_count
+
+    def _run_concurrent(self, pending, goal):
+        limiters = (self.text_limiter, self.image_limiter)
+        workers = sum(l.max_in_flight for l in limiters)
+        window = deque()  # Futuros en el orden del fichero: se escriben por la cabeza
+        new_pairs_count = 0
+        source_done = False
+
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            while True:
+                # Encolar solo lo necesario para llegar al objetivo (si alguno falla, se repone)
+                while not source_done and len(window) < 2 * workers and new_pairs_count + len(window) < goal:
+                    real_data = next(pending, None)
+                    if real_data is None or any(l.exhausted for l in limiters):
+                        if real_data is not None:
+                            self.store.release(real_data["article_id"], "text")
+                        source_done = True
+                        break
+                    window.append((real_data["article_id"], pool.submit(self.build_pair, real_data)))
+                if not window:
                     break
-                
-                real_data = json.loads(line)
-                group_id = real_data["article_id"]
-                
-                if group_id in self.processed_ids:
-                    continue
-
-                print(f"[*] Processing pair {new_pairs_count + 1}/{goal}: {group_id}")
 
-                # 1. Generar Texto Fake (English)
-                fake_data = self.generate_fake_text(real_data["title"], real_data["content"])
-                if not fake_data:
-                    continue
-                
-                # 2. Generar Imagen Fake
-                rel_image_path = self.generate_fake_image(fake_data.headline, group_id)
-                if not rel_image_path:
+                group_id, future = window.popleft()
+                pair = future.result()
+                if not pair:
+                    print(f"[-] Skipped: {group_id}")
+                    self.store.fail(group_id, "text", "generation failed")
                     continue
-
-                # 3. Guardar registros (Pairwise format)
-                entry_real = {
-                    "group_id": group_id,
-                    "is_real": 1,
-                    "title": real_data["title"],
-                    "content": real_data["content"],
-                    "image_path": real_data["image_url"],
-                    "model": "human"
-                }
-
-                entry_fake = {
-                    "group_id": group_id,
-                    "is_real": 0,
-                    "title": fake_data.headline,
-                    "content": fake_data.content,
-                    "image_path": rel_image_path,
-                    "technique": fake_data.technique,
-                    "model": "gemini-2.0-flash-lite"
-                }
-
-                with open(FINAL_DATASET_FILE, "a", encoding="utf-8") as out:
-                    out.write(json.dumps(entry_real, ensure_ascii=False) + "\n")
-                    out.write(json.dumps(entry_fake, ensure_ascii=False) + "\n")
-                
-                self.processed_ids.add(group_id)
+                self._save_pair(pair)
                 new_pairs_count += 1
-                
-                # Courtesy delay para no saturar APIs
-                time.sleep(1)
+                print(f"[*] Pair {new_pairs_count}/{goal}: {group_id} "
+                      f"(in flight: text {self.text_limiter.limit}, image {self.image_limiter.limit})")
 
-        print(f"Finished. Generated {new_pairs_count} new pairs.")
+        for l in limiters:
+            if l.exhausted:
+                print(f"🛑 Cuota de {l.name} agotada. Progreso guardado.")
+        return new_pairs_count
 
 class TextOnlyGenerator(DatasetGenerator):
-    def process_pipeline(self, goal=10):
-        if not REAL_NEWS_FILE.exists():
-            print(f"Source file not found: {REAL_NEWS_FILE}")
-            return
+    courtesy_delay = 2
+
+    def build_pair(self, real_data):
+        fake_text = self.generate_fake_text(real_data["title"], real_data["content"], real_data["article_id"])
+        if not fake_text: return None
+        return self.pair_from_text(real_data, fake_text)
+
+    def pair_from_text(self, real_data, fake_text):
+        group_id = real_data["article_id"]
+        entry_real = {
+            "group_id": group_id, "is_real": 1, "title": real_data["title"],
+            "content": real_data["content"], "image_path": real_data["image_url"], "model": "human"
+        }
+
+        entry_fake = {
+            "group_id": group_id, "is_real": 0, "title": fake_text.headline,
+            "content": fake_text.content, "image_path": None, # Marcamos como pendiente
+            "technique": fake_text.technique, "model": "gemini-2.0-flash-lite"
+        }
+        return entry_real, entry_fake
+
+    def process_batch(self, goal=1000, backend=None, poll_interval=batch_jobs.POLL_INTERVAL):
+        """
+        Igual que process_pipeline pero con la Batch API: los `goal` pendientes
+        de la etapa text se envían como trabajos diferidos y los pares se
+        fusionan por group_id al terminar. Primero se retoman los trabajos que
+        una ejecución anterior dejó enviados sin fusionar.
+
+        Los grupos enviados quedan en estado `batched` (con el nombre del
+        trabajo) en el store: ni claim() ni un reinicio los devuelven a
+        pendiente, así que process_pipeline no los genera por duplicado.
+        """
+        backend = backend or batch_jobs.default_backend()
+        self.store.import_source(REAL_NEWS_FILE)
+
+        manifests = batch_jobs.pending("text", backend)
+        if manifests:
+            print(f"Resuming {len(manifests)} submitted batch jobs")
+            # Por si la caída fue entre guardar el manifiesto y marcar sus grupos
+            for manifest in manifests:
+                self.store.mark_batched("text", manifest["name"], manifest["keys"])
+        else:
+            rows = self.store.claim("text", goal)
+            requests = [batch_jobs.build_request(row["group_id"],
+                                                 paraphrase_prompt(row["source"]["title"], row["source"]["content"],
+                                                                   row["group_id"]),
+                                                 SyntheticNews, TEXT_MAX_TOKENS)
+                        for row in rows]
+            manifests = batch_jobs.submit(
+                backend, "text", requests, TEXT_MODEL,
+                on_saved=lambda m: self.store.mark_batched("text", m["name"], m["keys"])) if requests else []
 
         new_pairs_count = 0
-        with open(REAL_NEWS_FILE, "r", encoding="utf-8") as f:
-            for line in f:
-                if new_pairs_count >= goal: break
-                
-                real_data = json.loads(line)
-                group_id = real_data["article_id"]
-                
-                if group_id in self.processed_ids: continue
-
-                print(f"[*] Processing text for pair {new_pairs_count + 1}/{goal}: {group_id}")
-
-                fake_text = self.generate_fake_text(real_data["title"], real_data["content"])
-                if not fake_text: continue
-
-                entry_real = {
-                    "group_id": group_id, "is_real": 1, "title": real_data["title"],
-                    "content": real_data["content"], "image_path": real_data["image_url"], "model": "human"
-                }
-
-                entry_fake = {
-                    "group_id": group_id, "is_real": 0, "title": fake_text.headline,
-                    "content": fake_text.content, "image_path": None, # Marcamos como pendiente
-                    "technique": fake_text.technique, "model": "gemini-2.0-flash-lite"
-                }
-
-                with open(FINAL_DATASET_FILE, "a", encoding="utf-8") as out:
-                    out.write(json.dumps(entry_real, ensure_ascii=False) + "\n")
-                    out.write(json.dumps(entry_fake, ensure_ascii=False) + "\n")
-                
-                self.processed_ids.add(group_id)
+        for manifest in manifests:
+            state = batch_jobs.wait(backend, manifest, poll_interval)
+            if state == batch_jobs.RUNNING:
+                continue  # Sigue en curso: se retoma en la próxima ejecución
+            for gid, fake_text in batch_jobs.results(backend, manifest, SyntheticNews).items():
+                if fake_text is None:
+                    self.store.fail(gid, "text", f"batch {manifest['name']}: {state}, no valid result")
+                    continue
+                self._save_pair(self.pair_from_text(self.store.get(gid)["source"], fake_text))
                 new_pairs_count += 1
-                time.sleep(2)
+            batch_jobs.mark_merged(manifest)
+
+        exported = self.store.export(FINAL_DATASET_FILE)
+        print(f"Finished. Generated {new_pairs_count} new pairs in batch mode "
+              f"({exported} exported to {FINAL_DATASET_FILE.name}).")
+        self.store.report()
 
 
 class ImageBackfiller:
+    """Etapa image: genera las imágenes de los pares que solo tienen texto."""
+
     def __init__(self):
-        self.hf_client = InferenceClient(api_key=os.getenv('FIRST_HF_TK'))
+        self.hf_client = hf_pool()
+        self.store = open_store()
+        self.images = ImageStore(IMAGES_DIR)
 
-    def run(self):
-        temp_file = FINAL_DATASET_FILE.with_suffix(".tmp")
+    def run(self, goal=None):
         updated_count = 0
-        stop_execution = False
+        claims = self.store.iter_claims("image")  # Solo los pendientes, no el dataset entero
+        for row in claims:
+            gid = row["group_id"]
+            if goal and updated_count >= goal:
+                self.store.release(gid, "image")
+                break
+            print(f"[*] Generating missing image for: {gid}")
 
-        with open(FINAL_DATASET_FILE, "r", encoding="utf-8") as f_in, \
-            open(temp_file, "w", encoding="utf-8") as f_out:
-            
-            for line in f_in:
-                data = json.loads(line)
-                
-                # Si no hemos sido bloqueados por la API y falta la imagen
-                if not stop_execution and data["is_real"] == 0 and (data["image_path"] is None or data["image_path"] == ""):
-                    print(f"[*] Generating missing image for: {data['group_id']}")
-                    file_name = f"{data['group_id']}_fake.png"
-                    img_path = IMAGES_DIR / file_name
-                    
-                    try:
-                        if not img_path.exists():
-                            image = self.hf_client.text_to_image(
-                                prompt=f"Professional news photo: {data['title']}",
-                                model="black-forest-labs/FLUX.1-schnell",
-                            )
-                            image.save(img_path)
-                        
-                        data["image_path"] = f"dataset/fake_images/{file_name}"
-                        updated_count += 1
-                    except Exception as e:
-                        print(f"❌ Error en imagen {data['group_id']}: {e}")
-                        if "402" in str(e):
-                            print("🛑 Cuota agotada. Guardando progreso y saliendo...")
-                            stop_execution = True # Marcamos para dejar de intentar, pero seguimos copiando el resto del archivo
-                
-                f_out.write(json.dumps(data, ensure_ascii=False) + "\n")
-        
-        temp_file.replace(FINAL_DATASET_FILE)
+            try:
+                image_path = self.images.get(gid)
+                if not image_path:
+                    image = self.hf_client.text_to_image(
+                        prompt=f"Professional news photo: {row['fake']['title']}",
+                        model="black-forest-labs/FLUX.1-schnell",
+                    )
+                    image_path = self.images.put(gid, image)
+
+                self.store.complete(gid, "image", fake={"image_path": image_path})
+                updated_count += 1
+            except Exception as e:
+                print(f"❌ Error en imagen {gid}: {e}")
+                self.store.fail(gid, "image", e)
+                if isinstance(e, QuotaExhausted):
+                    # El pool ya ha probado todas las keys: no queda ninguna con cuota
+                    print("🛑 Cuota agotada en todas las keys. Guardando progreso y saliendo...")
+                    break
+        claims.close()
+
+        self.store.export_updates(FINAL_DATASET_FILE)
         print(f"✅ Proceso completado. Imágenes añadidas: {updated_count}")
+        self.store.report()
+        self.hf_client.report()
+        self.hf_client.recorder.report()
+
+
+class CaptionFiller:
+    """Etapa caption: describe (img-to-text) la imagen real y la sintética de cada par."""
+
+    def __init__(self):
+        self.processor = ImageProcessor()
+        self.store = open_store()
+        self.images = ImageStore(IMAGES_DIR)
+
+    def run(self, goal=None):
+        done_count = 0
+        claims = self.store.iter_claims("caption")
+        for row in claims:
+            gid = row["group_id"]
+            if goal and done_count >= goal:
+                self.store.release(gid, "caption")
+                break
+            print(f"[*] Captioning: {gid}")
+            real_url = row["real"].get("image_path")
+            real_text = self.processor.img_to_text_from_url(real_url) if real_url else None
+            fake_text = self.processor.img_to_text_from_file(self.images.resolve(row["fake"]["image_path"]))
+            if not fake_text:
+                self.store.fail(gid, "caption", "img-to-text failed")
+                continue
+            self.store.complete(gid, "caption", real={"img_text": real_text}, fake={"img_text": fake_text})
+            done_count += 1
+        claims.close()
+
+        self.store.export_updates(FINAL_DATASET_FILE)
+        print(f"✅ Captions añadidos: {done_count}")
+        self.store.report()
+        self.processor.gemini.recorder.report()
+
+
+def open_store():
+    """Store de estado del pipeline; la primera vez adopta el dataset ya existente."""
+    store = StageStore(STATE_FILE)
+    store.import_dataset(FINAL_DATASET_FILE)
+    return store
 
 if __name__ == "__main__":
     # Puedes cambiar el número aquí para controlar cada ejecución
@@ -251,8 +414,18 @@ if __name__ == "__main__":
     #gen = DatasetGenerator()
     #gen.process_pipeline(goal=GEN_GOAL)
 
+    # Secuencial por defecto, como siempre; --concurrent mantiene varias llamadas en vuelo
+    parser = argparse.ArgumentParser(description="Generación de pares real/fake")
+    parser.add_argument("--concurrent", action="store_true",
+                        help=f"Hasta {TEXT_IN_FLIGHT} llamadas a Gemini y {IMAGE_IN_FLIGHT} a HF en vuelo")
+    args = parser.parse_args()
+
     gen = TextOnlyGenerator()
-    gen.process_pipeline(goal=GEN_GOAL)
+    gen.process_pipeline(goal=GEN_GOAL, concurrent=args.concurrent)
+    #gen.process_batch(goal=GEN_GOAL)  # Batch API (diferido, más barato)
 
     #filler = ImageBackfiller()
-    #filler.run()
\ No newline at end of file
+    #filler.run()
+
+    #captions = CaptionFiller()
+    #captions.run()
\ No newline at end of file
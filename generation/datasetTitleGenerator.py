@@ -1,30 +1,54 @@
+import argparse
 import json
-import os
+import sys
 import numpy as np
 from pathlib import Path
-from google import genai
 from google.genai import types
 from pydantic import BaseModel
 from tqdm import tqdm
 from dotenv import load_dotenv
 
+sys.path.append(str(Path(__file__).resolve().parents[1]))  # Raíz del repo (paquete common)
+import batch_jobs
+from common.jsonl_writer import JsonlAppender
+from gemini_cache import cached_client
+from prompt_budget import TITLE_TOKEN_BUDGET, default_budget
+from provider_pool import gemini_keys, gemini_pool
+
 load_dotenv()
 
 # --- CONFIGURACIÓN DE RUTAS ---
 REAL_NEWS_PATH = Path("scraping/data_collection/real_news_no_duplicates.jsonl")
 OUTPUT_PATH = Path("dataset/titles_data.jsonl")
 
+# Noticias por petición (1 = una petición por noticia, como siempre). Agrupar
+# varias abarata la cabecera del prompt pero cambia la calidad y los fallos:
+# solo con batch_size explícito o --batch-size
+BATCH_SIZE = 1
+CONTENT_TOKENS = TITLE_TOKEN_BUDGET  # Entradilla + frases clave del cuerpo
+TITLE_TOKENS = 100
+TITLE_MODEL = "gemini-2.5-flash-lite"
+
 # Esquema para la respuesta estructurada
 class SyntheticTitle(BaseModel):
     headline: str
 
+class BatchTitle(BaseModel):
+    group_id: str
+    headline: str
+
+class SyntheticTitleBatch(BaseModel):
+    titles: list[BatchTitle]
+
 class TitleGenerator:
     def __init__(self):
-        self.api_key = os.getenv("GEMINI_API_KEY")
-        if not self.api_key:
-            raise ValueError("Configura la variable de entorno GEMINI_API_KEY")
+        if not gemini_keys():
+            raise ValueError("Configura la variable de entorno GEMINI_API_KEY (o GEMINI_API_KEYS)")
         
-        self.client = genai.Client(api_key=self.api_key)
+        self.client = cached_client(gemini_pool())
+        self.budget = default_budget()
+        self.requests = 0
+        self.retried = 0
         self.avg_title_length = self._calculate_avg_title_length()
         self.processed_ids = self._get_processed_ids()
 
@@ -48,25 +72,32 @@ class TitleGenerator:
                     ids.add(json.loads(line)["group_id"])
         return ids
 
-    def generate_title(self, content):
-        """Llama a Gemini para generar un titular basado en el cuerpo de la noticia."""
-        prompt = f"""
+    def _content(self, content, group_id=None):
+        return self.budget.extract(content, CONTENT_TOKENS, group_id=group_id)
+
+    def _title_prompt(self, content, group_id=None):
+        return f"""
         Based on the following news content, write a compelling and accurate headline.
         The headline MUST HAVE a length of approximately {self.avg_title_length} words.
         Maintain a professional journalistic tone.
 
-        CONTENT: {content[:4000]}
+        CONTENT: {self._content(content, group_id)}
         
         OUTPUT FORMAT: JSON {{headline}}
         """
+
+    def generate_title(self, content, group_id=None):
+        """Llama a Gemini para generar un titular basado en el cuerpo de la noticia."""
+        prompt = self._title_prompt(content, group_id)
         try:
+            self.requests += 1
             response = self.client.models.generate_content(
-                model="gemini-2.5-flash-lite",
+                model=TITLE_MODEL,
                 contents=prompt,
                 config=types.GenerateContentConfig(
                     response_mime_type="application/json",
                     response_schema=SyntheticTitle,
-                    max_output_tokens=100
+                    max_output_tokens=TITLE_TOKENS
                 ),
             )
             return response.parsed.headline if response.parsed else None
@@ -74,10 +105,81 @@ class TitleGenerator:
             print(f"Error API: {e}")
             return None
 
-    def run(self, limit=None):
+    def generate_titles(self, articles):
+        """
+        Genera los titulares de varias noticias [(group_id, content)] en una sola
+        petición. Devuelve {group_id: titular}; las que falten, vengan vacías o
+        con un group_id que no es del lote se reintentan una a una.
+        """
+        if len(articles) == 1:
+            gid, content = articles[0]
+            return {gid: self.generate_title(content, gid)}
+
+        blocks = "\n\n".join(f"[group_id: {gid}]\n{self._content(content, gid)}" for gid, content in articles)
+        prompt = f"""
+        For EACH of the following {len(articles)} news articles, write a compelling and accurate headline.
+        Every headline MUST HAVE a length of approximately {self.avg_title_length} words.
+        Maintain a professional journalistic tone. Each headline must only use its own article.
+
+        {blocks}
+
+        OUTPUT FORMAT: JSON {{titles: [{{group_id, headline}}]}} with exactly one item per article,
+        copying each group_id exactly as given.
+        """
+        titles = {}
+        try:
+            self.requests += 1
+            response = self.client.models.generate_content(
+                model=TITLE_MODEL,
+                contents=prompt,
+                config=types.GenerateContentConfig(
+                    response_mime_type="application/json",
+                    response_schema=SyntheticTitleBatch,
+                    max_output_tokens=TITLE_TOKENS * len(articles)
+                ),
+            )
+            if response.parsed:
+                wanted = {gid for gid, _ in articles}
+                for item in response.parsed.titles:
+                    if item.group_id in wanted and item.headline.strip():
+                        titles.setdefault(item.group_id, item.headline.strip())
+        except Exception as e:
+            print(f"Error API (lote de {len(articles)}): {e}")
+
+        # Reintento individual de lo que no ha cuadrado
+        for gid, content in articles:
+            if gid not in titles:
+                self.retried += 1
+                titles[gid] = self.generate_title(content, gid)
+        return titles
+
+    def _write_batch(self, out, batch):
+        titles = self.generate_titles([(d["article_id"], d["content"]) for d in batch])
+        for real_data in batch:
+            group_id = real_data["article_id"]
+            # 1. Titular Real
+            entries = [{
+                "group_id": group_id,
+                "title": real_data["title"],
+                "is_real": 1
+            }]
+
+            # 2. Titular Sintético
+            synthetic_title = titles.get(group_id)
+            if synthetic_title:
+                entries.append({
+                    "group_id": group_id,
+                    "title": synthetic_title,
+                    "is_real": 0
+                })
+            out.append(*entries)  # El par se escribe entero o no se escribe
+            self.processed_ids.add(group_id)
+
+    def run(self, limit=None, batch_size=BATCH_SIZE):
         count = 0
+        batch = []
         with open(REAL_NEWS_PATH, "r", encoding="utf-8") as f_in, \
-            open(OUTPUT_PATH, "a", encoding="utf-8") as f_out:
+            JsonlAppender(OUTPUT_PATH) as out:
             
             for line in tqdm(f_in, desc="Generando titulares"):
                 real_data = json.loads(line)
@@ -86,28 +188,69 @@ class TitleGenerator:
                 if group_id in self.processed_ids:
                     continue
 
-                # 1. Guardar Titular Real
-                real_entry = {
-                    "group_id": group_id,
-                    "title": real_data["title"],
-                    "is_real": 1
-                }
-                f_out.write(json.dumps(real_entry, ensure_ascii=False) + "\n")
-
-                # 2. Generar y Guardar Titular Sintético
-                synthetic_title = self.generate_title(real_data["content"])
-                if synthetic_title:
-                    fake_entry = {
-                        "group_id": group_id,
-                        "title": synthetic_title,
-                        "is_real": 0
-                    }
-                    f_out.write(json.dumps(fake_entry, ensure_ascii=False) + "\n")
-                
+                batch.append(real_data)
                 count += 1
+                if len(batch) >= batch_size or (limit and count >= limit):
+                    self._write_batch(out, batch)
+                    batch = []
                 if limit and count >= limit:
                     break
+            if batch:
+                self._write_batch(out, batch)
+
+        print(f"[*] {count} noticias en {self.requests} peticiones "
+              f"(lotes de {batch_size}, {self.retried} reintentos individuales)")
+        self.client.cache.report()
+        self.client.recorder.report()
+
+    def run_batch(self, limit=None, backend=None, poll_interval=batch_jobs.POLL_INTERVAL):
+        """
+        Modo Batch API: los titulares pendientes se envían como trabajos
+        diferidos y cada par (real + sintético) se escribe junto al recibir su
+        resultado. Los que no tengan resultado válido quedan para otra ejecución.
+        """
+        backend = backend or batch_jobs.default_backend()
+        manifests = batch_jobs.pending("titles", backend)
+        if manifests:
+            print(f"[*] Retomando {len(manifests)} trabajos enviados")
+        else:
+            requests, real_titles = [], {}
+            with open(REAL_NEWS_PATH, "r", encoding="utf-8") as f_in:
+                for line in f_in:
+                    real_data = json.loads(line)
+                    group_id = real_data["article_id"]
+                    if group_id in self.processed_ids or group_id in real_titles:
+                        continue
+                    requests.append(batch_jobs.build_request(
+                        group_id, self._title_prompt(real_data["content"], group_id), SyntheticTitle, TITLE_TOKENS))
+                    real_titles[group_id] = real_data["title"]
+                    if limit and len(requests) >= limit:
+                        break
+            manifests = batch_jobs.submit(backend, "titles", requests, TITLE_MODEL, extra=real_titles) \
+                if requests else []
+
+        written = missing = 0
+        with JsonlAppender(OUTPUT_PATH) as out:
+            for manifest in manifests:
+                if batch_jobs.wait(backend, manifest, poll_interval) == batch_jobs.RUNNING:
+                    continue  # Sigue en curso: se retoma en la próxima ejecución
+                for group_id, title in batch_jobs.results(backend, manifest, SyntheticTitle).items():
+                    if title is None or group_id in self.processed_ids:
+                        missing += title is None
+                        continue
+                    out.append({"group_id": group_id, "title": manifest["extra"][group_id], "is_real": 1},
+                               {"group_id": group_id, "title": title.headline, "is_real": 0})
+                    self.processed_ids.add(group_id)
+                    written += 1
+                out.flush()
+                batch_jobs.mark_merged(manifest)
+        print(f"[*] Batch: {written} pares escritos, {missing} sin resultado (se reintentarán)")
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generación de titulares sintéticos")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE,
+                        help="Noticias por petición a Gemini (por defecto una)")
+    args = parser.parse_args()
+
     generator = TitleGenerator()
-    generator.run(limit=250)
\ No newline at end of file
+    generator.run(limit=250, batch_size=args.batch_size)
\ No newline at end of file
@@ -1,6 +1,10 @@
 import json
+import sys
 from pathlib import Path
 
+sys.path.append(str(Path(__file__).resolve().parents[1]))  # Raíz del repo (paquete common)
+from common.patch_log import iter_records
+
 # Configuración
 MULTIMODAL_FILE = Path("dataset/multimodal_dataset.jsonl")
 SYNTHETIC_OUT = Path("generation/synthetic_news.jsonl")
@@ -11,11 +15,10 @@ def backup_synthetic():
         return
 
     synthetic_count = 0
-    with open(MULTIMODAL_FILE, "r", encoding="utf-8") as f_in, \
-         open(SYNTHETIC_OUT, "w", encoding="utf-8") as f_out:
+    with open(SYNTHETIC_OUT, "w", encoding="utf-8") as f_out:
         
-        for line in f_in:
-            data = json.loads(line)
+        # Con los parches pendientes (imágenes rellenadas) ya aplicados
+        for data in iter_records(MULTIMODAL_FILE):
             # Filtramos solo las que no son reales
             if data.get("is_real") == 0:
                 f_out.write(json.dumps(data, ensure_ascii=False) + "\n")
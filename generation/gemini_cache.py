@@ -0,0 +1,175 @@
+"""
+gemini_cache.py
+---------------
+Caché persistente (SQLite) de respuestas de Gemini.
+
+Los scripts de generación reenvían los mismos prompts en cada reejecución
+(tras un fallo, al repetir un experimento...). Aquí cada llamada a
+`models.generate_content` se identifica por el hash de
+(modelo, contenido, config, esquema) y la respuesta se guarda la primera vez:
+
+  - Un acierto devuelve un objeto con `.text` y `.parsed` (el modelo Pydantic
+    reconstruido a partir del JSON guardado), sin llamar a la API.
+  - Las entradas caducan tras `ttl` segundos y, si la caché supera
+    `max_bytes`, se expulsan las menos usadas recientemente (LRU).
+  - `bypass=True` (o GEMINI_CACHE_BYPASS=1) ignora las entradas guardadas y
+    las sobrescribe con la respuesta nueva.
+
+Solo se guardan respuestas válidas (con `parsed` si hay esquema, con texto si
+no), así que un fallo de formato o de seguridad se reintenta la próxima vez.
+
+Uso: `client = cached_client(genai.Client(...))`; el resto del código no cambia.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+CACHE_FILE = Path(__file__).resolve().parent / "gemini_cache.sqlite"
+CACHE_TTL = 90 * 24 * 3600       # 90 días
+MAX_CACHE_BYTES = 512 * 1024 ** 2  # 512 MB
+
+
+def _canonical(obj):
+    """Representación JSON estable de prompts, Parts y configs para el hash."""
+    if obj is None or isinstance(obj, (str, int, float, bool)):
+        return obj
+    if isinstance(obj, bytes):
+        return {"bytes": hashlib.sha256(obj).hexdigest()}
+    if isinstance(obj, (list, tuple)):
+        return [_canonical(x) for x in obj]
+    if isinstance(obj, dict):
+        return {str(k): _canonical(v) for k, v in sorted(obj.items()) if v is not None}
+    if isinstance(obj, type):
+        # Esquema Pydantic: cambiar un campo cambia la clave
+        if hasattr(obj, "model_json_schema"):
+            return {"schema": obj.model_json_schema()}
+        return obj.__qualname__
+    if hasattr(obj, "__dict__"):
+        return {type(obj).__name__: _canonical(vars(obj))}
+    return str(obj)
+
+
+def request_key(model, contents, config):
+    raw = json.dumps(_canonical([model, contents, config]), sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class CachedResponse:
+    """Respuesta reconstruida desde la caché (mismos atributos que usan los scripts)."""
+
+    def __init__(self, text, parsed):
+        self.text = text
+        self.parsed = parsed
+        self.candidates = []
+
+
+class ResponseCache:
+    def __init__(self, path=None, ttl=CACHE_TTL, max_bytes=MAX_CACHE_BYTES, bypass=None):
+        self.path = Path(path or CACHE_FILE)
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.bypass = os.getenv("GEMINI_CACHE_BYPASS") == "1" if bypass is None else bypass
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key         TEXT PRIMARY KEY,
+                model       TEXT,
+                text        TEXT NOT NULL,
+                size        INTEGER NOT NULL,
+                created     REAL NOT NULL,
+                last_access REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS responses_lru ON responses(last_access);
+        """)
+
+    def get(self, key, schema=None):
+        """CachedResponse para la clave (o None si no está, ha caducado o hay bypass)."""
+        if self.bypass:
+            return None
+        now = time.time()
+        with self._lock:
+            row = self._db.execute("SELECT text, created FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None or now - row[1] > self.ttl:
+                self.misses += 1
+                return None
+            self._db.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+            self._db.commit()
+            self.hits += 1
+        text = row[0]
+        parsed = schema.model_validate_json(text) if hasattr(schema, "model_validate_json") else None
+        return CachedResponse(text, parsed)
+
+    def put(self, key, model, text):
+        now = time.time()
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)",
+                             (key, model, text, len(text.encode("utf-8")), now, now))
+            self._evict(now)
+            self._db.commit()
+
+    def _evict(self, now):
+        self._db.execute("DELETE FROM responses WHERE created < ?", (now - self.ttl,))
+        total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in self._db.execute(
+                "SELECT key, size FROM responses ORDER BY last_access").fetchall():
+            self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+    def report(self):
+        print(f"Caché Gemini: {self.hits} aciertos, {self.misses} fallos"
+              + (" (bypass activo)" if self.bypass else ""))
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+class _CachedModels:
+    def __init__(self, models, cache):
+        self._models = models
+        self._cache = cache
+
+    def generate_content(self, *, model, contents, config=None):
+        schema = getattr(config, "response_schema", None)
+        key = request_key(model, contents, config)
+        hit = self._cache.get(key, schema)
+        if hit is not None:
+            return hit
+
+        response = self._models.generate_content(model=model, contents=contents, config=config)
+        valid = response.parsed is not None if schema is not None else bool(response.text)
+        if valid:
+            self._cache.put(key, model, response.text)
+        return response
+
+    def __getattr__(self, name):
+        return getattr(self._models, name)
+
+
+class CachedClient:
+    """Envuelve un genai.Client: `client.models.generate_content` pasa por la caché."""
+
+    def __init__(self, client, cache=None):
+        self._client = client
+        self.cache = cache or ResponseCache()
+        self.models = _CachedModels(client.models, self.cache)
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
+
+
+def cached_client(client, cache=None):
+    return CachedClient(client, cache)
@@ -1,8 +1,8 @@
-import os
 from dotenv import load_dotenv
-from google import genai
 from google.genai import types
 from pydantic import BaseModel
+from gemini_cache import cached_client
+from provider_pool import gemini_pool
 
 load_dotenv()
 
@@ -12,7 +12,7 @@ class SyntheticNews(BaseModel):
     technique: str
 
 def run_generation(real_headline: str):
-    client = genai.Client(api_key=os.getenv("GEMINI_API_KEY"))
+    client = cached_client(gemini_pool())
 
     prompt = f"""
     Eres un redactor de noticias experto.
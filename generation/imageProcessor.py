@@ -2,21 +2,25 @@
 imageProcessor.py
 -----------------
 Enriquece titles_data.jsonl con:
-  - img_path:  URL (para reales) o ruta local en dataset/fake_images/ (para sintéticas)
+  - img_path:  URL (para reales) o ruta local en dataset/fake_images/ (para sintéticas, ver image_store.py)
   - img_text:  texto generado a partir de la imagen (img-to-text via Gemini)
 
 Las noticias se procesan SIEMPRE como pares (real + fake). Si alguna falla, no se escribe ninguna.
 """
 
-import os
+import sys
 import json
 import time
 import httpx
 from pathlib import Path
 from dotenv import load_dotenv
-from google import genai
 from google.genai import types
-from huggingface_hub import InferenceClient
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))  # Raíz del repo (paquete common)
+from common.jsonl_writer import JsonlAppender
+from gemini_cache import cached_client
+from image_store import ImageStore, mime_type
+from provider_pool import gemini_pool, hf_pool
 
 load_dotenv()
 
@@ -79,9 +83,12 @@ def group_titles(path: Path) -> dict:
 
 # ─── PROCESADOR ──────────────────────────────────────────────────────
 class ImageProcessor:
+    courtesy_delay = 2  # Segundos entre pares
+
     def __init__(self):
-        self.gemini = genai.Client(api_key=os.getenv("GEMINI_API_KEY"))
-        self.hf     = InferenceClient(api_key=os.getenv("FIRST_HF_TK"))
+        self.gemini = cached_client(gemini_pool())
+        self.hf     = hf_pool()
+        self.images = ImageStore(FAKE_IMAGES_DIR)
 
     # ── Img-to-text ──────────────────────────────────────────────────
     def img_to_text_from_url(self, image_url: str) -> str | None:
@@ -112,7 +119,7 @@ class ImageProcessor:
         )
         try:
             img_bytes = file_path.read_bytes()
-            mime = "image/png"
+            mime = mime_type(file_path)
             response = self.gemini.models.generate_content(
                 model="gemini-2.5-flash-lite",
                 contents=[
@@ -127,21 +134,18 @@ class ImageProcessor:
             return None
 
     # ── Generación de imagen ─────────────────────────────────────────
-    def generate_fake_image(self, headline: str, group_id: str) -> Path | None:
-        """Genera imagen con FLUX y la guarda en fake_images/."""
-        file_name = f"{group_id}_fake.png"
-        img_path  = FAKE_IMAGES_DIR / file_name
-
-        if img_path.exists():
-            return img_path
+    def generate_fake_image(self, headline: str, group_id: str) -> str | None:
+        """Genera imagen con FLUX, la guarda en el almacén de fake_images/ y devuelve su img_path."""
+        existing = self.images.get(group_id)
+        if existing:
+            return existing
 
         try:
             image = self.hf.text_to_image(
                 prompt=f"Professional photojournalism, high quality, realistic news photo: {headline}",
                 model="black-forest-labs/FLUX.1-schnell",
             )
-            image.save(img_path)
-            return img_path
+            return self.images.put(group_id, image)
         except Exception as e:
             print(f"  ⚠️  Image generation error: {e}")
             return None
@@ -168,80 +172,80 @@ class ImageProcessor:
             print(f"  Objetivo esta ejecución   : {goal}")
         print("─" * 60)
 
-        for idx, (gid, pair) in enumerate(title_groups.items(), start=1):
-            # ── Control de ejecución ──
-            if goal and ok_count >= goal:
-                print(f"\n✅ Objetivo alcanzado: {ok_count} pares nuevos.")
-                break
-
-            # ── Ya procesado ──
-            if gid in processed_ids:
-                skipped += 1
-                continue
-
-            # ── Verificar que el par esté completo ──
-            if "real" not in pair or "fake" not in pair:
-                print(f"  [{idx}/{total_groups}] ❌ Par incompleto para {gid}, saltando.")
-                fail_count += 1
-                continue
-
-            real_entry = pair["real"]
-            fake_entry = pair["fake"]
-
-            print(f"  [{idx}/{total_groups}] Procesando par: {gid[:16]}…")
-
-            # ═══════════════ REAL ═══════════════
-            image_url = real_news_index.get(gid, "")
-            if not image_url:
-                print(f"    → Sin image_url para la real. Par descartado.")
-                fail_count += 1
-                continue
-
-            real_img_text = self.img_to_text_from_url(image_url)
-            if not real_img_text:
-                print(f"    → img-to-text REAL falló. Par descartado.")
-                fail_count += 1
-                continue
-
-            # ═══════════════ FAKE ═══════════════
-            fake_img_path = self.generate_fake_image(fake_entry["title"], gid)
-            if not fake_img_path:
-                print(f"    → Generación de imagen FAKE falló. Par descartado.")
-                fail_count += 1
-                continue
-
-            fake_img_text = self.img_to_text_from_file(fake_img_path)
-            if not fake_img_text:
-                print(f"    → img-to-text FAKE falló. Par descartado.")
-                fail_count += 1
-                continue
-
-            # ═══════════════ ESCRIBIR PAR ═══════════════
-            out_real = {
-                "group_id":  gid,
-                "title":     real_entry["title"],
-                "is_real":   1,
-                "img_path":  image_url,
-                "img_text":  real_img_text,
-            }
-            out_fake = {
-                "group_id":  gid,
-                "title":     fake_entry["title"],
-                "is_real":   0,
-                "img_path":  f"dataset/fake_images/{gid}_fake.png",
-                "img_text":  fake_img_text,
-            }
-
-            with open(OUTPUT_FILE, "a", encoding="utf-8") as f:
-                f.write(json.dumps(out_real, ensure_ascii=False) + "\n")
-                f.write(json.dumps(out_fake, ensure_ascii=False) + "\n")
-
-            processed_ids.add(gid)
-            ok_count += 1
-            print(f"    ✅ Par guardado ({ok_count} nuevos)")
-
-            # Delay cortesía entre pares
-            time.sleep(2)
+        # Un único descriptor abierto; cada par se vuelca de forma atómica
+        with JsonlAppender(OUTPUT_FILE, max_records=8) as writer:
+            for idx, (gid, pair) in enumerate(title_groups.items(), start=1):
+                # ── Control de ejecución ──
+                if goal and ok_count >= goal:
+                    print(f"\n✅ Objetivo alcanzado: {ok_count} pares nuevos.")
+                    break
+
+                # ── Ya procesado ──
+                if gid in processed_ids:
+                    skipped += 1
+                    continue
+
+                # ── Verificar que el par esté completo ──
+                if "real" not in pair or "fake" not in pair:
+                    print(f"  [{idx}/{total_groups}] ❌ Par incompleto para {gid}, saltando.")
+                    fail_count += 1
+                    continue
+
+                real_entry = pair["real"]
+                fake_entry = pair["fake"]
+
+                print(f"  [{idx}/{total_groups}] Procesando par: {gid[:16]}…")
+
+                # ═══════════════ REAL ═══════════════
+                image_url = real_news_index.get(gid, "")
+                if not image_url:
+                    print(f"    → Sin image_url para la real. Par descartado.")
+                    fail_count += 1
+                    continue
+
+                real_img_text = self.img_to_text_from_url(image_url)
+                if not real_img_text:
+                    print(f"    → img-to-text REAL falló. Par descartado.")
+                    fail_count += 1
+                    continue
+
+                # ═══════════════ FAKE ═══════════════
+                fake_img_path = self.generate_fake_image(fake_entry["title"], gid)
+                if not fake_img_path:
+                    print(f"    → Generación de imagen FAKE falló. Par descartado.")
+                    fail_count += 1
+                    continue
+
+                fake_img_text = self.img_to_text_from_file(self.images.resolve(fake_img_path))
+                if not fake_img_text:
+                    print(f"    → img-to-text FAKE falló. Par descartado.")
+                    fail_count += 1
+                    continue
+
+                # ═══════════════ ESCRIBIR PAR ═══════════════
+                out_real = {
+                    "group_id":  gid,
+                    "title":     real_entry["title"],
+                    "is_real":   1,
+                    "img_path":  image_url,
+                    "img_text":  real_img_text,
+                }
+                out_fake = {
+                    "group_id":  gid,
+                    "title":     fake_entry["title"],
+                    "is_real":   0,
+                    "img_path":  fake_img_path,
+                    "img_text":  fake_img_text,
+                }
+
+                writer.append(out_real, out_fake)
+
+                processed_ids.add(gid)
+                ok_count += 1
+                print(f"    ✅ Par guardado ({ok_count} nuevos)")
+
+                # Delay cortesía entre pares
+                time.sleep(self.courtesy_delay)
 
         # ── Resumen final ──
         print("\n" + "═" * 60)
@@ -250,6 +254,8 @@ class ImageProcessor:
         print(f"    Pares descartados     : {fail_count}")
         print(f"    Pares saltados (ya ok): {skipped}")
         print("═" * 60)
+        self.gemini.cache.report()
+        self.gemini.recorder.report()
 
 
 # ─── MAIN ────────────────────────────────────────────────────────────
@@ -0,0 +1,200 @@
+"""
+image_store.py
+--------------
+Almacén de las imágenes fake generadas: por contenido y repartido en
+subdirectorios, en lugar de un único dataset/fake_images/ plano.
+
+  - Cada imagen se guarda como <raíz>/<h[:2]>/<h[2:4]>/<h>.<ext>, con h el
+    sha256 de los bytes codificados. Dos imágenes iguales ocupan una sola vez
+    y ningún directorio pasa de unos pocos cientos de ficheros.
+  - Se codifica en IMAGE_FORMAT: "png" (optimizado, sin pérdida) o "webp"
+    (sin pérdida por defecto, WEBP_LOSSLESS). Se puede elegir con la variable
+    FAKE_IMAGE_FORMAT.
+  - Un manifiesto SQLite (<raíz>/manifest.sqlite) indexa group_id → ruta,
+    así que comprobar si un grupo ya tiene imagen es una consulta, no un
+    stat() en un directorio enorme.
+  - resolve() acepta tanto las rutas nuevas como las antiguas
+    ("dataset/fake_images/<group_id>_fake.png") aunque el fichero ya se haya
+    migrado, así que los image_path que ya hay en los JSONL siguen valiendo.
+
+Migración de las imágenes planas existentes (se puede repetir; las que ya se
+migraron no se tocan). El nombre antiguo se conserva como enlace duro (o
+simbólico) al fichero del almacén, sin ocupar más disco, porque los notebooks
+de models/ abren la imagen por ese nombre:
+
+    python generation/image_store.py migrate [--reencode]
+    python generation/image_store.py stats
+"""
+
+import argparse
+import hashlib
+import io
+import os
+import re
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+IMAGES_DIR = ROOT_DIR / "dataset" / "fake_images"
+IMAGE_FORMAT = os.getenv("FAKE_IMAGE_FORMAT", "png")
+WEBP_LOSSLESS = True
+
+_LEGACY_NAME = re.compile(r"(.+)_fake\.png")
+FORMATS = ("png", "webp")
+MIME_TYPES = {".png": "image/png", ".webp": "image/webp", ".jpg": "image/jpeg", ".jpeg": "image/jpeg"}
+
+
+def _check_format(fmt):
+    fmt = fmt.lower()
+    if fmt not in FORMATS:
+        raise ValueError(f"Formato de imagen no soportado: {fmt!r} (usa {' o '.join(FORMATS)})")
+    return fmt
+
+
+def _encode(image, fmt):
+    """Bytes de la imagen en `fmt` (PIL o cualquier objeto con .save(fichero, format=...))."""
+    fmt = _check_format(fmt)
+    options = {"lossless": WEBP_LOSSLESS} if fmt == "webp" else {"optimize": True}
+    buf = io.BytesIO()
+    image.save(buf, format=fmt.upper(), **options)
+    return buf.getvalue()
+
+
+def mime_type(path):
+    """Tipo MIME de una imagen guardada, según su extensión."""
+    suffix = Path(path).suffix.lower()
+    if suffix not in MIME_TYPES:
+        raise ValueError(f"Extensión de imagen desconocida: {path}")
+    return MIME_TYPES[suffix]
+
+
+class ImageStore:
+    def __init__(self, root=None, fmt=None):
+        self.fmt = _check_format(fmt or IMAGE_FORMAT)
+        self.root = Path(root or IMAGES_DIR).resolve()
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.root / "manifest.sqlite", check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS images (
+                group_id TEXT PRIMARY KEY,
+                digest   TEXT NOT NULL,
+                path     TEXT NOT NULL,      -- relativa a la raíz del repo
+                size     INTEGER NOT NULL,
+                format   TEXT NOT NULL,
+                created  REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS images_digest ON images(digest);
+        """)
+
+    def _rel(self, path):
+        try:
+            return path.relative_to(ROOT_DIR).as_posix()
+        except ValueError:
+            return str(path)
+
+    def get(self, group_id):
+        """Ruta (para image_path) de la imagen del grupo, o None si aún no tiene."""
+        with self._lock:
+            row = self._db.execute("SELECT path FROM images WHERE group_id = ?", (group_id,)).fetchone()
+        return row[0] if row else None
+
+    def put_bytes(self, group_id, data, ext):
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.root / digest[:2] / digest[2:4] / f"{digest}.{ext}"
+        if not path.exists():
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_name(f".{path.name}.{threading.get_ident()}.tmp")
+            tmp.write_bytes(data)
+            os.replace(tmp, path)
+        rel = self._rel(path)
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO images VALUES (?, ?, ?, ?, ?, ?)",
+                             (group_id, digest, rel, len(data), ext, time.time()))
+            self._db.commit()
+        return rel
+
+    def put(self, group_id, image):
+        """Guarda la imagen generada del grupo y devuelve su ruta para image_path."""
+        return self.put_bytes(group_id, _encode(image, self.fmt), self.fmt)
+
+    def resolve(self, image_path):
+        """Ruta absoluta de un image_path (nuevo o antiguo) o de un group_id."""
+        path = Path(image_path)
+        full = path if path.is_absolute() else ROOT_DIR / path
+        if full.exists():
+            return full
+        match = _LEGACY_NAME.fullmatch(path.name)
+        rel = self.get(match.group(1) if match else str(image_path))
+        if rel:
+            return ROOT_DIR / rel
+        if match and (self.root / path.name).exists():
+            return self.root / path.name  # Plana y aún sin migrar, en otra raíz
+        return full
+
+    def _link_legacy(self, legacy, rel):
+        """Sustituye la copia plana por un enlace al fichero del almacén (si se puede)."""
+        target = Path(rel) if Path(rel).is_absolute() else ROOT_DIR / rel
+        tmp = legacy.with_name(f".{legacy.name}.tmp")
+        try:
+            os.link(target, tmp)
+        except OSError:
+            try:
+                os.symlink(target, tmp)
+            except OSError:
+                return  # Sin enlaces en este sistema de ficheros: se deja la copia
+        os.replace(tmp, legacy)
+
+    def _migrated(self):
+        with self._lock:
+            return {row[0] for row in self._db.execute("SELECT group_id FROM images")}
+
+    def _legacy_pending(self):
+        """Imágenes planas <group_id>_fake.png que aún no están en el manifiesto."""
+        migrated = self._migrated()
+        for legacy in sorted(self.root.glob("*_fake.png")):
+            group_id = _LEGACY_NAME.fullmatch(legacy.name).group(1)
+            if group_id not in migrated:
+                yield group_id, legacy
+
+    def migrate(self, reencode=False):
+        """Pasa las imágenes planas <group_id>_fake.png al almacén. Devuelve cuántas."""
+        moved = 0
+        for group_id, legacy in list(self._legacy_pending()):
+            if reencode and self.fmt != "png":
+                # Recodificada ya no es el mismo PNG: el fichero plano se queda como está
+                from PIL import Image
+                with Image.open(legacy) as image:
+                    self.put(group_id, image)
+            else:
+                self._link_legacy(legacy, self.put_bytes(group_id, legacy.read_bytes(), "png"))
+            moved += 1
+        return moved
+
+    def stats(self):
+        with self._lock:
+            n, size = self._db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM images").fetchone()
+            unique = self._db.execute("SELECT COUNT(DISTINCT digest) FROM images").fetchone()[0]
+        legacy = sum(1 for _ in self._legacy_pending())
+        return {"groups": n, "unique_files": unique, "bytes": size, "legacy_flat": legacy}
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Almacén de imágenes fake (por contenido y repartido)")
+    parser.add_argument("command", choices=["migrate", "stats"])
+    parser.add_argument("--root", type=Path, default=IMAGES_DIR)
+    parser.add_argument("--reencode", action="store_true", help="Recodificar al migrar (con FAKE_IMAGE_FORMAT=webp)")
+    args = parser.parse_args()
+    store = ImageStore(args.root)
+    if args.command == "migrate":
+        print(f"✅ Imágenes migradas: {store.migrate(reencode=args.reencode)}")
+    s = store.stats()
+    print(f"   - {s['groups']} grupos, {s['unique_files']} ficheros únicos, "
+          f"{s['bytes'] / 1024 ** 2:.1f} MB, {s['legacy_flat']} aún en formato plano")
@@ -0,0 +1,165 @@
+"""
+prompt_budget.py
+----------------
+Ajuste del cuerpo de la noticia a un presupuesto de tokens antes de meterlo en
+el prompt, en lugar de los recortes fijos (800 palabras, 4000 caracteres).
+
+  - fit_lead(): para la paráfrasis. Frases completas desde el principio hasta
+    llenar el presupuesto (1000 tokens, lo mismo que el recorte de 800
+    palabras). La longitud objetivo la da target_words() sobre el artículo
+    real, con el mismo tope de 800 palabras de antes: los fakes siguen la
+    distribución de longitudes de los reales aunque el presupuesto recorte
+    alguna frase más.
+  - extract(): para los titulares. Compresión extractiva rápida: las primeras
+    LEAD_SENTENCES frases (la entradilla) más las frases más representativas
+    del resto (frecuencia de sus términos en el artículo), en su orden original.
+
+Los tokens se cuentan con el tokenizador local de google-genai
+(google.genai.local_tokenizer, necesita sentencepiece); si no está disponible
+se estima a ~4 caracteres por token.
+
+El resultado se guarda en memoria por (group_id, tipo, presupuesto), así que
+los reintentos de un mismo grupo no vuelven a tokenizar.
+"""
+
+import hashlib
+import math
+import re
+import threading
+from collections import Counter, OrderedDict
+
+MODEL = "gemini-2.5-flash-lite"
+PARAPHRASE_TOKEN_BUDGET = 1000   # ~800 palabras de noticia en inglés: el recorte de antes
+PARAPHRASE_MAX_WORDS = 800       # Tope de la longitud objetivo de la paráfrasis
+TITLE_TOKEN_BUDGET = 256         # Antes content[:4000] (~1000 tokens)
+LEAD_SENTENCES = 2
+MAX_ENTRIES = 20_000             # Grupos guardados en la caché en memoria
+
+_SENTENCE_END = re.compile(r"(?<=[.!?…])[\"'»”’)\]]*\s+|\n+")
+_WORD = re.compile(r"\w+", re.UNICODE)
+STOPWORDS = set("""
+    the a an and or but of to in on at for with by from as is are was were be been being has have had
+    it its this that these those he she they them his her their we our you your i not no will would
+    can could said says also after before about into over than then there which who whom what when
+    where while more most other some such only just very el la los las un una y o de del en con por
+    para que se su sus al es son fue como más pero
+""".split())
+
+
+def split_sentences(text):
+    return [s.strip() for s in _SENTENCE_END.split(text) if s and s.strip()]
+
+
+def target_words(text, max_words=PARAPHRASE_MAX_WORDS):
+    """Palabras que debe tener la paráfrasis: las del artículo real, hasta `max_words`."""
+    return min(len(text.split()), max_words)
+
+
+class _TokenCounter:
+    def __init__(self, model):
+        self.exact = False
+        try:
+            from google.genai.local_tokenizer import LocalTokenizer
+            self._tokenizer = LocalTokenizer(model_name=model)
+            self.exact = True
+        except Exception:
+            self._tokenizer = None
+
+    def __call__(self, text):
+        if not text:
+            return 0
+        if self._tokenizer is not None:
+            return self._tokenizer.count_tokens(text).total_tokens
+        return math.ceil(len(text) / 4)
+
+
+class PromptBudget:
+    def __init__(self, model=MODEL, max_entries=MAX_ENTRIES):
+        self.count = _TokenCounter(model)
+        self.max_entries = max_entries
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _cached(self, kind, group_id, text, budget, build):
+        if group_id is None:
+            return build()
+        key = (kind, group_id, budget)
+        digest = hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest()
+        with self._lock:
+            hit = self._cache.get(key)
+            if hit and hit[0] == digest:
+                self._cache.move_to_end(key)
+                return hit[1]
+        result = build()
+        with self._lock:
+            self._cache[key] = (digest, result)
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+        return result
+
+    def _truncate(self, sentence, budget):
+        """Corta una frase demasiado larga por palabras (proporcional a sus tokens)."""
+        words = sentence.split()
+        tokens = self.count(sentence)
+        keep = max(1, int(len(words) * budget / tokens)) if tokens else len(words)
+        while keep > 1 and self.count(" ".join(words[:keep])) > budget:
+            keep = int(keep * 0.9)
+        return " ".join(words[:keep])
+
+    def fit_lead(self, text, budget=PARAPHRASE_TOKEN_BUDGET, group_id=None):
+        """Frases completas desde el inicio que caben en `budget` tokens."""
+        def build():
+            if self.count(text) <= budget:
+                return text
+            kept, used = [], 0
+            for sentence in split_sentences(text):
+                tokens = self.count(sentence)
+                if used + tokens > budget:
+                    if not kept:
+                        kept.append(self._truncate(sentence, budget))
+                    break
+                kept.append(sentence)
+                used += tokens
+            return " ".join(kept)
+        return self._cached("lead", group_id, text, budget, build)
+
+    def extract(self, text, budget=TITLE_TOKEN_BUDGET, group_id=None, lead=LEAD_SENTENCES):
+        """Entradilla + frases más representativas que caben en `budget` tokens."""
+        def build():
+            if self.count(text) <= budget:
+                return text
+            sentences = split_sentences(text)
+            terms = [[w for w in _WORD.findall(s.lower()) if len(w) > 2 and w not in STOPWORDS]
+                     for s in sentences]
+            tf = Counter(w for words in terms for w in words)
+
+            def salience(i):
+                if not terms[i]:
+                    return 0.0
+                return sum(tf[w] for w in set(terms[i])) / math.sqrt(len(terms[i]))
+
+            order = list(range(min(lead, len(sentences))))
+            order += sorted(range(len(order), len(sentences)), key=salience, reverse=True)
+            chosen, used = set(), 0
+            for i in order:
+                tokens = self.count(sentences[i])
+                if used + tokens <= budget:
+                    chosen.add(i)
+                    used += tokens
+            if not chosen:
+                return self._truncate(sentences[0], budget)
+            return " ".join(sentences[i] for i in sorted(chosen))
+        return self._cached("extract", group_id, text, budget, build)
+
+
+_default = None
+_default_lock = threading.Lock()
+
+
+def default_budget():
+    """PromptBudget compartido por los generadores del proceso."""
+    global _default
+    with _default_lock:
+        if _default is None:
+            _default = PromptBudget()
+        return _default
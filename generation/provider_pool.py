@@ -0,0 +1,198 @@
+"""
+provider_pool.py
+----------------
+Pool de credenciales (y opcionalmente modelos) por proveedor, con failover.
+
+Cada miembro del pool es un cliente con su propia API key. Para cada llamada
+se elige el miembro más sano:
+
+  1. que no esté en enfriamiento,
+  2. con menor tasa de error reciente (media móvil exponencial),
+  3. con menos llamadas en vuelo y más cuota restante estimada.
+
+Ante un 402 (créditos agotados) la key se enfría QUOTA_COOLDOWN segundos y la
+llamada se repite con otra; ante un 429, RATE_COOLDOWN segundos. Solo si todas
+las keys están enfriándose durante más de `max_wait` se lanza QuotaExhausted;
+si el enfriamiento es corto se espera, así la etapa sigue saturada en lugar de
+abortar el lote.
+
+Las keys se leen de las variables de entorno de siempre más sus variantes:
+  - HF:     FIRST_HF_TK, SECOND_HF_TK, THIRD_HF_TK... y/o HF_TOKENS="tk1,tk2"
+  - Gemini: GEMINI_API_KEY y/o GEMINI_API_KEYS="k1,k2"
+
+Los clientes se crean con la fábrica registrada para cada proveedor
+(set_client_factory); por defecto genai.Client e InferenceClient. El benchmark
+(generation/benchmark) registra aquí sus stand-ins locales.
+
+GeminiPool expone `.models.generate_content(...)` y HFPool `.text_to_image(...)`,
+así que sustituyen al cliente sin tocar las llamadas (y se pueden envolver con
+cached_client o AdaptiveLimiter). Cada intento queda registrado en el
+CallRecorder del pool (ver call_metrics.py).
+"""
+
+import os
+import threading
+import time
+
+from call_metrics import default_recorder
+from throttle import QuotaExhausted, error_status
+
+RATE_COOLDOWN = 30          # s de pausa de una key tras un 429
+QUOTA_COOLDOWN = 3600       # s de pausa de una key tras un 402
+MAX_WAIT = 120              # Espera máxima a que alguna key vuelva
+ERROR_DECAY = 0.2           # Peso de la última llamada en la tasa de error
+HF_TOKEN_VARS = ["FIRST_HF_TK", "SECOND_HF_TK", "THIRD_HF_TK", "FOURTH_HF_TK", "FIFTH_HF_TK"]
+
+_factories = {}  # proveedor -> (factory(key) -> cliente, keys o None)
+
+
+def _env_keys(single_vars, list_var):
+    keys = [os.getenv(v) for v in single_vars]
+    keys += (os.getenv(list_var) or "").split(",")
+    return list(dict.fromkeys(k.strip() for k in keys if k and k.strip()))
+
+
+def hf_tokens():
+    return _env_keys(HF_TOKEN_VARS, "HF_TOKENS")
+
+
+def gemini_keys():
+    return _env_keys(["GEMINI_API_KEY"], "GEMINI_API_KEYS")
+
+
+class PoolMember:
+    def __init__(self, name, client, model=None, quota=None):
+        self.name = name
+        self.client = client
+        self.model = model            # Si se indica, sustituye al modelo de la llamada
+        self.remaining = quota        # Cuota restante estimada (None = desconocida)
+        self.error_rate = 0.0
+        self.in_flight = 0
+        self.calls = 0
+        self.failures = 0
+        self.cooldown_until = 0.0
+
+
+class ProviderPool:
+    def __init__(self, name, members, max_wait=MAX_WAIT, recorder=None):
+        if not members:
+            raise ValueError(f"El pool {name} no tiene credenciales")
+        self.name = name
+        self.members = members
+        self.max_wait = max_wait
+        self.recorder = recorder or default_recorder()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_keys(cls, name, keys, factory, quota=None, **kwargs):
+        """Un miembro por key; sin keys, un único cliente con la configuración por defecto."""
+        members = [PoolMember(f"key#{i + 1}", factory(k), quota=quota) for i, k in enumerate(keys)]
+        return cls(name, members or [PoolMember("default", factory(None), quota=quota)], **kwargs)
+
+    def _pick(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                alive = [m for m in self.members if m.remaining != 0]
+                ready = [m for m in alive if m.cooldown_until <= now]
+                if ready:
+                    best = min(ready, key=lambda m: (round(m.error_rate, 1), m.in_flight,
+                                                     -(m.remaining if m.remaining is not None else 1e9)))
+                    best.in_flight += 1
+                    return best
+                wait = min(m.cooldown_until for m in alive) - now if alive else float("inf")
+            if wait > self.max_wait:
+                raise QuotaExhausted(f"Todas las keys de {self.name} están agotadas")
+            print(f"⏳ {self.name}: todas las keys en enfriamiento, esperando {wait:.0f}s")
+            time.sleep(max(wait, 0.1))
+
+    def _done(self, member, status=None, ok=True):
+        with self._lock:
+            member.in_flight -= 1
+            member.calls += 1
+            member.error_rate = (1 - ERROR_DECAY) * member.error_rate + ERROR_DECAY * (0.0 if ok else 1.0)
+            if ok:
+                if member.remaining:
+                    member.remaining -= 1
+                return
+            member.failures += 1
+            if status == 402:
+                member.cooldown_until = time.monotonic() + QUOTA_COOLDOWN
+                member.remaining = None  # Se vuelve a probar tras el enfriamiento
+            elif status == 429:
+                member.cooldown_until = time.monotonic() + RATE_COOLDOWN
+
+    def call(self, method, **kwargs):
+        """Llama a `method` (p.ej. "models.generate_content") en el miembro más sano, con failover."""
+        last_error = None
+        for attempt in range(len(self.members) + 1):
+            member = self._pick()
+            target = member.client
+            for attr in method.split("."):
+                target = getattr(target, attr)
+            if member.model and "model" in kwargs:
+                kwargs = dict(kwargs, model=member.model)
+            started = time.monotonic()
+            try:
+                result = target(**kwargs)
+            except Exception as e:
+                status = error_status(e)
+                self._done(member, status, ok=False)
+                self.recorder.record(self.name, member.name, kwargs, started, status=status, error=e, attempt=attempt)
+                if status not in (402, 429):
+                    raise
+                print(f"🔁 {self.name} {member.name}: HTTP {status}, se prueba otra key")
+                last_error = e
+                continue
+            self._done(member)
+            self.recorder.record(self.name, member.name, kwargs, started, response=result, attempt=attempt)
+            return result
+        raise last_error
+
+    def report(self):
+        for m in self.members:
+            cooling = max(0, m.cooldown_until - time.monotonic())
+            print(f"   - {self.name} {m.name}: {m.calls} llamadas, {m.failures} fallos"
+                  + (f", enfriando {cooling:.0f}s" if cooling else ""))
+
+
+class GeminiPool(ProviderPool):
+    """Pool de genai.Client: `pool.models.generate_content(...)`."""
+
+    @property
+    def models(self):
+        return self
+
+    def generate_content(self, **kwargs):
+        return self.call("models.generate_content", **kwargs)
+
+
+class HFPool(ProviderPool):
+    """Pool de InferenceClient: `pool.text_to_image(...)`."""
+
+    def text_to_image(self, **kwargs):
+        return self.call("text_to_image", **kwargs)
+
+
+def set_client_factory(provider, factory, keys=None):
+    """Sustituye cómo se crean los clientes de "Gemini" o "HF" (factory=None restaura el real)."""
+    if factory is None:
+        _factories.pop(provider, None)
+    else:
+        _factories[provider] = (factory, keys)
+
+
+def gemini_pool(**kwargs):
+    if "Gemini" in _factories:
+        factory, keys = _factories["Gemini"]
+        return GeminiPool.from_keys("Gemini", keys or gemini_keys(), factory, **kwargs)
+    from google import genai
+    return GeminiPool.from_keys("Gemini", gemini_keys(), lambda k: genai.Client(api_key=k), **kwargs)
+
+
+def hf_pool(**kwargs):
+    if "HF" in _factories:
+        factory, keys = _factories["HF"]
+        return HFPool.from_keys("HF", keys or hf_tokens(), factory, **kwargs)
+    from huggingface_hub import InferenceClient
+    return HFPool.from_keys("HF", hf_tokens(), lambda k: InferenceClient(api_key=k), **kwargs)
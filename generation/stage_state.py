@@ -0,0 +1,312 @@
+"""
+stage_state.py
+--------------
+Estado persistente (SQLite) de cada group_id a lo largo del pipeline de
+generación:  text → image → caption.
+
+  - Cada etapa de cada grupo tiene estado (pending / running / batched / done /
+    failed), nº de intentos, último error y fecha de actualización.  `batched`
+    guarda además el trabajo de la Batch API que tiene el grupo (columna job).
+  - Los workers piden trabajo con claim()/iter_claims(): solo se leen las filas
+    pendientes de esa etapa (cuya etapa anterior ya está hecha), nunca el
+    dataset entero. Al completar una etapa se encola la siguiente.
+  - Los registros del par (real + fake) viven en la tabla `groups`; la
+    exportación a JSONL es un paso aparte e incremental: export() solo añade
+    los pares que aún no se han exportado y export_updates() manda los cambios
+    posteriores al log de parches del dataset.
+  - Lo que quedó `running` tras una caída vuelve a `pending` al abrir el store;
+    lo `batched` no: su trabajo sigue vivo y solo se suelta al fusionarlo
+    (complete/fail) o al cancelarlo (release_batch).
+
+La primera vez se importa el multimodal_dataset.jsonl existente (pares ya
+exportados) y las noticias reales se registran por delta desde su JSONL.
+"""
+
+import json
+import sqlite3
+import time
+from pathlib import Path
+
+from common.id_index import file_fingerprint
+from common.jsonl_writer import JsonlAppender
+from common.patch_log import append_patches, iter_records
+
+STAGES = ("text", "image", "caption")
+MAX_ATTEMPTS = 3
+CLAIM_BATCH = 32
+
+
+class StageStore:
+    def __init__(self, path, max_attempts=MAX_ATTEMPTS):
+        self.path = Path(path)
+        self.max_attempts = max_attempts
+        self._db = sqlite3.connect(self.path)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS groups (
+                seq      INTEGER PRIMARY KEY AUTOINCREMENT,
+                group_id TEXT UNIQUE NOT NULL,
+                source   TEXT,               -- noticia real de origen
+                real     TEXT,               -- registro is_real=1 del dataset
+                fake     TEXT,               -- registro is_real=0 del dataset
+                exported INTEGER NOT NULL DEFAULT 0,
+                patch    TEXT                -- campos cambiados después de exportarse
+            );
+            CREATE TABLE IF NOT EXISTS stages (
+                group_id TEXT NOT NULL,
+                stage    TEXT NOT NULL,
+                status   TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                error    TEXT,
+                updated  REAL NOT NULL,
+                job      TEXT,               -- trabajo batch que lo tiene (status batched)
+                PRIMARY KEY (group_id, stage)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS stages_todo ON stages(stage, status);
+            CREATE INDEX IF NOT EXISTS groups_export ON groups(exported);
+            CREATE TABLE IF NOT EXISTS meta (k TEXT PRIMARY KEY, v TEXT);
+        """)
+        if "job" not in {c[1] for c in self._db.execute("PRAGMA table_info(stages)")}:
+            self._db.execute("ALTER TABLE stages ADD COLUMN job TEXT")  # stores anteriores
+        self._db.execute("UPDATE stages SET status = 'pending' WHERE status = 'running'")
+        self._db.commit()
+
+    def _meta(self, k):
+        row = self._db.execute("SELECT v FROM meta WHERE k = ?", (k,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, **values):
+        self._db.executemany("INSERT OR REPLACE INTO meta VALUES (?, ?)",
+                             [(k, str(v)) for k, v in values.items()])
+
+    def _set_stage(self, group_id, stage, status, error=None):
+        self._db.execute("""
+            INSERT INTO stages (group_id, stage, status, error, updated) VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT (group_id, stage) DO UPDATE SET status = excluded.status,
+                error = excluded.error, updated = excluded.updated, job = NULL
+        """, (group_id, stage, status, error, time.time()))
+
+    # ── Alta de trabajo ─────────────────────────────────────────────
+    def import_source(self, jsonl_path):
+        """Registra (etapa text pendiente) las noticias reales añadidas desde la última vez."""
+        jsonl_path = Path(jsonl_path)
+        if not jsonl_path.exists():
+            return 0
+        key = f"source:{jsonl_path.resolve()}"
+        offset = int(self._meta(f"{key}:offset") or 0)
+        size = jsonl_path.stat().st_size
+        # Si el fichero se ha reescrito (encoge, o cambia su cabecera o lo anterior a la
+        # marca de agua) se vuelve a leer entero: registrar es idempotente (INSERT OR IGNORE)
+        if size < offset or (offset and self._meta(f"{key}:head") != file_fingerprint(jsonl_path, offset)):
+            offset = 0
+        added = 0
+        with open(jsonl_path, "rb") as f:
+            f.seek(offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                offset += len(line)
+                try:
+                    data = json.loads(line)
+                    added += self.register(data["article_id"], source=data)
+                except (ValueError, KeyError):
+                    continue
+        self._set_meta(**{f"{key}:offset": offset, f"{key}:head": file_fingerprint(jsonl_path, offset)})
+        self._db.commit()
+        return added
+
+    def import_dataset(self, jsonl_path):
+        """Migración (una sola vez): adopta los pares ya escritos en el JSONL del dataset."""
+        jsonl_path = Path(jsonl_path)
+        if self._meta("dataset_imported") or not jsonl_path.exists():
+            self._set_meta(dataset_imported=1)
+            self._db.commit()
+            return
+        pairs = {}
+        for entry in iter_records(jsonl_path):
+            pairs.setdefault(entry["group_id"], {})["real" if entry["is_real"] == 1 else "fake"] = entry
+        for gid, pair in pairs.items():
+            real, fake = pair.get("real"), pair.get("fake")
+            self._db.execute("INSERT OR IGNORE INTO groups (group_id, real, fake, exported) VALUES (?, ?, ?, 1)",
+                             (gid, json.dumps(real, ensure_ascii=False), json.dumps(fake, ensure_ascii=False)))
+            self._set_stage(gid, "text", "done")
+            if fake and fake.get("image_path"):
+                self._set_stage(gid, "image", "done")
+                self._set_stage(gid, "caption", "done" if fake.get("img_text") else "pending")
+            else:
+                self._set_stage(gid, "image", "pending")
+        self._set_meta(dataset_imported=1)
+        self._db.commit()
+        print(f"[*] Estado inicial importado: {len(pairs)} grupos de {jsonl_path.name}")
+
+    def register(self, group_id, source=None):
+        """Da de alta un grupo con la etapa text pendiente. Devuelve 1 si es nuevo."""
+        cur = self._db.execute("INSERT OR IGNORE INTO groups (group_id, source) VALUES (?, ?)",
+                               (group_id, json.dumps(source, ensure_ascii=False)))
+        if cur.rowcount:
+            self._set_stage(group_id, STAGES[0], "pending")
+        return cur.rowcount
+
+    def get(self, group_id):
+        """Grupo con el mismo formato que claim() (o None si no existe)."""
+        row = self._db.execute("SELECT group_id, source, real, fake FROM groups WHERE group_id = ?",
+                               (group_id,)).fetchone()
+        if row is None:
+            return None
+        gid, src, real, fake = row
+        return {"group_id": gid, "source": json.loads(src) if src else None,
+                "real": json.loads(real) if real else None, "fake": json.loads(fake) if fake else None}
+
+    # ── Trabajo pendiente ───────────────────────────────────────────
+    def claim(self, stage, limit=CLAIM_BATCH):
+        """Marca como running hasta `limit` grupos pendientes de `stage` y los devuelve."""
+        rows = self._db.execute("""
+            SELECT g.group_id, g.source, g.real, g.fake FROM stages s JOIN groups g USING (group_id)
+            WHERE s.stage = ? AND s.status IN ('pending', 'failed') AND s.attempts < ?
+            ORDER BY g.seq LIMIT ?
+        """, (stage, self.max_attempts, limit)).fetchall()
+        now = time.time()
+        self._db.executemany("""
+            UPDATE stages SET status = 'running', attempts = attempts + 1, updated = ?
+            WHERE group_id = ? AND stage = ?
+        """, [(now, r[0], stage) for r in rows])
+        self._db.commit()
+        return [{"group_id": gid, "source": json.loads(src) if src else None,
+                 "real": json.loads(real) if real else None, "fake": json.loads(fake) if fake else None}
+                for gid, src, real, fake in rows]
+
+    def iter_claims(self, stage, batch=CLAIM_BATCH):
+        """
+        Recorre los pendientes de `stage` reclamándolos por lotes. Al cerrar el
+        generador se liberan los reclamados que no llegaron a entregarse.
+        """
+        while True:
+            rows = self.claim(stage, batch)
+            if not rows:
+                return
+            for i, row in enumerate(rows):
+                try:
+                    yield row
+                except GeneratorExit:
+                    for rest in rows[i + 1:]:
+                        self.release(rest["group_id"], stage)
+                    raise
+
+    def release(self, group_id, stage):
+        """Devuelve a pendiente un grupo reclamado que no se llegó a procesar."""
+        self._db.execute("""
+            UPDATE stages SET status = 'pending', attempts = attempts - 1
+            WHERE group_id = ? AND stage = ? AND status = 'running'
+        """, (group_id, stage))
+        self._db.commit()
+
+    def mark_batched(self, stage, job, group_ids):
+        """
+        Asigna los grupos al trabajo batch `job`: quedan fuera de claim() y
+        sobreviven a un reinicio hasta que se fusione o se cancele el trabajo.
+        """
+        now = time.time()
+        self._db.executemany("""
+            UPDATE stages SET status = 'batched', job = ?, updated = ?
+            WHERE group_id = ? AND stage = ? AND status != 'done'
+        """, [(job, now, gid, stage) for gid in group_ids])
+        self._db.commit()
+
+    def release_batch(self, stage, job):
+        """Devuelve a pendiente los grupos de un trabajo batch cancelado. Devuelve cuántos."""
+        cur = self._db.execute("""
+            UPDATE stages SET status = 'pending', job = NULL, attempts = MAX(attempts - 1, 0), updated = ?
+            WHERE stage = ? AND job = ? AND status = 'batched'
+        """, (time.time(), stage, job))
+        self._db.commit()
+        return cur.rowcount
+
+    def complete(self, group_id, stage, real=None, fake=None):
+        """Cierra una etapa: fusiona los campos nuevos del par y encola la siguiente."""
+        row = self._db.execute("SELECT real, fake, exported, patch FROM groups WHERE group_id = ?",
+                               (group_id,)).fetchone()
+        cur_real = json.loads(row[0]) if row and row[0] else {}
+        cur_fake = json.loads(row[1]) if row and row[1] else {}
+        cur_real.update(real or {})
+        cur_fake.update(fake or {})
+        patch = None
+        if row and row[2]:
+            # Ya está en el JSONL: se acumulan solo los campos cambiados para export_updates()
+            patch = json.loads(row[3]) if row[3] else {"real": {}, "fake": {}}
+            patch["real"].update(real or {})
+            patch["fake"].update(fake or {})
+            patch = json.dumps(patch, ensure_ascii=False)
+        self._db.execute("UPDATE groups SET real = ?, fake = ?, patch = ? WHERE group_id = ?",
+                         (json.dumps(cur_real, ensure_ascii=False), json.dumps(cur_fake, ensure_ascii=False),
+                          patch, group_id))
+        self._set_stage(group_id, stage, "done")
+        nxt = STAGES.index(stage) + 1
+        if nxt < len(STAGES):
+            self._db.execute("INSERT OR IGNORE INTO stages (group_id, stage, status, updated) VALUES (?, ?, 'pending', ?)",
+                             (group_id, STAGES[nxt], time.time()))
+        self._db.commit()
+
+    def fail(self, group_id, stage, error):
+        self._set_stage(group_id, stage, "failed", str(error)[:500])
+        self._db.commit()
+
+    def count(self, stage, status):
+        return self._db.execute("SELECT COUNT(*) FROM stages WHERE stage = ? AND status = ?",
+                                (stage, status)).fetchone()[0]
+
+    def report(self):
+        rows = self._db.execute("SELECT stage, status, COUNT(*) FROM stages GROUP BY stage, status").fetchall()
+        by_stage = {}
+        for stage, status, n in rows:
+            by_stage.setdefault(stage, []).append(f"{status}={n}")
+        for stage in STAGES:
+            print(f"   - {stage:<8} {', '.join(by_stage.get(stage, ['-']))}")
+
+    # ── Exportación a JSONL ─────────────────────────────────────────
+    def export(self, jsonl_path):
+        """Añade al JSONL los pares con texto hecho que aún no se han exportado (en orden de alta)."""
+        rows = self._db.execute("""
+            SELECT g.group_id, g.real, g.fake FROM groups g JOIN stages s USING (group_id)
+            WHERE g.exported = 0 AND s.stage = 'text' AND s.status = 'done' ORDER BY g.seq
+        """).fetchall()
+        if not rows:
+            return 0
+        written = []
+
+        def mark_exported():
+            # Solo tras el volcado a disco: un fallo a mitad no deja pares marcados sin escribir
+            self._db.executemany("UPDATE groups SET exported = 1, patch = NULL WHERE group_id = ?",
+                                 [(gid,) for gid in written])
+            self._db.commit()
+            written.clear()
+
+        # Sin temporizador: mark_exported usa la conexión SQLite de este hilo
+        with JsonlAppender(jsonl_path, on_flush=mark_exported, idle_flush=False) as out:
+            for gid, real, fake in rows:
+                # Antes de append(): si este append dispara el volcado, mark_exported ya lo incluye
+                written.append(gid)
+                out.append(json.loads(real), json.loads(fake))
+        return len(rows)
+
+    def export_updates(self, jsonl_path):
+        """
+        Lleva al JSONL los cambios de pares ya exportados (imagen o caption
+        rellenados) como parches en su log: solo se escriben los campos
+        cambiados, nunca el dataset entero (ver common/patch_log.py).
+        """
+        rows = self._db.execute("SELECT group_id, patch FROM groups WHERE patch IS NOT NULL").fetchall()
+        patches = []
+        for gid, patch in rows:
+            patch = json.loads(patch)
+            for is_real, side in ((1, "real"), (0, "fake")):
+                if patch[side]:
+                    patches.append((gid, is_real, patch[side]))
+        append_patches(jsonl_path, patches)
+        self._db.executemany("UPDATE groups SET patch = NULL WHERE group_id = ?", [(gid,) for gid, _ in rows])
+        self._db.commit()
+        return len(rows)
+
+    def close(self):
+        self._db.commit()
+        self._db.close()
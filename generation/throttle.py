@@ -0,0 +1,105 @@
+"""
+throttle.py
+-----------
+Limitador adaptativo de peticiones en vuelo por proveedor (Gemini, HF FLUX...).
+
+Cada proveedor tiene su propio AdaptiveLimiter con un máximo de llamadas
+simultáneas. Ante un error de rate limit (429 / RESOURCE_EXHAUSTED):
+
+  - El límite se reduce a la mitad (mínimo 1) y todas las llamadas de ese
+    proveedor esperan un backoff exponencial antes de reintentar.
+  - Tras `limit` éxitos seguidos el límite vuelve a subir de uno en uno hasta
+    el máximo configurado (AIMD, como el control de congestión de TCP).
+
+Un 402 (créditos agotados) marca el proveedor como agotado: las siguientes
+llamadas fallan de inmediato para que el pipeline deje de encolar trabajo.
+"""
+
+import threading
+import time
+
+MAX_RETRIES = 5
+BASE_DELAY = 2.0
+MAX_DELAY = 60.0
+
+
+class QuotaExhausted(Exception):
+    pass
+
+
+def error_status(exc):
+    """Código HTTP de un error de google-genai o huggingface_hub (o None)."""
+    code = getattr(exc, "code", None) or getattr(getattr(exc, "response", None), "status_code", None)
+    if isinstance(code, int):
+        return code
+    text = str(exc)
+    if "402" in text:
+        return 402
+    if "429" in text or "RESOURCE_EXHAUSTED" in text:
+        return 429
+    return None
+
+
+class AdaptiveLimiter:
+    def __init__(self, name, max_in_flight, max_retries=MAX_RETRIES, base_delay=BASE_DELAY, max_delay=MAX_DELAY):
+        self.name = name
+        self.max_in_flight = max_in_flight
+        self.limit = max_in_flight
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.exhausted = False
+        self.throttled = 0
+        self._cond = threading.Condition()
+        self._active = 0
+        self._successes = 0
+        self._resume_at = 0.0
+
+    def _acquire(self):
+        with self._cond:
+            while True:
+                wait = self._resume_at - time.monotonic()
+                if wait <= 0 and self._active < self.limit:
+                    self._active += 1
+                    return
+                self._cond.wait(timeout=wait if wait > 0 else None)
+
+    def _release(self, ok):
+        with self._cond:
+            self._active -= 1
+            if ok:
+                self._successes += 1
+                if self._successes >= self.limit and self.limit < self.max_in_flight:
+                    self.limit += 1
+                    self._successes = 0
+            self._cond.notify_all()
+
+    def _throttle(self, attempt):
+        with self._cond:
+            self.limit = max(1, self.limit // 2)
+            self._successes = 0
+            delay = min(self.max_delay, self.base_delay * 2 ** attempt)
+            self._resume_at = max(self._resume_at, time.monotonic() + delay)
+            self.throttled += 1
+        print(f"⏳ Rate limit en {self.name}: {self.limit} en vuelo, pausa de {delay:.0f}s")
+
+    def call(self, fn, *args, **kwargs):
+        """Ejecuta fn respetando el límite; reintenta los rate limits con backoff."""
+        for attempt in range(self.max_retries + 1):
+            if self.exhausted:
+                raise QuotaExhausted(f"Cuota de {self.name} agotada")
+            self._acquire()
+            ok = False
+            try:
+                result = fn(*args, **kwargs)
+                ok = True
+                return result
+            except Exception as e:
+                status = error_status(e)
+                if status == 402 or isinstance(e, QuotaExhausted):
+                    self.exhausted = True
+                if status != 429 or attempt == self.max_retries:
+                    raise
+            finally:
+                self._release(ok)
+            self._throttle(attempt)
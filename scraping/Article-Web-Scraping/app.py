@@ -1,47 +1,160 @@
+"""
+app.py
+------
+Colector de noticias reales de The Guardian (Content API).
+
+Recorre TODAS las páginas de resultados del endpoint, descarga los artículos en
+paralelo sobre una `requests.Session` con pool de conexiones, los parsea con
+lxml (parser en C) y va escribiendo cada noticia en streaming al mismo esquema
+JSONL que produce collectorCategories.py:
+
+    {article_id, title, content, word_count, image_url, category, source, pub_date, is_real}
+
+Así The Guardian funciona como segunda fuente de noticias reales, sin la antigua
+estructura de un .txt por artículo.
+"""
+
+import hashlib
 import os
+import sys
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from pathlib import Path
+
 import requests
-from bs4 import BeautifulSoup
-from datetime import datetime
+from dotenv import load_dotenv
+from lxml import html as lxml_html
+from requests.adapters import HTTPAdapter
+
+ROOT_DIR = Path(__file__).resolve().parents[2]
+sys.path.append(str(ROOT_DIR))  # Raíz del repo (paquete common)
+from common.id_index import IdIndex
+from common.jsonl_writer import JsonlAppender
+from common.simhash_index import SimHashIndex
+
+load_dotenv()  # GUARDIAN_API_KEY desde .env
+
+API_ROOT = "https://content.guardianapis.com"
+ENDPOINT = "technology/artificialintelligenceai"
+OUTPUT_FILE = ROOT_DIR / "scraping" / "data_collection" / "pending_real_news.jsonl"
 
-current_datetime = datetime.now()
-folder_name = current_datetime.strftime('%H_%M_%d_%m_%Y')  # Format the current date and time for directory name
+PAGE_SIZE = 50     # Máximo permitido por la Content API
+MAX_WORKERS = 16
+MIN_WORDS = 300    # Mismo filtro de longitud que los colectores de NewsData
 
-# Define the main directory to save articles
-main_directory = "Saved_Articles"
 
-# Create the main directory if it doesn't exist
-if not os.path.exists(main_directory):
-    os.makedirs(main_directory, exist_ok=True)
+def make_session(pool_size=MAX_WORKERS):
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size, max_retries=3)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
 
-# Create a subdirectory with the current date and time format inside the main directory
-subdirectory_path = os.path.join(main_directory, folder_name)
-if not os.path.exists(subdirectory_path):
-    os.makedirs(subdirectory_path, exist_ok=True)
 
-# Define the URL to fetch data
-url = "https://content.guardianapis.com/technology/artificialintelligenceai?&api-key=3120c29b-93c2-444b-8d87-c0d41b51847f&type=article&page=1"
+def iter_results(session, endpoint=ENDPOINT, max_pages=None):
+    """Recorre todas las páginas de resultados del endpoint (perezosamente)."""
+    page, pages = 1, 1
+    while page <= pages and (max_pages is None or page <= max_pages):
+        params = {
+            "api-key": os.getenv("GUARDIAN_API_KEY", "test"),
+            "type": "article",
+            "page": page,
+            "page-size": PAGE_SIZE,
+            "show-fields": "thumbnail",
+        }
+        resp = session.get(f"{API_ROOT}/{endpoint}", params=params, timeout=30)
+        if resp.status_code != 200:
+            print(f"Error {resp.status_code} en la página {page}: {resp.text[:200]}")
+            return
+        data = resp.json()["response"]
+        pages = data.get("pages", 1)
+        print(f"--- Página {page}/{pages} ---")
+        yield from data.get("results", [])
+        page += 1
 
-response = requests.get(url)  # Fetch data from the URL
-x = response.json()  # Convert the response to JSON format
 
-web_urls = [item['webUrl'] for item in x['response']['results']]
+def parse_article(page_html):
+    """Extrae titular (h1) y cuerpo (párrafos) con lxml."""
+    tree = lxml_html.fromstring(page_html)
+    body = tree.xpath("//div[@id='maincontent']//p") or tree.xpath("//article//p") or tree.xpath("//p")
+    h1 = tree.xpath("//h1")
+    title = h1[0].text_content().strip() if h1 else None
+    content = "\n".join(p.text_content().strip() for p in body if p.text_content().strip())
+    return title, content
 
-def save_content_to_file(url, folder, filename):
+
+def fetch_article(session, result):
+    """Descarga y parsea un artículo. Devuelve la entrada JSONL o None."""
     try:
-        response = requests.get(url)
-        if response.status_code == 200:
-            soup = BeautifulSoup(response.text, 'html.parser')
-
-            with open(os.path.join(folder, filename), 'w', encoding='utf-8') as file:
-                for header in soup.find_all(['h1']):
-                    file.write("Title: " + header.text + '\n' * 5)
-                for paragraph in soup.find_all('p'):
-                    file.write(paragraph.text + '\n')
-        else:
-            print("Failed to retrieve the page:", url)
+        resp = session.get(result["webUrl"], timeout=30)
+        if resp.status_code != 200:
+            print("Failed to retrieve the page:", result["webUrl"])
+            return None
+        title, content = parse_article(resp.content)
     except Exception as e:
         print("An error occurred:", e)
+        return None
+
+    word_count = len(content.split())
+    if word_count < MIN_WORDS:
+        return None
+    return {
+        "article_id": hashlib.md5(result["id"].encode("utf-8")).hexdigest(),
+        "title": result.get("webTitle") or title,
+        "content": content,
+        "word_count": word_count,
+        "image_url": (result.get("fields") or {}).get("thumbnail"),
+        "category": result.get("sectionId", "general"),
+        "source": "theguardian",
+        "pub_date": result.get("webPublicationDate", "").replace("T", " ").rstrip("Z") or None,
+        "is_real": True
+    }
+
+
+def collect(endpoint=ENDPOINT, output_file=OUTPUT_FILE, max_pages=None, max_workers=MAX_WORKERS, goal=None):
+    session = make_session(max_workers)
+    existing_ids = IdIndex(output_file, "article_id")
+    near_dups = SimHashIndex(output_file)  # Compartido con collectorCategories.py (mismo JSONL)
+    saved = 0
+    in_flight = set()
+    results = iter_results(session, endpoint, max_pages)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool, JsonlAppender(output_file) as writer:
+        def refill():
+            while len(in_flight) < 2 * max_workers:
+                result = next(results, None)
+                if result is None:
+                    return
+                if hashlib.md5(result["id"].encode("utf-8")).hexdigest() in existing_ids:
+                    continue
+                in_flight.add(pool.submit(fetch_article, session, result))
+
+        refill()
+        while in_flight and (goal is None or saved < goal):
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                in_flight.discard(future)
+                entry = future.result()
+                if entry is None or entry["article_id"] in existing_ids:
+                    continue
+                match, fp = near_dups.is_near_duplicate(entry["content"])
+                if match is not None:
+                    print(f"Casi-duplicado de {match}, descartado: {entry['title'][:50]}...")
+                    continue
+                writer.append(entry)
+                existing_ids.add(entry["article_id"])
+                near_dups.add(entry["article_id"], fp)
+                saved += 1
+                print(f"[{saved}] Guardado: {entry['title'][:50]}...")
+                if goal is not None and saved >= goal:
+                    break
+            refill()
+        for future in in_flight:
+            future.cancel()
+
+    existing_ids.close()
+    near_dups.close()
+    print(f"Noticias nuevas de The Guardian: {saved} ({near_dups.rejected} casi-duplicados descartados)")
+
 
-for index, url in enumerate(web_urls):
-    filename = f'article_{index}.txt'  # Create a unique filename for each article
-    save_content_to_file(url, subdirectory_path, filename)  # Save the content to a file in the subdirectory
\ No newline at end of file
+if __name__ == "__main__":
+    collect()
@@ -0,0 +1,162 @@
+"""
+bench_ingestion.py
+------------------
+Benchmark de ingesta: ejecuta collector.py y/o collectorCategories.py contra el
+servidor stand-in local y reporta artículos/s, latencia de descarga p50/p99 y
+uso de CPU (proceso principal + pool de extracción).
+
+Todo se escribe en un directorio temporal (JSONL, índices, caché HTML, tokens),
+así que no toca los datos reales ni gasta créditos.
+
+Uso:
+    python scraping/benchmark/bench_ingestion.py --collector both --goal 200 --workers 16
+    python scraping/benchmark/bench_ingestion.py --api-error-rate 0.2 --article-latency 0.5 --json
+"""
+
+import argparse
+import json
+import os
+import resource
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+sys.path.append(str(BENCH_DIR.parent / "data_collection"))
+
+import collector
+import collectorCategories
+import fetcher
+import html_cache
+from newsdata_client import NewsDataScheduler
+from standin_server import StandInConfig, start_in_background
+
+COLLECTORS = {"collector": collector, "categories": collectorCategories}
+
+
+def _percentile(values, q):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q * (len(values) - 1))))]
+
+
+def _cpu_seconds():
+    """
+    CPU del proceso más la de sus hijos ya recogidos. ingest_concurrently espera
+    a su pool de extracción al cerrarse, así que al volver del colector la CPU
+    de los procesos de trafilatura ya está incluida.
+    """
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return own.ru_utime + own.ru_stime + children.ru_utime + children.ru_stime
+
+
+def _timed_fetch(latencies, lock, original):
+    def fetch_html(url, limiter):
+        start = time.perf_counter()
+        try:
+            return original(url, limiter)
+        finally:
+            with lock:
+                latencies.append(time.perf_counter() - start)
+    return fetch_html
+
+
+def run_collector(name, server, workdir, args):
+    """Ejecuta un colector contra el stand-in y devuelve sus métricas."""
+    module = COLLECTORS[name]
+    run_dir = Path(workdir) / name
+    run_dir.mkdir(parents=True, exist_ok=True)
+
+    # Redirigir todas las rutas de estado al directorio temporal
+    html_cache.CACHE_DIR = run_dir / "html_cache"
+    if name == "categories":
+        collectorCategories.OUTPUT_FILE = run_dir / "pending_real_news.jsonl"
+        collectorCategories.TOKENS_FILE = run_dir / "category_tokens.json"
+        collectorCategories.SCREEN_FILE = run_dir / "prefetch_screen.sqlite"
+        output = collectorCategories.OUTPUT_FILE
+    else:
+        output = run_dir / "real_news.jsonl"
+
+    latencies, lock = [], threading.Lock()
+    original = fetcher.fetch_html
+    fetcher.fetch_html = _timed_fetch(latencies, lock, original)
+    scheduler = NewsDataScheduler(credits=args.credits, window_credits=10 ** 6, window_seconds=1,
+                                  api_url=f"http://127.0.0.1:{server.server_port}/api/1/latest")
+    cwd = os.getcwd()
+    os.chdir(run_dir)  # collector.py usa rutas relativas
+    cpu_start, wall_start = _cpu_seconds(), time.perf_counter()
+    try:
+        module.process_automated_ingestion(goal_new_articles=args.goal, max_workers=args.workers,
+                                           per_host=args.per_host, processes=args.processes,
+                                           scheduler=scheduler)
+    finally:
+        wall = time.perf_counter() - wall_start
+        cpu = _cpu_seconds() - cpu_start
+        os.chdir(cwd)
+        fetcher.fetch_html = original
+
+    articles = sum(1 for _ in open(output, encoding="utf-8")) if output.exists() else 0
+    return {
+        "collector": name,
+        "articles": articles,
+        "wall_s": round(wall, 3),
+        "articles_per_s": round(articles / wall, 2) if wall else 0.0,
+        "fetches": len(latencies),
+        "fetch_p50_ms": round(_percentile(latencies, 0.50) * 1000, 1),
+        "fetch_p99_ms": round(_percentile(latencies, 0.99) * 1000, 1),
+        "cpu_s": round(cpu, 2),
+        "cpu_pct": round(100 * cpu / wall, 1) if wall else 0.0,
+        "api_credits": scheduler.credits_used,
+        "api_429": scheduler.throttled,
+        "api_5xx": scheduler.server_errors,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de los colectores contra el stand-in local")
+    parser.add_argument("--collector", choices=["collector", "categories", "both"], default="both")
+    parser.add_argument("--goal", type=int, default=100)
+    parser.add_argument("--credits", type=int, default=200)
+    parser.add_argument("--workers", type=int, default=fetcher.MAX_WORKERS)
+    parser.add_argument("--per-host", type=int, default=fetcher.MAX_PER_HOST)
+    parser.add_argument("--processes", type=int, default=None)
+    parser.add_argument("--pages", type=int, default=5)
+    parser.add_argument("--hosts", type=int, default=8)
+    parser.add_argument("--api-latency", type=float, default=0.05)
+    parser.add_argument("--article-latency", type=float, default=0.2)
+    parser.add_argument("--api-error-rate", type=float, default=0.0)
+    parser.add_argument("--article-error-rate", type=float, default=0.0)
+    parser.add_argument("--fixtures", type=Path)
+    parser.add_argument("--json", action="store_true", help="Imprime los resultados como JSON")
+    args = parser.parse_args()
+
+    cfg = StandInConfig(pages=args.pages, hosts=args.hosts, api_latency=args.api_latency,
+                        article_latency=args.article_latency, api_error_rate=args.api_error_rate,
+                        article_error_rate=args.article_error_rate, fixtures=args.fixtures)
+    server = start_in_background(cfg)
+    names = ["collector", "categories"] if args.collector == "both" else [args.collector]
+
+    # Las descargas canceladas pueden seguir escribiendo en la caché un instante
+    with tempfile.TemporaryDirectory(prefix="bench_ingestion_", ignore_cleanup_errors=True) as workdir:
+        results = [run_collector(name, server, workdir, args) for name in names]
+    server.shutdown()
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print("\n" + "═" * 60)
+    for r in results:
+        print(f"  {r['collector']:<11} {r['articles']:>5} art. en {r['wall_s']:>7.2f}s "
+              f"-> {r['articles_per_s']:>6.2f} art/s")
+        print(f"              fetch p50 {r['fetch_p50_ms']:.0f} ms | p99 {r['fetch_p99_ms']:.0f} ms "
+              f"| CPU {r['cpu_s']:.2f}s ({r['cpu_pct']:.0f}%) | créditos {r['api_credits']} "
+              f"(429: {r['api_429']}, 5xx: {r['api_5xx']})")
+    print("═" * 60)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+"""
+standin_server.py
+-----------------
+Servidor HTTP local que imita a NewsData.io y a los medios enlazados, para
+medir el rendimiento de los colectores sin gastar créditos reales.
+
+  GET /api/1/latest?category=..&page=..  -> página de resultados NewsData
+  GET /article/<article_id>              -> HTML del artículo
+
+Las páginas de la API pueden ser sintéticas o reproducir respuestas grabadas
+(ficheros JSON como el api_test_response.json que genera test_api.py, y HTML en
+<fixtures>/html/<article_id>.html). Los enlaces se reescriben para apuntar a
+este servidor, repartidos entre varios "hosts" 127.0.0.N para que el límite
+por dominio del fetcher se comporte como con medios reales.
+
+Latencia, tasa de errores (429/500) y profundidad de paginación son
+configurables.
+
+Uso:
+    python scraping/benchmark/standin_server.py --port 8765 --pages 5 --api-error-rate 0.1
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+
+WORDS = ("market government climate research company energy policy data report "
+         "officials technology growth analysts election science industry").split()
+
+
+class StandInConfig:
+    def __init__(self, pages=5, page_size=10, hosts=8, api_latency=0.05, article_latency=0.2,
+                 api_error_rate=0.0, article_error_rate=0.0, min_words=150, max_words=900,
+                 fixtures=None, seed=0):
+        self.pages = pages
+        self.page_size = page_size
+        self.hosts = hosts
+        self.api_latency = api_latency
+        self.article_latency = article_latency
+        self.api_error_rate = api_error_rate
+        self.article_error_rate = article_error_rate
+        self.min_words = min_words
+        self.max_words = max_words
+        self.seed = seed
+        self.recorded_pages = []
+        self.recorded_html = {}
+        if fixtures:
+            fixtures = Path(fixtures)
+            for path in sorted(fixtures.glob("*.json")):
+                results = json.loads(path.read_text(encoding="utf-8")).get("results", [])
+                if results:
+                    self.recorded_pages.append(results)
+            for path in (fixtures / "html").glob("*.html"):
+                self.recorded_html[path.stem] = path.read_text(encoding="utf-8")
+
+
+def _jitter(seconds):
+    """Latencia con ±50% de variación."""
+    if seconds > 0:
+        time.sleep(seconds * random.uniform(0.5, 1.5))
+
+
+def _synthetic_html(article_id, cfg):
+    rng = random.Random(f"{cfg.seed}-{article_id}")
+    n_words = rng.randint(cfg.min_words, cfg.max_words)
+    paragraphs = []
+    while n_words > 0:
+        size = min(n_words, rng.randint(40, 90))
+        paragraphs.append("<p>" + " ".join(rng.choice(WORDS) for _ in range(size)).capitalize() + ".</p>")
+        n_words -= size
+    return (f"<html><head><title>{article_id}</title></head><body>"
+            f"<nav>Home | World | Business</nav><article><h1>Story {article_id}</h1>"
+            f"{''.join(paragraphs)}</article><footer>© Stand-in News</footer></body></html>")
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status, body, content_type):
+        data = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        if status == 429:
+            self.send_header("Retry-After", "1")
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        server = self.server
+        cfg = server.cfg
+        url = urlparse(self.path)
+        with server.stats_lock:
+            server.stats["requests"] += 1
+
+        if url.path == "/api/1/latest":
+            _jitter(cfg.api_latency)
+            if random.random() < cfg.api_error_rate:
+                status = random.choice((429, 500))
+                with server.stats_lock:
+                    server.stats[f"api_{status}"] += 1
+                return self._send(status, json.dumps({"status": "error"}), "application/json")
+            query = parse_qs(url.query)
+            category = query.get("category", ["top"])[0]
+            page = int(query.get("page", ["0"])[0] or 0)
+            return self._send(200, json.dumps(self._page(category, page)), "application/json")
+
+        if url.path.startswith("/article/"):
+            _jitter(cfg.article_latency)
+            if random.random() < cfg.article_error_rate:
+                with server.stats_lock:
+                    server.stats["article_500"] += 1
+                return self._send(500, "error", "text/html")
+            article_id = url.path.rsplit("/", 1)[-1]
+            html = cfg.recorded_html.get(article_id) or _synthetic_html(article_id, cfg)
+            return self._send(200, html, "text/html; charset=utf-8")
+
+        self._send(404, "not found", "text/plain")
+
+    def _page(self, category, page):
+        cfg = self.server.cfg
+        if cfg.recorded_pages:
+            results = [dict(item) for item in cfg.recorded_pages[page % len(cfg.recorded_pages)]]
+        else:
+            results = [{
+                "article_id": f"{category}-{page}-{i}",
+                "title": f"{category.title()} story {page}-{i}",
+                "image_url": None,
+                "category": [category],
+                "source_id": "standin",
+                "pubDate": "2025-01-01 00:00:00",
+            } for i in range(cfg.page_size)]
+        for item in results:
+            aid = item["article_id"]
+            host = f"127.0.0.{1 + sum(map(ord, aid)) % cfg.hosts}"
+            item["link"] = f"http://{host}:{self.server.server_port}/article/{aid}"
+        next_page = str(page + 1) if page + 1 < cfg.pages else None
+        return {"status": "success", "totalResults": cfg.pages * len(results),
+                "results": results, "nextPage": next_page}
+
+
+def make_server(cfg, port=0):
+    """Crea (sin arrancar) el servidor. Escucha en todas las interfaces para aceptar 127.0.0.N."""
+    server = ThreadingHTTPServer(("", port), StandInHandler)
+    server.daemon_threads = True
+    server.cfg = cfg
+    server.stats_lock = threading.Lock()
+    server.stats = {"requests": 0, "api_429": 0, "api_500": 0, "article_500": 0}
+    return server
+
+
+def start_in_background(cfg, port=0):
+    server = make_server(cfg, port)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stand-in local de NewsData + medios")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--pages", type=int, default=5, help="Profundidad de paginación por categoría")
+    parser.add_argument("--hosts", type=int, default=8)
+    parser.add_argument("--api-latency", type=float, default=0.05)
+    parser.add_argument("--article-latency", type=float, default=0.2)
+    parser.add_argument("--api-error-rate", type=float, default=0.0)
+    parser.add_argument("--article-error-rate", type=float, default=0.0)
+    parser.add_argument("--fixtures", type=Path, help="Directorio con páginas NewsData grabadas (*.json) y html/")
+    args = parser.parse_args()
+
+    cfg = StandInConfig(pages=args.pages, hosts=args.hosts, api_latency=args.api_latency,
+                        article_latency=args.article_latency, api_error_rate=args.api_error_rate,
+                        article_error_rate=args.article_error_rate, fixtures=args.fixtures)
+    server = make_server(cfg, args.port)
+    print(f"Stand-in escuchando en http://127.0.0.1:{server.server_port}/api/1/latest")
+    server.serve_forever()
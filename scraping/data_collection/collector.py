@@ -1,67 +1,95 @@
 import os
-import json
-import time
-import requests
-import trafilatura
+import sys
+from pathlib import Path
 from dotenv import load_dotenv
 
+sys.path.append(str(Path(__file__).resolve().parents[2]))  # Raíz del repo (paquete common)
+from common.id_index import IdIndex
+from common.jsonl_writer import JsonlAppender
+from common.simhash_index import SimHashIndex
+
+from fetcher import ingest_concurrently, MAX_WORKERS, MAX_PER_HOST
+from html_cache import HtmlCache
+from newsdata_client import NewsDataScheduler, MAX_CREDITS
+from prefetch_screen import PrefetchScreen
+
 load_dotenv()
 
 categories = ["business", "technology", "science", "politics", "environment", "top"]
 
 def get_existing_ids(filepath):
-    """Carga los IDs ya guardados para evitar duplicados (Set para O(1) lookup)."""
-    if not os.path.exists(filepath):
-        return set()
-    with open(filepath, "r", encoding="utf-8") as f:
-        return {json.loads(line)["article_id"] for line in f}
+    """Índice persistente de IDs ya guardados (se sincroniza solo con el delta del JSONL)."""
+    return IdIndex(filepath, "article_id")
 
-def process_automated_ingestion(goal_new_articles=50):
-    output_file = "real_news.jsonl"
-    existing_ids = get_existing_ids(output_file)
-    new_articles_count = 0
-    next_page_token = get_last_token()
-    
-    print(f"Dataset actual: {len(existing_ids)} noticias. Objetivo: +{goal_new_articles}")
-    for cat in categories:
-        print(f"--- Iniciando descarga de categoría: {cat} ---")
+def iter_category_items(cat, cursor, existing_ids, scheduler, screen):
+    """
+    Pagina la API para una categoría y devuelve los items no vistos (token global
+    en cursor["page"]). Las copias sindicadas se descartan antes de descargar.
+    """
+    queued = set()
+    while True:
         params = {
-            "apikey": os.getenv("NEWSDATA_API_KEY"),
             "language": "en",
             "size": 10,
-            "category": cat 
+            "category": cat
         }
-        while new_articles_count < goal_new_articles:
-            params = {
-                "apikey": os.getenv("NEWSDATA_API_KEY"),
-                "language": "en",
-                "size": 10,
-                "category": cat
-            }
-            if next_page_token:
-                params["page"] = next_page_token
+        if cursor["page"]:
+            params["page"] = cursor["page"]
 
-            resp = requests.get("https://newsdata.io/api/1/latest", params=params)
-            if resp.status_code != 200:
-                print(f"Error o límite de créditos: {resp.text}")
-                break
-            
-            data = resp.json()
-            results = data.get('results', [])
-            next_page_token = data.get("nextPage")
-            save_last_token(next_page_token)
+        data = scheduler.latest(params)
+        if data is None:
+            print("Error o límite de créditos.")
+            return
+        
+        results = data.get('results', [])
+        cursor["page"] = data.get("nextPage")
+        save_last_token(cursor["page"])
+        
+        for item in results:
+            aid = item.get('article_id')
             
-            for item in results:
-                aid = item.get('article_id')
-                
-                # EVITAR COLISIÓN
-                if aid in existing_ids:
-                    continue
-                
-                # SCRAPING (Solo si no es duplicado)
-                content = trafilatura.extract(trafilatura.fetch_url(item.get('link')))
-                
-                if content and len(content.split()) >= 300:
+            # EVITAR COLISIÓN
+            if aid in existing_ids or aid in queued or screen.is_duplicate(item):
+                continue
+            queued.add(aid)
+            yield item
+        
+        if not cursor["page"]:
+            print("No hay más páginas disponibles.")
+            return
+
+def process_automated_ingestion(goal_new_articles=50, max_workers=MAX_WORKERS, per_host=MAX_PER_HOST, processes=None,
+                                max_credits=MAX_CREDITS, scheduler=None):
+    output_file = "real_news.jsonl"
+    existing_ids = get_existing_ids(output_file)
+    new_articles_count = 0
+    cursor = {"page": get_last_token()}
+    cache = HtmlCache() # HTML crudo de todo lo descargado (re-extracción offline)
+    scheduler = scheduler or NewsDataScheduler(credits=max_credits)
+    screen = PrefetchScreen("prefetch_screen.sqlite", seed_jsonl=output_file)
+    near_dups = SimHashIndex(output_file) # Casi-duplicados por contenido (ya extraído)
+    
+    print(f"Dataset actual: {len(existing_ids)} noticias. Objetivo: +{goal_new_articles}")
+    # Buffer con volcados atómicos: un solo open y escrituras por lotes
+    with JsonlAppender(output_file) as writer:
+        for cat in categories:
+            if new_articles_count >= goal_new_articles:
+                break
+
+            print(f"--- Iniciando descarga de categoría: {cat} ---")
+        
+            # SCRAPING (Solo si no es duplicado): descarga en hilos, extracción en procesos
+            items = iter_category_items(cat, cursor, existing_ids, scheduler, screen)
+            pipeline = ingest_concurrently(items, max_workers=max_workers, per_host=per_host,
+                                           processes=processes, cache=cache, on_done=screen.release)
+            try:
+                for item, content in pipeline:
+                    aid = item.get('article_id')
+                    match, fp = near_dups.is_near_duplicate(content)
+                    if match is not None:
+                        screen.add(item) # Sus copias ya no se descargarán
+                        print(f"Casi-duplicado de {match}, descartado: {aid}")
+                        continue
                     entry = {
                         "article_id": aid,
                         "title": item.get("title"),
@@ -73,22 +101,26 @@ def process_automated_ingestion(goal_new_articles=50):
                         "pub_date": item.get("pubDate"),
                         "is_real": True
                     }
-                    
-                    # Guardado inmediato (Append mode)
-                    with open(output_file, "a", encoding="utf-8") as f:
-                        f.write(json.dumps(entry, ensure_ascii=False) + "\n")
-                    
+                
+                    writer.append(entry)
+                
                     existing_ids.add(aid)
+                    if aid is not None:
+                        near_dups.add(aid, fp)
+                    screen.add(item)
                     new_articles_count += 1
                     print(f"[{new_articles_count}/{goal_new_articles}] Guardado: {aid}")
                 
-                if new_articles_count >= goal_new_articles:
-                    break
-            
-            if not next_page_token:
-                print("No hay más páginas disponibles.")
-                break
-            time.sleep(1)
+                    if new_articles_count >= goal_new_articles:
+                        break
+            finally:
+                pipeline.close()
+    existing_ids.close()
+    near_dups.close()
+    screen.close()
+    scheduler.report(new_articles_count)
+    screen.report()
+    print(f"Casi-duplicados descartados tras la extracción: {near_dups.rejected}")
 
 def get_last_token():
     if os.path.exists("last_token.txt"):
@@ -102,4 +134,4 @@ def save_last_token(token):
             f.write(token)
 
 if __name__ == "__main__":
-    process_automated_ingestion(goal_new_articles=100)
\ No newline at end of file
+    process_automated_ingestion(goal_new_articles=100)
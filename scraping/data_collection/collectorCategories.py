@@ -1,117 +1,241 @@
-import os
+import sys
 import json
-import time
-import requests
-import trafilatura
+import queue
+import threading
+from collections import deque
 from pathlib import Path
 from dotenv import load_dotenv
 
+sys.path.append(str(Path(__file__).resolve().parents[2]))  # Raíz del repo (paquete common)
+from common.id_index import IdIndex
+from common.jsonl_writer import JsonlAppender
+from common.simhash_index import SimHashIndex
+from fetcher import ingest_concurrently, MAX_WORKERS, MAX_PER_HOST
+from html_cache import HtmlCache
+from newsdata_client import NewsDataScheduler, MAX_CREDITS
+from prefetch_screen import PrefetchScreen
+
 load_dotenv()
 
 # Configuración de rutas absoluta para evitar líos de directorios
 SCRIPT_DIR = Path(__file__).resolve().parent
-TOKEN_FILE = SCRIPT_DIR / "last_token.txt"
+TOKENS_FILE = SCRIPT_DIR / "category_tokens.json"
 OUTPUT_FILE = SCRIPT_DIR / "pending_real_news.jsonl"
+SCREEN_FILE = SCRIPT_DIR / "prefetch_screen.sqlite"
 
 categories = ["top", "business", "technology", "science", "politics", "environment"]
 
-def get_last_token():
-    if TOKEN_FILE.exists():
-        return TOKEN_FILE.read_text().strip()
-    return None
+ITEM_QUEUE_SIZE = 50    # Items de la API a la espera de entrar al pipeline de descarga
+
+
+class CategoryCursors:
+    """
+    Token de paginación independiente por categoría, persistido en TOKENS_FILE.
+
+    El token guardado solo avanza más allá de una página cuando todos sus items
+    se han resuelto (descartados o escritos), así un reinicio retoma cada
+    categoría en la primera página con trabajo pendiente. Un article_id que
+    reaparece en una página posterior (solapes de la paginación de NewsData)
+    solo cuenta en la primera: en las demás se da por resuelto.
+    """
+
+    def __init__(self, path=None):
+        self.path = Path(path or TOKENS_FILE)
+        self._lock = threading.Lock()
+        self._tokens = json.loads(self.path.read_text()) if self.path.exists() else {}
+        self._head = dict(self._tokens)   # Token de la próxima petición (en memoria)
+        self._pages = {}                  # cat -> deque de [token, next_token, {ids pendientes}]
+        self._page_of = {}                # (cat, article_id) -> página donde está pendiente
+
+    def next_token(self, cat):
+        with self._lock:
+            return self._head.get(cat)
+
+    def open_page(self, cat, token, next_token, items):
+        """Registra una página; marca con `crawl_repeat` los items aún pendientes en otra anterior."""
+        with self._lock:
+            page = [token, next_token, set()]
+            for item in items:
+                aid = item.get("article_id")
+                if (cat, aid) in self._page_of:
+                    item["crawl_repeat"] = True  # Su resolución corresponde a la primera copia
+                elif aid is not None:
+                    page[2].add(aid)
+                    self._page_of[(cat, aid)] = page
+            self._pages.setdefault(cat, deque()).append(page)
+            self._head[cat] = next_token
+            self._advance(cat)
+
+    def resolve(self, item):
+        if item.get("crawl_repeat"):
+            return
+        with self._lock:
+            cat = item["crawl_category"]
+            aid = item.get("article_id")
+            page = self._page_of.pop((cat, aid), None)
+            if page:
+                page[2].discard(aid)
+                self._advance(cat)
+
+    def _advance(self, cat):
+        pages = self._pages.get(cat)
+        while pages and not pages[0][2]:
+            self._tokens[cat] = pages.popleft()[1]
+
+    def save(self):
+        # Con lock también la escritura: el volcado del writer puede llamarlo desde su temporizador
+        with self._lock:
+            tmp = self.path.with_suffix(".tmp")
+            tmp.write_text(json.dumps(self._tokens, indent=2))
+            tmp.replace(self.path)
 
-def save_last_token(token):
-    if token:
-        TOKEN_FILE.write_text(str(token))
 
 def get_existing_ids(filepath):
-    if not os.path.exists(filepath):
-        return set()
-    with open(filepath, "r", encoding="utf-8") as f:
-        return {json.loads(line)["article_id"] for line in f}
+    # Índice persistente: solo lee lo añadido desde la última ejecución
+    return IdIndex(filepath, "article_id")
+
+def crawl_category(cat, cursors, scheduler, out_queue, stop):
+    """Hilo de una categoría: pagina la API con su propio token y encola los items."""
+    while not stop.is_set():
+        token = cursors.next_token(cat)
+        params = {
+            "language": "en",
+            "size": 10,
+            "category": cat,
+            "removeduplicate": 1
+        }
+        if token:
+            params["page"] = token
 
-def process_automated_ingestion(goal_new_articles=100):
+        # El planificador reparte la cuota y reintenta ante 429/5xx
+        data = scheduler.latest(params)
+        if data is None:
+            print(f"Deteniendo categoría {cat}.")
+            return # Solo se detiene esta categoría
+
+        items = [dict(item, crawl_category=cat) for item in data.get('results', [])]
+        next_token = data.get("nextPage")
+        cursors.open_page(cat, token, next_token, items)
+
+        for item in items:
+            while not stop.is_set():
+                try:
+                    out_queue.put(item, timeout=0.1)
+                    break
+                except queue.Full:
+                    continue
+
+        if not items:
+            print(f"No más resultados en {cat}.")
+            return
+        if not next_token:
+            return
+
+def iter_new_items(threads, item_queue, cursors, existing_ids, screen):
+    """
+    Mezcla los items de todas las categorías descartando los ya vistos: primero
+    por article_id y después por título normalizado / URL canónica (copias
+    sindicadas de la misma noticia), todo antes de descargar nada.
+    """
+    queued = set()
+    while True:
+        try:
+            item = item_queue.get(timeout=0.1)
+        except queue.Empty:
+            if not any(t.is_alive() for t in threads) and item_queue.empty():
+                return
+            continue
+        aid = item.get('article_id')
+        if aid in existing_ids or aid in queued or screen.is_duplicate(item):
+            cursors.resolve(item)
+            continue
+        queued.add(aid)
+        yield item
+
+def process_automated_ingestion(goal_new_articles=100, max_workers=MAX_WORKERS, per_host=MAX_PER_HOST,
+                                processes=None, max_credits=MAX_CREDITS, scheduler=None):
+    """
+    Ingesta en dos etapas: `max_workers` descargas en total (`per_host` por
+    dominio) y extracción con trafilatura en `processes` procesos (todos los
+    núcleos por defecto). Las categorías se paginan en paralelo, cada una con
+    su token, compartiendo `max_credits` créditos a través del planificador
+    (se puede inyectar otro `scheduler`, p.ej. contra el servidor de benchmark).
+    """
     existing_ids = get_existing_ids(OUTPUT_FILE)
     new_articles_count = 0
-    next_page_token = get_last_token()
+    cache = HtmlCache() # HTML crudo de todo lo descargado (re-extracción offline)
+    cursors = CategoryCursors()
+    screen = PrefetchScreen(SCREEN_FILE, seed_jsonl=OUTPUT_FILE)
+    near_dups = SimHashIndex(OUTPUT_FILE) # Casi-duplicados por contenido (ya extraído)
+    scheduler = scheduler or NewsDataScheduler(credits=max_credits)
     
     print(f"Dataset actual: {len(existing_ids)} noticias. Objetivo: +{goal_new_articles}")
 
-    for cat in categories:
-        if new_articles_count >= goal_new_articles:
-            break
-            
-        print(f"\n--- Iniciando categoría: {cat.upper()} ---")
-        
-        # Resetear el token si cambias de categoría (opcional, pero NewsData suele ligar tokens a queries)
-        # Si prefieres seguir el hilo global, no toques next_page_token aquí.
-
-        while new_articles_count < goal_new_articles:
-            params = {
-                "apikey": os.getenv("NEWSDATA_API_KEY"),
-                "language": "en",
-                "size": 10,
-                "category": cat,
-                "removeduplicate": 1
-            }
-            if next_page_token:
-                params["page"] = next_page_token
-
-            try:
-                resp = requests.get("https://newsdata.io/api/1/latest", params=params)
-                if resp.status_code != 200:
-                    print(f"Error {resp.status_code} en {cat}: {resp.text}")
-                    break # Salta a la siguiente categoría si hay error de cuota
+    stop = threading.Event()
+    item_queue = queue.Queue(maxsize=ITEM_QUEUE_SIZE)
+    threads = [
+        threading.Thread(target=crawl_category, args=(cat, cursors, scheduler, item_queue, stop), daemon=True)
+        for cat in categories
+    ]
+    for t in threads:
+        t.start()
+
+    def on_done(item):
+        cursors.resolve(item)
+        screen.release(item)
+
+    items = iter_new_items(threads, item_queue, cursors, existing_ids, screen)
+    pipeline = ingest_concurrently(items, max_workers=max_workers, per_host=per_host,
+                                   processes=processes, cache=cache, on_done=on_done)
+    # Los tokens se guardan tras cada volcado: nunca avanzan por delante del disco
+    with JsonlAppender(OUTPUT_FILE, on_flush=cursors.save) as writer:
+        try:
+            for item, content in pipeline:
+                aid = item.get('article_id')
+                match, fp = near_dups.is_near_duplicate(content)
+                if match is not None:
+                    screen.add(item) # Sus copias ya no se descargarán
+                    print(f"Casi-duplicado de {match}, descartado: {(item.get('title') or '')[:50]}...")
+                    continue
+                entry = {
+                    "article_id": aid,
+                    "title": item.get("title"),
+                    "content": content,
+                    "word_count": len(content.split()),
+                    "image_url": item.get("image_url"),
+                    "category": item["crawl_category"],
+                    "source": item.get("source_id"),
+                    "pub_date": item.get("pubDate"),
+                    "is_real": True
+                }
                 
-                data = resp.json()
-                results = data.get('results', [])
-                next_page_token = data.get("nextPage")
-                save_last_token(next_page_token) # Checkpoint inmediato
+                writer.append(entry)
                 
-                if not results:
-                    print(f"No más resultados en {cat}.")
-                    break
-
-                for item in results:
-                    aid = item.get('article_id')
-                    if aid in existing_ids:
-                        continue
-                    
-                    # Scraping
-                    downloaded = trafilatura.fetch_url(item.get('link'))
-                    content = trafilatura.extract(downloaded) if downloaded else None
-                    
-                    if content and len(content.split()) >= 300:
-                        entry = {
-                            "article_id": aid,
-                            "title": item.get("title"),
-                            "content": content,
-                            "word_count": len(content.split()),
-                            "image_url": item.get("image_url"),
-                            "category": cat,
-                            "source": item.get("source_id"),
-                            "pub_date": item.get("pubDate"),
-                            "is_real": True
-                        }
-                        
-                        with open(OUTPUT_FILE, "a", encoding="utf-8") as f:
-                            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
-                        
-                        existing_ids.add(aid)
-                        new_articles_count += 1
-                        print(f"[{new_articles_count}/{goal_new_articles}] Guardado: {item.get('title')[:50]}...")
-                    
-                    if new_articles_count >= goal_new_articles:
-                        break
+                existing_ids.add(aid)
+                if aid is not None:
+                    near_dups.add(aid, fp)
+                screen.add(item)
+                new_articles_count += 1
+                print(f"[{new_articles_count}/{goal_new_articles}] Guardado: {(item.get('title') or '')[:50]}...")
                 
-                if not next_page_token:
+                if new_articles_count >= goal_new_articles:
                     break
-                    
-                time.sleep(1) # Courtesy delay entre llamadas API
 
-            except Exception as e:
-                print(f"Error crítico: {e}")
-                break
+        except Exception as e:
+            print(f"Error crítico: {e}")
+        finally:
+            stop.set()
+            pipeline.close()
+    cursors.save()
+    existing_ids.close()
+    near_dups.close()
+    screen.close()
+    for t in threads:
+        t.join()
+
+    scheduler.report(new_articles_count)
+    screen.report()
+    print(f"Casi-duplicados descartados tras la extracción: {near_dups.rejected}")
 
 if __name__ == "__main__":
-    process_automated_ingestion(goal_new_articles=200)
\ No newline at end of file
+    process_automated_ingestion(goal_new_articles=200)
@@ -0,0 +1,163 @@
+"""
+fetcher.py
+----------
+Descarga y extracción concurrente de artículos para los colectores.
+
+Un pool de hilos limita el número total de descargas simultáneas y un semáforo
+por host evita martillear un mismo medio. El HTML descargado pasa por una cola
+acotada a un pool de procesos que ejecuta trafilatura.extract en todos los
+núcleos. Los items se consumen de forma perezosa, así que la paginación de la
+API avanza solo cuando hay hueco.
+"""
+
+import os
+import queue
+import threading
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, FIRST_COMPLETED, wait
+from urllib.parse import urlparse
+
+import trafilatura
+
+MAX_WORKERS = 16   # Descargas simultáneas en total
+MAX_PER_HOST = 2   # Descargas simultáneas contra un mismo dominio
+QUEUE_SIZE = 32    # Páginas HTML descargadas a la espera de extracción
+MIN_WORDS = 300    # Filtro de longitud mínima del artículo
+
+
+class HostLimiter:
+    """Semáforo por dominio (creado bajo demanda)."""
+
+    def __init__(self, per_host=MAX_PER_HOST):
+        self._lock = threading.Lock()
+        self._slots = defaultdict(lambda: threading.BoundedSemaphore(per_host))
+
+    def slot(self, url):
+        host = urlparse(url or "").netloc.lower()
+        with self._lock:
+            return self._slots[host]
+
+
+def fetch_html(url, limiter):
+    """Descarga una URL respetando el límite por host. Devuelve None si falla."""
+    if not url:
+        return None
+    with limiter.slot(url):
+        try:
+            return trafilatura.fetch_url(url)
+        except Exception as e:
+            print(f"  ⚠️  Error descargando {url}: {e}")
+            return None
+
+
+def extract_article(html, min_words=MIN_WORDS, extract_options=None):
+    """
+    Etapa CPU (se ejecuta en el pool de procesos): extrae el cuerpo con
+    trafilatura y aplica el filtro de longitud. Devuelve None si no pasa.
+    """
+    try:
+        content = trafilatura.extract(html, **(extract_options or {}))
+    except Exception:
+        return None
+    if content and len(content.split()) >= min_words:
+        return content
+    return None
+
+
+def ingest_concurrently(items, min_words=MIN_WORDS, max_workers=MAX_WORKERS,
+                        per_host=MAX_PER_HOST, processes=None, queue_size=QUEUE_SIZE,
+                        cache=None, offline=False, extract_options=None, on_done=None):
+    """
+    Generador: pipeline de dos etapas sobre los items de la API.
+
+      1. Descarga (red): pool de hilos -> cola acotada de HTML crudo.
+      2. Extracción (CPU): pool de procesos con trafilatura + filtro de palabras.
+
+    Devuelve (item, content) en orden de finalización solo para los artículos
+    que pasan el filtro. Cuando la cola está llena los hilos de descarga se
+    bloquean, de modo que nunca hay más de max_workers + queue_size páginas en
+    memoria esperando extracción. Si el consumidor deja de iterar (p.ej.
+    objetivo alcanzado) se cancela el trabajo pendiente.
+
+    Con `cache` (HtmlCache) las páginas ya vistas no se vuelven a descargar y
+    todo lo descargado se guarda; con `offline=True` solo se usa la caché.
+
+    `on_done(item)` se llama (en el hilo del consumidor) cuando un item sale del
+    pipeline: al descartarse, o tras procesarse el (item, content) entregado,
+    aunque el consumidor corte la iteración justo después.
+    """
+    processes = processes or os.cpu_count() or 1
+    limiter = HostLimiter(per_host)
+    raw_queue = queue.Queue(maxsize=queue_size)
+    items = iter(items)
+    exhausted = False
+    pending_fetches = 0   # Descargas lanzadas cuyo HTML aún no ha salido de la cola
+    extracting = {}
+    closed = threading.Event()
+
+    def download(item):
+        url = item.get("link")
+        html = None
+        try:
+            html = cache.get(url) if cache is not None else None
+            if html is None and not offline:
+                html = fetch_html(url, limiter)
+                if html and cache is not None and not closed.is_set():
+                    cache.put(url, html, meta=item)
+        except Exception as e:
+            print(f"  ⚠️  Error en caché para {url}: {e}")
+        while not closed.is_set():
+            try:
+                raw_queue.put((item, html), timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    fetch_pool = ThreadPoolExecutor(max_workers=max_workers)
+    extract_pool = ProcessPoolExecutor(max_workers=processes)
+    try:
+        while True:
+            # 1. Alimentar la etapa de descarga (la API se pagina de forma perezosa)
+            while not exhausted and pending_fetches < max_workers + queue_size:
+                item = next(items, None)
+                if item is None:
+                    exhausted = True
+                    break
+                fetch_pool.submit(download, item)
+                pending_fetches += 1
+
+            # 2. Pasar HTML de la cola al pool de procesos
+            while len(extracting) < 2 * processes and pending_fetches:
+                try:
+                    item, html = raw_queue.get(timeout=0 if extracting else 0.05)
+                except queue.Empty:
+                    break
+                pending_fetches -= 1
+                if html:
+                    extracting[extract_pool.submit(extract_article, html, min_words, extract_options)] = item
+                elif on_done:
+                    on_done(item)
+
+            if not extracting:
+                if exhausted and not pending_fetches:
+                    return
+                continue
+
+            # 3. Entregar extracciones terminadas
+            done, _ = wait(extracting, timeout=0.05, return_when=FIRST_COMPLETED)
+            for future in done:
+                item = extracting.pop(future)
+                content = future.result()
+                try:
+                    if content:
+                        yield item, content
+                finally:
+                    # También si el consumidor deja de iterar tras este item (objetivo alcanzado)
+                    if on_done:
+                        on_done(item)
+    finally:
+        closed.set()  # Los hilos bloqueados en la cola descartan su HTML y terminan
+        fetch_pool.shutdown(wait=False, cancel_futures=True)
+        # Se esperan (como mucho 2 * processes extracciones en curso) para que los
+        # procesos queden recogidos al volver: su CPU cuenta en RUSAGE_CHILDREN
+        extract_pool.shutdown(wait=True, cancel_futures=True)
@@ -1,41 +1,158 @@
+import argparse
 import json
+import sys
 from pathlib import Path
 
+sys.path.append(str(Path(__file__).resolve().parents[2]))  # Raíz del repo (paquete common)
+from common.id_index import IdIndex, file_fingerprint
+from common.jsonl_writer import JsonlAppender
+
 # Configuración
 REAL_NO_DUPS = Path("scraping/data_collection/real_news_no_duplicates.jsonl")
 MULTIMODAL_FILE = Path("dataset/multimodal_dataset.jsonl")
 PENDING_OUT = Path("scraping/data_collection/pending_real_news.jsonl")
+STATE_FILE = Path("scraping/data_collection/pending_state.json")
 
-def extract_pending():
-    # 1. Obtener IDs ya procesados del dataset multimodal
-    processed_ids = set()
-    if MULTIMODAL_FILE.exists():
-        with open(MULTIMODAL_FILE, "r", encoding="utf-8") as f:
-            for line in f:
-                try:
-                    data = json.loads(line)
-                    processed_ids.add(data["group_id"])
-                except: continue
+def iter_from(path, offset=0):
+    """Recorre las líneas completas a partir de `offset`: (registro, offset tras la línea)."""
+    if not path.exists():
+        return
+    with open(path, "rb") as f:
+        f.seek(offset)
+        for line in f:
+            if not line.endswith(b"\n"):
+                return  # Línea a medio escribir: se leerá en la próxima ejecución
+            offset += len(line)
+            try:
+                yield json.loads(line), offset
+            except ValueError:
+                continue
 
-    # 2. Buscar en el archivo de "No Duplicados" las que falten
-    pending_count = 0
+def _file_state(path, offset):
+    if not path.exists():
+        return {"offset": 0, "fingerprint": None}
+    return {"offset": offset, "fingerprint": file_fingerprint(path, offset)}
+
+def _is_valid(state, path):
+    """La marca de agua sirve si el fichero solo ha crecido desde la última ejecución."""
+    if not state:
+        return False
+    if not path.exists():
+        return state["offset"] == 0
+    return (path.stat().st_size >= state["offset"]
+            and file_fingerprint(path, state["offset"]) == state.get("fingerprint"))
+
+def save_state(real_offset, multimodal_offset):
+    state = {"real": _file_state(REAL_NO_DUPS, real_offset),
+             "multimodal": _file_state(MULTIMODAL_FILE, multimodal_offset)}
+    STATE_FILE.write_text(json.dumps(state, indent=2))
+
+def _write_atomic(path, records):
+    """Escribe la cola en un temporal y la sustituye de una vez: si algo falla a medias, la anterior sigue intacta."""
+    tmp = path.with_suffix(".tmp")
+    count = 0
+    with open(tmp, "w", encoding="utf-8") as f_out:
+        for data in records:
+            f_out.write(json.dumps(data, ensure_ascii=False) + "\n")
+            count += 1
+    tmp.replace(path)
+    return count
+
+def extract_pending(incremental=True):
+    """
+    Sincroniza la cola de pendientes. En modo incremental solo lee lo añadido a
+    ambos ficheros desde la última ejecución: retira de la cola las noticias
+    consumidas desde entonces y añade las nuevas aún no procesadas. Si no se ha
+    consumido nada la cola solo crece (append); si hay que retirar alguna se
+    reescribe entera de forma atómica, y quienes la leen por marca de agua
+    (StageStore, IdIndex, SimHashIndex) detectan la reescritura por su huella
+    y se reconstruyen.
+
+    La reconstrucción completa (primera vez, algún fichero reescrito, o
+    incremental=False) recalcula la cola desde cero, también de forma atómica.
+    """
     if not REAL_NO_DUPS.exists():
         print(f"Error: No se encuentra {REAL_NO_DUPS}")
         return
 
-    with open(REAL_NO_DUPS, "r", encoding="utf-8") as f_in, \
-         open(PENDING_OUT, "w", encoding="utf-8") as f_out:
-        
-        for line in f_in:
-            data = json.loads(line)
+    state = json.loads(STATE_FILE.read_text()) if STATE_FILE.exists() else {}
+    if incremental and _is_valid(state.get("real"), REAL_NO_DUPS) and \
+            _is_valid(state.get("multimodal"), MULTIMODAL_FILE):
+        return _extract_delta(state)
+    return _extract_full()
+
+def _extract_full():
+    # 1. Obtener IDs ya procesados del dataset multimodal
+    processed_ids = set()
+    multimodal_offset = 0
+    for data, multimodal_offset in iter_from(MULTIMODAL_FILE):
+        if "group_id" in data:
+            processed_ids.add(data["group_id"])
+
+    # 2. Buscar en el archivo de "No Duplicados" las que falten
+    real_offset = 0
+
+    def pending():
+        nonlocal real_offset
+        for data, real_offset in iter_from(REAL_NO_DUPS):
             if data["article_id"] not in processed_ids:
-                f_out.write(json.dumps(data, ensure_ascii=False) + "\n")
-                pending_count += 1
+                yield data
+
+    pending_count = _write_atomic(PENDING_OUT, pending())
+    save_state(real_offset, multimodal_offset)
 
-    print(f"📊 Resumen de sincronización:")
+    print("📊 Resumen de sincronización (completa):")
     print(f"   - Noticias ya procesadas: {len(processed_ids)}")
     print(f"   - Noticias pendientes encontradas: {pending_count}")
     print(f"   - Nuevo archivo creado: {PENDING_OUT}")
 
+def _extract_delta(state):
+    # 1. Grupos del dataset añadidos desde la última ejecución
+    consumed = set()
+    multimodal_offset = state["multimodal"]["offset"]
+    for data, multimodal_offset in iter_from(MULTIMODAL_FILE, multimodal_offset):
+        if "group_id" in data:
+            consumed.add(data["group_id"])
+
+    # 2. Noticias nuevas que aún no estén procesadas
+    processed_ids = IdIndex(MULTIMODAL_FILE, "group_id")
+    real_offset = state["real"]["offset"]
+    added = 0
+
+    def new_rows():
+        nonlocal real_offset, added
+        for data, real_offset in iter_from(REAL_NO_DUPS, real_offset):
+            if data["article_id"] not in processed_ids:
+                added += 1
+                yield data
+
+    # 3. Sin consumidas basta con añadir al final; si no, se reescribe sin ellas
+    dropped = 0
+    if consumed and PENDING_OUT.exists():
+        def kept_rows():
+            nonlocal dropped
+            for data, _ in iter_from(PENDING_OUT):
+                if data["article_id"] in processed_ids:
+                    dropped += 1
+                else:
+                    yield data
+            yield from new_rows()
+
+        _write_atomic(PENDING_OUT, kept_rows())
+    else:
+        with JsonlAppender(PENDING_OUT) as writer:
+            for data in new_rows():
+                writer.append(data)
+    processed_ids.close()
+    save_state(real_offset, multimodal_offset)
+
+    print("📊 Resumen de sincronización (incremental):")
+    print(f"   - Consumidas desde la última ejecución: {len(consumed)} ({dropped} retiradas de la cola)")
+    print(f"   - Nuevas pendientes añadidas: {added}")
+    print(f"   - Cola: {PENDING_OUT}")
+
 if __name__ == "__main__":
-    extract_pending()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Sincroniza la cola de noticias pendientes")
+    parser.add_argument("--full", action="store_true", help="Reconstruye la cola entera")
+    args = parser.parse_args()
+    extract_pending(incremental=not args.full)
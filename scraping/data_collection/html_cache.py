@@ -0,0 +1,157 @@
+"""
+html_cache.py
+-------------
+Caché en disco del HTML crudo de los artículos descargados.
+
+  - Los cuerpos se guardan comprimidos (gzip) y direccionados por contenido:
+    objects/<sha[:2]>/<sha>.html.gz. Dos URLs con el mismo HTML comparten objeto.
+  - Un índice SQLite (index.sqlite) mapea URL -> hash, guarda el item de la API
+    asociado y la fecha del último acceso.
+  - Cuando el tamaño comprimido total supera `max_bytes` se expulsan las URLs
+    menos usadas recientemente (LRU) y los objetos que se quedan sin referencias.
+    Si una URL se vuelve a guardar con otro HTML, el objeto anterior se borra en
+    cuanto ninguna otra URL lo usa. El tamaño total se lleva en memoria.
+
+Se guarda todo lo descargado, pase o no el filtro de extracción, para poder
+re-extraer offline con otros parámetros (ver reextract.py).
+"""
+
+import gzip
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+CACHE_DIR = Path(__file__).resolve().parent / "html_cache"
+MAX_CACHE_BYTES = 2 * 1024 ** 3  # 2 GB comprimidos
+
+
+class HtmlCache:
+    def __init__(self, root=None, max_bytes=MAX_CACHE_BYTES):
+        self.root = Path(root or CACHE_DIR)
+        self.max_bytes = max_bytes
+        (self.root / "objects").mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.root / "index.sqlite", check_same_thread=False)
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS urls (
+                url         TEXT PRIMARY KEY,
+                sha256      TEXT NOT NULL,
+                meta        TEXT,
+                last_access REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS objects (
+                sha256 TEXT PRIMARY KEY,
+                size   INTEGER NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS urls_lru ON urls(last_access);
+            CREATE INDEX IF NOT EXISTS urls_sha ON urls(sha256);
+        """)
+        with self._lock:
+            self._collect_orphans()  # Objetos que dejaron versiones antiguas de una URL
+            self._total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM objects").fetchone()[0]
+            self._db.commit()
+
+    def _object_path(self, sha):
+        return self.root / "objects" / sha[:2] / f"{sha}.html.gz"
+
+    def get(self, url):
+        """Devuelve el HTML cacheado para la URL (o None) y lo marca como reciente."""
+        if not url:
+            return None
+        with self._lock:
+            row = self._db.execute("SELECT sha256 FROM urls WHERE url = ?", (url,)).fetchone()
+            if row is None:
+                return None
+            self._db.execute("UPDATE urls SET last_access = ? WHERE url = ?", (time.time(), url))
+            self._db.commit()
+        try:
+            return gzip.decompress(self._object_path(row[0]).read_bytes()).decode("utf-8")
+        except (OSError, EOFError):
+            return None
+
+    def put(self, url, html, meta=None):
+        """Guarda el HTML de una URL junto con el item de la API que la referencia."""
+        if not url or not html:
+            return
+        data = html.encode("utf-8")
+        sha = hashlib.sha256(data).hexdigest()
+        path = self._object_path(sha)
+        with self._lock:
+            known = self._db.execute("SELECT 1 FROM objects WHERE sha256 = ?", (sha,)).fetchone()
+            if not known:
+                blob = gzip.compress(data)
+                path.parent.mkdir(exist_ok=True)
+                tmp = path.with_suffix(".tmp")
+                tmp.write_bytes(blob)
+                tmp.replace(path)
+                self._db.execute("INSERT INTO objects (sha256, size) VALUES (?, ?)", (sha, len(blob)))
+                self._total += len(blob)
+            previous = self._db.execute("SELECT sha256 FROM urls WHERE url = ?", (url,)).fetchone()
+            self._db.execute(
+                "INSERT OR REPLACE INTO urls (url, sha256, meta, last_access) VALUES (?, ?, ?, ?)",
+                (url, sha, json.dumps(meta, ensure_ascii=False) if meta else None, time.time()),
+            )
+            if previous and previous[0] != sha:
+                self._release(previous[0])  # La versión anterior de la página ya no se usa
+            self._evict()
+            self._db.commit()
+
+    def _release(self, sha):
+        """Borra el objeto si ninguna URL lo referencia (con el lock tomado)."""
+        if self._db.execute("SELECT 1 FROM urls WHERE sha256 = ? LIMIT 1", (sha,)).fetchone():
+            return
+        row = self._db.execute("SELECT size FROM objects WHERE sha256 = ?", (sha,)).fetchone()
+        self._db.execute("DELETE FROM objects WHERE sha256 = ?", (sha,))
+        self._object_path(sha).unlink(missing_ok=True)
+        if row:
+            self._total -= row[0]
+
+    def _collect_orphans(self):
+        orphans = self._db.execute("""
+            SELECT sha256 FROM objects WHERE NOT EXISTS (SELECT 1 FROM urls WHERE urls.sha256 = objects.sha256)
+        """).fetchall()
+        for (sha,) in orphans:
+            self._db.execute("DELETE FROM objects WHERE sha256 = ?", (sha,))
+            self._object_path(sha).unlink(missing_ok=True)
+
+    def _evict(self):
+        """Expulsa URLs por LRU hasta quedar por debajo de max_bytes (con el lock tomado)."""
+        if self._total <= self.max_bytes:
+            return
+        while self._total > self.max_bytes:
+            victims = self._db.execute("SELECT url, sha256 FROM urls ORDER BY last_access LIMIT 256").fetchall()
+            if not victims:
+                break
+            for url, sha in victims:
+                if self._total <= self.max_bytes:
+                    break
+                self._db.execute("DELETE FROM urls WHERE url = ?", (url,))
+                self._release(sha)
+
+    def iter_entries(self, page_size=500):
+        """Recorre la caché sin tocar la red: (url, html, item de la API o None)."""
+        last = ""
+        while True:
+            with self._lock:
+                rows = self._db.execute("SELECT url, sha256, meta FROM urls WHERE url > ? ORDER BY url LIMIT ?",
+                                        (last, page_size)).fetchall()
+            if not rows:
+                return
+            for url, sha, meta in rows:
+                try:
+                    html = gzip.decompress(self._object_path(sha).read_bytes()).decode("utf-8")
+                except (OSError, EOFError):
+                    continue
+                yield url, html, json.loads(meta) if meta else None
+            last = rows[-1][0]
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM urls").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._db.close()
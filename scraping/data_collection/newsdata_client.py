@@ -0,0 +1,140 @@
+"""
+newsdata_client.py
+------------------
+Planificador de peticiones a la API de NewsData.io consciente de la cuota.
+
+  - Token bucket con la ventana del plan (por defecto 30 créditos / 15 min) y
+    un presupuesto total de créditos por ejecución.
+  - Backoff adaptativo ante 429 y 5xx (respeta Retry-After); la pausa es
+    global, así que todos los hilos de categoría frenan a la vez.
+  - Una única `requests.Session` con pool de conexiones (keep-alive).
+  - Contabiliza créditos usados y los reporta por noticia nueva.
+"""
+
+import os
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+API_URL = os.getenv("NEWSDATA_API_URL", "https://newsdata.io/api/1/latest")
+
+MAX_CREDITS = 200        # Créditos por ejecución (plan gratuito: 200/día)
+WINDOW_CREDITS = 30      # Créditos permitidos por ventana
+WINDOW_SECONDS = 15 * 60 # Duración de la ventana
+MAX_RETRIES = 6
+BASE_BACKOFF = 2.0       # Segundos; se duplica en cada reintento
+MAX_BACKOFF = 300.0
+
+
+class NewsDataScheduler:
+    def __init__(self, credits=MAX_CREDITS, window_credits=WINDOW_CREDITS, window_seconds=WINDOW_SECONDS,
+                 max_retries=MAX_RETRIES, api_url=API_URL, pool_size=16):
+        self.api_url = api_url
+        self.max_retries = max_retries
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+        self._lock = threading.Lock()
+        self.remaining = credits
+        self._capacity = window_credits
+        self._tokens = float(window_credits)
+        self._rate = window_credits / window_seconds
+        self._last_refill = time.monotonic()
+        self._pause_until = 0.0
+        self._backoff = BASE_BACKOFF
+
+        # Estadísticas
+        self.credits_used = 0
+        self.requests = 0
+        self.throttled = 0
+        self.server_errors = 0
+
+    # ── Token bucket ────────────────────────────────────────────────
+    def _acquire(self):
+        """Bloquea hasta tener un crédito disponible. False si se agotó el presupuesto."""
+        while True:
+            with self._lock:
+                if self.remaining <= 0:
+                    return False
+                now = time.monotonic()
+                self._tokens = min(self._capacity, self._tokens + (now - self._last_refill) * self._rate)
+                self._last_refill = now
+                wait = self._pause_until - now
+                if wait <= 0 and self._tokens >= 1:
+                    self._tokens -= 1
+                    self.remaining -= 1
+                    return True
+                if wait <= 0:
+                    wait = (1 - self._tokens) / self._rate
+            time.sleep(min(wait, 5.0))
+
+    def _refund(self):
+        """Devuelve el crédito y su hueco en la ventana: la petición no llegó a gastarlo."""
+        with self._lock:
+            self.remaining += 1
+            self._tokens = min(self._capacity, self._tokens + 1)
+
+    def _throttle(self, retry_after=None):
+        """Pausa global con backoff exponencial (o el Retry-After del servidor)."""
+        with self._lock:
+            delay = float(retry_after) if retry_after else self._backoff * (1 + random.random() * 0.25)
+            self._pause_until = max(self._pause_until, time.monotonic() + delay)
+            self._backoff = min(self._backoff * 2, MAX_BACKOFF)
+        return delay
+
+    # ── Petición ────────────────────────────────────────────────────
+    def latest(self, params):
+        """
+        GET /latest con la apikey del entorno. Devuelve el JSON o None si el
+        presupuesto se agota, se acaban los reintentos o el error no es recuperable.
+        """
+        params = dict(params, apikey=os.getenv("NEWSDATA_API_KEY"))
+        for attempt in range(self.max_retries + 1):
+            if not self._acquire():
+                print("Presupuesto de créditos agotado.")
+                return None
+            try:
+                resp = self.session.get(self.api_url, params=params, timeout=30)
+            except requests.RequestException as e:
+                self._refund()
+                print(f"Error de red ({e}); reintentando en {self._throttle():.0f}s")
+                continue
+
+            with self._lock:
+                self.requests += 1
+            if resp.status_code == 200:
+                with self._lock:
+                    self.credits_used += 1
+                    self._backoff = BASE_BACKOFF
+                return resp.json()
+
+            self._refund()  # Las respuestas de error no consumen crédito
+            if resp.status_code == 429 or resp.status_code >= 500:
+                with self._lock:
+                    if resp.status_code == 429:
+                        self.throttled += 1
+                    else:
+                        self.server_errors += 1
+                retry_after = resp.headers.get("Retry-After")
+                if retry_after and not retry_after.isdigit():
+                    retry_after = None
+                delay = self._throttle(retry_after)
+                print(f"HTTP {resp.status_code} (intento {attempt + 1}); esperando {delay:.0f}s")
+                continue
+
+            print(f"Error {resp.status_code}: {resp.text}")
+            return None
+
+        print("Demasiados reintentos contra la API.")
+        return None
+
+    def report(self, new_articles):
+        per_article = self.credits_used / new_articles if new_articles else float("inf")
+        print(f"Créditos usados: {self.credits_used} ({self.requests} peticiones, "
+              f"{self.throttled} x 429, {self.server_errors} x 5xx). "
+              f"Noticias nuevas: {new_articles} -> {per_article:.2f} créditos/noticia")
@@ -0,0 +1,128 @@
+"""
+prefetch_screen.py
+------------------
+Filtro de duplicados ANTES de descargar el artículo.
+
+Las agencias (AP, Reuters, AFP...) sindican la misma noticia en decenas de
+medios, cada una con su propio article_id, así que el control por ID no las
+detecta y se paga la descarga + trafilatura para acabar borrándolas después en
+EDA/dataCleaningByTitle.py. Aquí se comparan dos claves baratas contra un
+índice persistente (SQLite):
+
+  - Título normalizado: minúsculas, sin acentos ni puntuación y sin el sufijo
+    del medio (" - Reuters", " | AP News"). Solo para títulos de >= 4 palabras,
+    para no colisionar con titulares genéricos ("Live updates").
+  - URL canónica: sin esquema, "www."/"m."/"amp.", parámetros de tracking,
+    fragmento, "/amp" final ni barra final.
+
+Las claves de los items en vuelo se reservan en memoria; se persisten con
+add() cuando el artículo se guarda y se liberan con release() al salir del
+pipeline, de modo que si una copia falla la extracción otra puede entrar.
+"""
+
+import json
+import re
+import sqlite3
+import unicodedata
+from pathlib import Path
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+MIN_TITLE_WORDS = 4
+TRACKING_PARAMS = {"fbclid", "gclid", "mc_cid", "mc_eid", "ref", "ref_src", "cmpid", "ocid", "taid", "smid"}
+SOURCE_SUFFIX = re.compile(r"\s+[-|–—:]\s+[^-|–—:]{2,40}$")
+
+
+def normalize_title(title):
+    if not title:
+        return None
+    title = SOURCE_SUFFIX.sub("", title.strip())
+    title = unicodedata.normalize("NFKD", title).encode("ascii", "ignore").decode("ascii").lower()
+    words = re.sub(r"[^a-z0-9]+", " ", title).split()
+    return " ".join(words) if len(words) >= MIN_TITLE_WORDS else None
+
+
+def canonical_url(url):
+    if not url:
+        return None
+    parts = urlsplit(url.strip())
+    host = parts.netloc.lower().split("@")[-1]
+    host = re.sub(r":(80|443)$", "", host)
+    host = re.sub(r"^(www\d*|m|amp|mobile)\.", "", host)
+    path = re.sub(r"/amp/?$", "", parts.path) or "/"
+    path = path.rstrip("/") or "/"
+    query = [(k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+             if not k.lower().startswith("utm_") and k.lower() not in TRACKING_PARAMS]
+    canon = host + path
+    if query:
+        canon += "?" + urlencode(sorted(query))
+    return canon
+
+
+class PrefetchScreen:
+    def __init__(self, index_path, seed_jsonl=None):
+        self.index_path = Path(index_path)
+        is_new = not self.index_path.exists()
+        self._db = sqlite3.connect(self.index_path)
+        self._db.execute("CREATE TABLE IF NOT EXISTS seen (kind TEXT, key TEXT, PRIMARY KEY (kind, key)) WITHOUT ROWID")
+        self._claims = {}   # (kind, key) -> nº de items en vuelo que la reservan
+        self.skipped = {"title": 0, "url": 0}
+        if is_new and seed_jsonl:
+            self._seed(Path(seed_jsonl))
+
+    def _seed(self, jsonl_path):
+        """Primera ejecución: carga los títulos ya guardados (el JSONL no guarda la URL)."""
+        if not jsonl_path.exists():
+            return
+        with open(jsonl_path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    title = normalize_title(json.loads(line).get("title"))
+                except ValueError:
+                    continue
+                if title:
+                    self._db.execute("INSERT OR IGNORE INTO seen VALUES ('title', ?)", (title,))
+        self._db.commit()
+
+    @staticmethod
+    def _keys(item):
+        keys = []
+        title = normalize_title(item.get("title"))
+        if title:
+            keys.append(("title", title))
+        url = canonical_url(item.get("link"))
+        if url:
+            keys.append(("url", url))
+        return keys
+
+    def is_duplicate(self, item):
+        """True si el item coincide con algo guardado o en vuelo; si no, reserva sus claves."""
+        keys = self._keys(item)
+        for kind, key in keys:
+            if (kind, key) in self._claims or self._db.execute(
+                    "SELECT 1 FROM seen WHERE kind = ? AND key = ?", (kind, key)).fetchone():
+                self.skipped[kind] += 1
+                return True
+        for k in keys:
+            self._claims[k] = self._claims.get(k, 0) + 1
+        return False
+
+    def add(self, item):
+        """Persiste las claves de un artículo guardado."""
+        self._db.executemany("INSERT OR IGNORE INTO seen VALUES (?, ?)", self._keys(item))
+
+    def release(self, item):
+        """Libera las reservas en memoria de un item que ha salido del pipeline."""
+        for k in self._keys(item):
+            n = self._claims.get(k, 0) - 1
+            if n > 0:
+                self._claims[k] = n
+            else:
+                self._claims.pop(k, None)
+
+    def report(self):
+        print(f"Duplicados evitados antes de descargar: {self.skipped['title']} por título, "
+              f"{self.skipped['url']} por URL")
+
+    def close(self):
+        self._db.commit()
+        self._db.close()
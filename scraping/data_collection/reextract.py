@@ -0,0 +1,68 @@
+"""
+reextract.py
+------------
+Re-ejecuta la extracción de trafilatura sobre el HTML cacheado (html_cache/)
+sin tocar la red. Sirve para ajustar parámetros de extracción o el filtro de
+longitud en local y regenerar un JSONL con el mismo esquema que los colectores.
+"""
+
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from pathlib import Path
+
+from fetcher import extract_article, MIN_WORDS
+from html_cache import HtmlCache
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+OUTPUT_FILE = SCRIPT_DIR / "reextracted_news.jsonl"
+CHUNK_SIZE = 512  # Páginas enviadas al pool de una vez
+
+
+def _chunks(iterable, size):
+    it = iter(iterable)
+    while chunk := list(islice(it, size)):
+        yield chunk
+
+
+def reextract(output_file=OUTPUT_FILE, min_words=MIN_WORDS, extract_options=None, processes=None,
+              chunk_size=CHUNK_SIZE):
+    cache = HtmlCache()
+    # Se recorre la caché por trozos: en memoria solo hay `chunk_size` páginas a la vez
+    entries = ((html, item) for _, html, item in cache.iter_entries() if item)
+
+    seen = kept = 0
+    with ProcessPoolExecutor(max_workers=processes or os.cpu_count()) as pool, \
+         open(output_file, "w", encoding="utf-8") as f_out:
+        for chunk in _chunks(entries, chunk_size):
+            seen += len(chunk)
+            contents = pool.map(extract_article, (html for html, _ in chunk),
+                                [min_words] * len(chunk), [extract_options] * len(chunk),
+                                chunksize=16)
+            for (_, item), content in zip(chunk, contents):
+                if not content:
+                    continue
+                entry = {
+                    "article_id": item.get("article_id"),
+                    "title": item.get("title"),
+                    "content": content,
+                    "word_count": len(content.split()),
+                    "image_url": item.get("image_url"),
+                    "category": item.get("category")[0] if item.get("category") else "general",
+                    "source": item.get("source_id"),
+                    "pub_date": item.get("pubDate"),
+                    "is_real": True
+                }
+                f_out.write(json.dumps(entry, ensure_ascii=False) + "\n")
+                kept += 1
+    cache.close()
+
+    print(f"Páginas en caché con metadatos: {seen}")
+    print(f"Artículos que pasan el filtro (>= {min_words} palabras): {kept}")
+    print(f"Resultado: {output_file}")
+
+
+if __name__ == "__main__":
+    # Ejemplo: probar un filtro más laxo y la extracción con tablas desactivadas
+    reextract(min_words=250, extract_options={"include_tables": False})
@@ -1,12 +1,18 @@
 import trafilatura
+from html_cache import HtmlCache
 
-def get_full_content(url):
-    downloaded = trafilatura.fetch_url(url)
+def get_full_content(url, cache=None):
+    # Con caché solo se descarga la primera vez
+    downloaded = cache.get(url) if cache is not None else None
+    if downloaded is None:
+        downloaded = trafilatura.fetch_url(url)
+        if cache is not None:
+            cache.put(url, downloaded)
     # Esto extrae el cuerpo de la noticia limpio, sin anuncios ni menús
     return trafilatura.extract(downloaded)
 
 if __name__ == "__main__":
     # Ejemplo con tu primer resultado
     url_ejemplo = "https://www.automotiveworld.com/news/sk-keyfoundry-targets-automotive-with-bcd-tech/"
-    contenido_real = get_full_content(url_ejemplo)
-    print(contenido_real[:500])
\ No newline at end of file
+    contenido_real = get_full_content(url_ejemplo, cache=HtmlCache())
+    print(contenido_real[:500])
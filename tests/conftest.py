@@ -0,0 +1,15 @@
+"""
+conftest.py
+-----------
+Los scripts del repo no son un paquete instalable: cada carpeta importa a sus
+vecinos por nombre (generation/, scraping/data_collection/, EDA/) y `common`
+desde la raíz. Aquí se replican esas rutas para poder importarlos en los tests.
+"""
+
+import sys
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+for path in (ROOT_DIR, ROOT_DIR / "generation", ROOT_DIR / "scraping" / "data_collection", ROOT_DIR / "EDA"):
+    if str(path) not in sys.path:
+        sys.path.append(str(path))
@@ -0,0 +1,96 @@
+import json
+
+from pydantic import BaseModel
+
+import batch_jobs
+
+
+class Title(BaseModel):
+    headline: str
+
+
+def _requests(*keys):
+    return [batch_jobs.build_request(k, f"title for {k}", Title, 64) for k in keys]
+
+
+def test_submit_wait_results(tmp_path):
+    backend = batch_jobs.LocalBatchBackend(tmp_path / "backend")
+    [manifest] = batch_jobs.submit(backend, "titles", _requests("a", "b"), "m", jobs_dir=tmp_path)
+    assert batch_jobs.wait(backend, manifest, poll_interval=0, jobs_dir=tmp_path) == batch_jobs.SUCCEEDED
+    parsed = batch_jobs.results(backend, manifest, Title)
+    assert sorted(parsed) == ["a", "b"] and all(isinstance(v, Title) for v in parsed.values())
+
+    batch_jobs.mark_merged(manifest, jobs_dir=tmp_path)
+    assert batch_jobs.pending("titles", backend, jobs_dir=tmp_path) == []
+
+
+def test_names_do_not_collide_within_a_second(tmp_path):
+    backend = batch_jobs.LocalBatchBackend(tmp_path / "backend")
+    first = batch_jobs.submit(backend, "titles", _requests("a"), "m", jobs_dir=tmp_path)
+    second = batch_jobs.submit(backend, "titles", _requests("b"), "m", jobs_dir=tmp_path)
+    assert first[0]["name"] != second[0]["name"]
+    assert len(batch_jobs.pending("titles", backend, jobs_dir=tmp_path)) == 2
+
+
+def test_wait_gives_up_at_the_deadline(tmp_path):
+    backend = batch_jobs.LocalBatchBackend(tmp_path / "backend", turnaround=3600)
+    [manifest] = batch_jobs.submit(backend, "titles", _requests("a"), "m", jobs_dir=tmp_path)
+    state = batch_jobs.wait(backend, manifest, poll_interval=0.01, jobs_dir=tmp_path, timeout=0.05)
+    assert state == batch_jobs.RUNNING
+    assert [m["name"] for m in batch_jobs.pending("titles", backend, jobs_dir=tmp_path)] == [manifest["name"]]
+
+
+class CrashAfterSubmit(Exception):
+    pass
+
+
+class CountingBackend(batch_jobs.LocalBatchBackend):
+    def __init__(self, root, crash=False):
+        super().__init__(root)
+        self.crash = crash
+        self.submitted = 0
+
+    def submit(self, job_file, model, display_name):
+        job_id = super().submit(job_file, model, display_name)
+        self.submitted += 1
+        if self.crash:
+            raise CrashAfterSubmit()  # El trabajo llegó pero el id no se guardó
+        return job_id
+
+
+def test_crash_between_submit_and_record_reattaches(tmp_path):
+    backend = CountingBackend(tmp_path / "backend", crash=True)
+    try:
+        batch_jobs.submit(backend, "titles", _requests("a"), "m", jobs_dir=tmp_path)
+    except CrashAfterSubmit:
+        pass
+    [saved] = [json.loads(p.read_text()) for p in tmp_path.glob("titles-*.json")]
+    assert saved["state"] == batch_jobs.SUBMITTING and saved["job_id"] is None
+
+    backend = CountingBackend(tmp_path / "backend")
+    [manifest] = batch_jobs.pending("titles", backend, jobs_dir=tmp_path)
+    assert backend.submitted == 0 and manifest["job_id"] == f"local-{manifest['name']}"
+    assert batch_jobs.wait(backend, manifest, poll_interval=0, jobs_dir=tmp_path) == batch_jobs.SUCCEEDED
+
+
+def test_crash_before_submit_sends_on_resume(tmp_path):
+    backend = CountingBackend(tmp_path / "backend")
+    backend.submit = lambda *a: (_ for _ in ()).throw(CrashAfterSubmit())  # Muere antes de enviar
+    try:
+        batch_jobs.submit(backend, "titles", _requests("a"), "m", jobs_dir=tmp_path)
+    except CrashAfterSubmit:
+        pass
+
+    backend = CountingBackend(tmp_path / "backend")
+    [manifest] = batch_jobs.pending("titles", backend, jobs_dir=tmp_path)
+    assert backend.submitted == 1 and manifest["state"] == batch_jobs.RUNNING
+
+
+def test_on_saved_sees_each_manifest_before_it_is_sent(tmp_path):
+    backend = batch_jobs.LocalBatchBackend(tmp_path / "backend")
+    seen = []
+    batch_jobs.submit(backend, "titles", _requests("a", "b"), "m", jobs_dir=tmp_path,
+                      on_saved=lambda m: seen.append((m["name"], m["keys"], m["job_id"])))
+    [(name, keys, job_id)] = seen
+    assert keys == ["a", "b"] and job_id is None
+    assert (tmp_path / f"{name}.json").exists()
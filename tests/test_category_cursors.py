@@ -0,0 +1,75 @@
+import json
+
+import pytest
+
+pytest.importorskip("dotenv")
+pytest.importorskip("trafilatura")
+pytest.importorskip("requests")
+
+from collectorCategories import CategoryCursors
+
+
+def _page(cat, *aids):
+    return [{"article_id": aid, "crawl_category": cat} for aid in aids]
+
+
+def test_token_advances_when_page_is_resolved(tmp_path):
+    cursors = CategoryCursors(tmp_path / "tokens.json")
+    first = _page("top", "a", "b")
+    cursors.open_page("top", None, "p2", first)
+    cursors.resolve(first[0])
+    cursors.save()
+    assert json.loads((tmp_path / "tokens.json").read_text()) == {}
+    cursors.resolve(first[1])
+    cursors.save()
+    assert json.loads((tmp_path / "tokens.json").read_text()) == {"top": "p2"}
+
+
+def test_repeated_id_on_a_later_page_does_not_block_the_cursor(tmp_path):
+    cursors = CategoryCursors(tmp_path / "tokens.json")
+    first, second = _page("top", "a", "b"), _page("top", "b", "c")
+    cursors.open_page("top", None, "p2", first)
+    cursors.open_page("top", "p2", "p3", second)
+    assert second[0].get("crawl_repeat") and not first[1].get("crawl_repeat")
+
+    for item in second:          # La copia repetida no resuelve la de la primera página
+        cursors.resolve(item)
+    assert cursors._tokens == {}
+    for item in first:
+        cursors.resolve(item)
+    assert cursors._tokens == {"top": "p3"}
+
+
+def test_same_id_in_other_category_counts_separately(tmp_path):
+    cursors = CategoryCursors(tmp_path / "tokens.json")
+    top, business = _page("top", "a"), _page("business", "a")
+    cursors.open_page("top", None, "t2", top)
+    cursors.open_page("business", None, "b2", business)
+    cursors.resolve(business[0])
+    assert cursors._tokens == {"business": "b2"}
+
+
+def test_last_item_is_resolved_when_the_consumer_stops(tmp_path):
+    from fetcher import ingest_concurrently
+
+    class Cache:
+        def get(self, url):
+            return "<html><body><article><p>" + "word " * 50 + "</p></article></body></html>"
+
+    cursors = CategoryCursors(tmp_path / "tokens.json")
+    page = _page("top", "a", "b")
+    for item in page:
+        item["link"] = f"http://example.com/{item['article_id']}"
+    cursors.open_page("top", None, "p2", page)
+
+    done = []
+    pipeline = ingest_concurrently(page[:1], min_words=1, max_workers=1, processes=1,
+                                   cache=Cache(), offline=True, on_done=done.append)
+    for item, _ in pipeline:
+        break                    # Objetivo alcanzado con este item
+    pipeline.close()
+    assert done == page[:1]
+    cursors.resolve(page[1])
+    for item in done:
+        cursors.resolve(item)
+    assert cursors._tokens == {"top": "p2"}
@@ -0,0 +1,88 @@
+import json
+
+import pytest
+
+import getPendingNews
+from common.id_index import IdIndex
+
+
+def _append(path, records):
+    with open(path, "a", encoding="utf-8") as f:
+        for r in records:
+            f.write(json.dumps(r) + "\n")
+
+
+def _ids(path):
+    return [json.loads(l)["article_id"] for l in path.read_text(encoding="utf-8").splitlines()]
+
+
+@pytest.fixture
+def files(tmp_path, monkeypatch):
+    paths = {name: tmp_path / f"{name}.jsonl" for name in ("real", "multimodal", "pending")}
+    monkeypatch.setattr(getPendingNews, "REAL_NO_DUPS", paths["real"])
+    monkeypatch.setattr(getPendingNews, "MULTIMODAL_FILE", paths["multimodal"])
+    monkeypatch.setattr(getPendingNews, "PENDING_OUT", paths["pending"])
+    monkeypatch.setattr(getPendingNews, "STATE_FILE", tmp_path / "state.json")
+    return paths
+
+
+def _pair(gid):
+    return [{"group_id": gid, "is_real": 1}, {"group_id": gid, "is_real": 0}]
+
+
+def test_delta_drops_consumed_and_appends_new(files):
+    _append(files["real"], [{"article_id": a} for a in ("a", "b", "c")])
+    _append(files["multimodal"], _pair("a"))
+    getPendingNews.extract_pending()
+    assert _ids(files["pending"]) == ["b", "c"]
+
+    _append(files["multimodal"], _pair("b"))
+    _append(files["real"], [{"article_id": "d"}])
+    getPendingNews.extract_pending()
+    assert _ids(files["pending"]) == ["c", "d"]
+
+
+def test_delta_without_consumed_only_appends(files):
+    _append(files["real"], [{"article_id": a} for a in ("a", "b")])
+    getPendingNews.extract_pending()
+    before = files["pending"].read_bytes()
+
+    _append(files["real"], [{"article_id": "c"}])
+    getPendingNews.extract_pending()
+    assert files["pending"].read_bytes().startswith(before)
+    assert _ids(files["pending"]) == ["a", "b", "c"]
+
+
+def test_failed_rebuild_keeps_the_previous_queue(files):
+    _append(files["real"], [{"article_id": a} for a in ("a", "b")])
+    getPendingNews.extract_pending()
+    before = files["pending"].read_bytes()
+
+    _append(files["real"], [{"title": "sin article_id"}])
+    with pytest.raises(KeyError):
+        getPendingNews.extract_pending(incremental=False)
+    assert files["pending"].read_bytes() == before
+
+
+def test_rewritten_source_triggers_full_rebuild(files):
+    _append(files["real"], [{"article_id": a} for a in ("a", "b", "c")])
+    getPendingNews.extract_pending()
+    files["real"].write_text("")
+    _append(files["real"], [{"article_id": a} for a in ("a", "c", "x", "y")])
+    getPendingNews.extract_pending()
+    assert _ids(files["pending"]) == ["a", "c", "x", "y"]
+
+
+def test_queue_rewrite_is_detected_by_id_index(tmp_path):
+    # Reescribir la cola en su sitio (quitar una línea intermedia y añadir otras)
+    # no debe dejar la marca de agua apuntando a mitad de otras filas
+    queue = tmp_path / "pending.jsonl"
+    _append(queue, [{"article_id": f"r{i}", "content": "x" * 50} for i in range(100)])
+    IdIndex(queue, "article_id").close()
+
+    rows = [json.loads(l) for l in queue.read_text().splitlines()]
+    queue.write_text("")
+    _append(queue, rows[:80] + rows[81:] + [{"article_id": f"n{i}", "content": "y" * 50} for i in range(3)])
+    index = IdIndex(queue, "article_id")
+    assert all(f"n{i}" in index for i in range(3))
+    assert "r80" not in index
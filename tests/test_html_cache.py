@@ -0,0 +1,62 @@
+from html_cache import HtmlCache
+
+
+def _objects(root):
+    return sorted(p.name for p in (root / "objects").rglob("*.html.gz"))
+
+
+def test_replaced_versions_are_collected(tmp_path):
+    cache = HtmlCache(tmp_path)
+    for version in range(5):
+        cache.put("http://a/1", f"<html>version {version}</html>")
+    assert len(_objects(tmp_path)) == 1
+    assert cache.get("http://a/1") == "<html>version 4</html>"
+
+
+def test_shared_object_survives_replace(tmp_path):
+    cache = HtmlCache(tmp_path)
+    cache.put("http://a/1", "<html>same</html>")
+    cache.put("http://a/2", "<html>same</html>")
+    cache.put("http://a/1", "<html>new</html>")
+    assert cache.get("http://a/2") == "<html>same</html>"
+    assert len(_objects(tmp_path)) == 2
+
+
+def test_eviction_leaves_no_orphans(tmp_path):
+    cache = HtmlCache(tmp_path, max_bytes=1)
+    for version in range(5):
+        cache.put("http://a/1", "<html>" + "x" * 1000 * version + "</html>")
+    assert len(cache) == 0
+    assert _objects(tmp_path) == []
+    assert cache._total == 0
+
+
+def test_lru_and_running_total(tmp_path):
+    cache = HtmlCache(tmp_path)
+    for i in range(3):
+        cache.put(f"http://a/{i}", f"<html>{i}</html>")
+    cache.get("http://a/0")
+    sizes = {p.name: p.stat().st_size for p in (tmp_path / "objects").rglob("*.html.gz")}
+    assert cache._total == sum(sizes.values())
+
+    cache.max_bytes = cache._total - 1
+    cache.put("http://a/0", "<html>0</html>")  # Ya existe: solo dispara la expulsión
+    assert [url for url, _, _ in cache.iter_entries()] == ["http://a/0", "http://a/2"]
+
+
+def test_orphans_from_older_caches_are_collected_on_open(tmp_path):
+    cache = HtmlCache(tmp_path)
+    cache.put("http://a/1", "<html>old</html>")
+    cache._db.execute("DELETE FROM urls")
+    cache._db.commit()
+    cache.close()
+    reopened = HtmlCache(tmp_path)
+    assert _objects(tmp_path) == [] and reopened._total == 0
+
+
+def test_iter_entries_pages(tmp_path):
+    cache = HtmlCache(tmp_path)
+    for i in range(7):
+        cache.put(f"http://a/{i}", f"<html>{i}</html>", meta={"article_id": str(i)})
+    entries = list(cache.iter_entries(page_size=3))
+    assert [item["article_id"] for _, _, item in entries] == [str(i) for i in range(7)]
@@ -0,0 +1,57 @@
+import json
+
+from common.id_index import IdIndex
+
+
+def _append(path, *ids, key="article_id"):
+    with open(path, "a", encoding="utf-8") as f:
+        for i in ids:
+            f.write(json.dumps({key: i, "content": f"body {i}"}) + "\n")
+
+
+def test_small_file_growth_reads_only_the_delta(tmp_path, capsys):
+    path = tmp_path / "news.jsonl"
+    _append(path, "a", "b")
+    IdIndex(path, "article_id").close()
+    capsys.readouterr()
+
+    _append(path, "c")
+    index = IdIndex(path, "article_id")
+    assert "Reconstruyendo" not in capsys.readouterr().out
+    assert all(i in index for i in "abc") and "d" not in index
+    assert len(index) == 3
+
+
+def test_rewrite_rebuilds(tmp_path):
+    path = tmp_path / "news.jsonl"
+    _append(path, "a", "b", "c")
+    IdIndex(path, "article_id").close()
+
+    path.write_text("")
+    _append(path, "x")
+    index = IdIndex(path, "article_id")
+    assert "x" in index and "a" not in index and len(index) == 1
+
+
+def test_partial_line_is_read_later(tmp_path):
+    path = tmp_path / "news.jsonl"
+    _append(path, "a")
+    with open(path, "a", encoding="utf-8") as f:
+        f.write('{"article_id": "b"')
+    index = IdIndex(path, "article_id")
+    assert "a" in index and "b" not in index
+    index.close()
+
+    with open(path, "a", encoding="utf-8") as f:
+        f.write("}\n")
+    assert "b" in IdIndex(path, "article_id")
+
+
+def test_unconfirmed_adds_are_recovered_from_the_file(tmp_path):
+    path = tmp_path / "news.jsonl"
+    index = IdIndex(path, "article_id")
+    index.add("a")
+    index._db.rollback()  # El proceso murió antes de close()
+    _append(path, "a")
+    index.sync()
+    assert "a" in index and None not in index
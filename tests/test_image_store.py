@@ -0,0 +1,67 @@
+from pathlib import Path
+
+import pytest
+
+from image_store import ImageStore, mime_type
+
+
+class FakeImage:
+    """Lo mínimo de PIL.Image que usa el almacén: save(fichero, format=..., **opciones)."""
+
+    def __init__(self, data):
+        self.data = data
+        self.saved = []
+
+    def save(self, fp, format=None, **options):
+        self.saved.append((format, options))
+        fp.write(format.encode() + b":" + self.data)
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = ImageStore(tmp_path / "fake_images", fmt="webp")
+    yield store
+    store.close()
+
+
+def test_put_and_get(store):
+    image = FakeImage(b"pixels")
+    rel = store.put("g1", image)
+
+    assert image.saved == [("WEBP", {"lossless": True})]
+    assert store.get("g1") == rel and rel.endswith(".webp")
+    assert store.resolve(rel).read_bytes() == b"WEBP:pixels"
+    assert mime_type(store.resolve(rel)) == "image/webp"
+    assert store.get("missing") is None
+
+
+def test_identical_images_share_one_file(store):
+    a = store.put("g1", FakeImage(b"same"))
+    b = store.put("g2", FakeImage(b"same"))
+    assert a == b
+    assert store.stats()["groups"] == 2 and store.stats()["unique_files"] == 1
+
+
+def test_migrate_and_resolve_legacy_paths(store):
+    (store.root / "g1_fake.png").write_bytes(b"legacy")
+
+    assert store.resolve("dataset/fake_images/g1_fake.png") == store.root / "g1_fake.png"
+    assert store.stats()["legacy_flat"] == 1
+    assert store.migrate() == 1
+    assert store.migrate() == 0
+    assert store.stats()["legacy_flat"] == 0
+
+    # El nombre antiguo sigue abriéndose (los notebooks lo usan) y es el mismo fichero del almacén
+    legacy, stored = store.root / "g1_fake.png", store.resolve(store.get("g1"))
+    assert legacy.read_bytes() == b"legacy" and stored != legacy and legacy.samefile(stored)
+    migrated = store.resolve("dataset/fake_images/g1_fake.png")
+    assert migrated.read_bytes() == b"legacy" and mime_type(migrated) == "image/png"
+    assert store.get("g2") is None
+
+
+def test_unsupported_format_fails_loudly(tmp_path):
+    with pytest.raises(ValueError):
+        ImageStore(tmp_path / "fake_images", fmt="gif")
+    assert not (tmp_path / "fake_images").exists()
+    with pytest.raises(ValueError):
+        mime_type(Path("x.bmp"))
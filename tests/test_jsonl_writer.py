@@ -0,0 +1,80 @@
+import json
+import os
+import time
+
+import pytest
+
+from common.jsonl_writer import JsonlAppender
+
+
+def _lines(path):
+    return [json.loads(l) for l in path.read_text(encoding="utf-8").splitlines()]
+
+
+def test_flush_by_count_and_close(tmp_path):
+    path = tmp_path / "out.jsonl"
+    flushes = []
+    with JsonlAppender(path, max_records=2, on_flush=lambda: flushes.append(len(_lines(path)))) as out:
+        out.append({"i": 0})
+        assert path.read_text() == ""
+        out.append({"i": 1}, {"i": 2})   # Un grupo: se escribe entero
+        out.append({"i": 3})
+    assert [r["i"] for r in _lines(path)] == [0, 1, 2, 3]
+    assert flushes == [3, 4]
+    assert not (tmp_path / "out.jsonl.pending").exists()
+
+
+def test_idle_writer_is_flushed_by_the_timer(tmp_path):
+    path = tmp_path / "out.jsonl"
+    out = JsonlAppender(path, max_records=100, max_delay=0.05)
+    out.append({"i": 0})
+    deadline = time.monotonic() + 2
+    while path.stat().st_size == 0 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert _lines(path) == [{"i": 0}]
+    out.close()
+
+
+def test_without_idle_flush_records_wait_for_append_or_close(tmp_path):
+    path = tmp_path / "out.jsonl"
+    out = JsonlAppender(path, max_records=100, max_delay=0.01, idle_flush=False)
+    out.append({"i": 0})
+    time.sleep(0.05)
+    assert path.read_text() == ""
+    out.append({"i": 1})                 # Plazo vencido: vuelca al añadir
+    assert len(_lines(path)) == 2
+    out.close()
+
+
+def test_interrupted_flush_is_rolled_back(tmp_path):
+    path = tmp_path / "out.jsonl"
+    with JsonlAppender(path) as out:
+        out.append({"i": 0})
+    size = path.stat().st_size
+    # Simula una caída a mitad de volcado: intención escrita y un par a medias
+    (tmp_path / "out.jsonl.pending").write_text(str(size))
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps({"i": 1}) + "\n" + '{"i": 2')
+
+    with JsonlAppender(path) as out:
+        out.append({"i": 3})
+    assert [r["i"] for r in _lines(path)] == [0, 3]
+
+
+def test_partial_tail_is_trimmed(tmp_path):
+    path = tmp_path / "out.jsonl"
+    path.write_text('{"i": 0}\n{"i": 1')
+    JsonlAppender(path).close()
+    assert _lines(path) == [{"i": 0}]
+
+
+@pytest.mark.skipif(not os.path.isdir("/proc/self/fd"), reason="necesita /proc")
+def test_intent_file_is_fsynced(tmp_path, monkeypatch):
+    synced = []
+    real_fsync = os.fsync
+    monkeypatch.setattr(os, "fsync", lambda fd: synced.append(os.readlink(f"/proc/self/fd/{fd}")) or real_fsync(fd))
+    path = tmp_path / "out.jsonl"
+    with JsonlAppender(path) as out:
+        out.append({"i": 0})
+    assert str(tmp_path / "out.jsonl.pending") in synced
+    assert str(tmp_path) in synced
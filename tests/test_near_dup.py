@@ -0,0 +1,69 @@
+import json
+
+import numpy as np
+import pytest
+
+from dataCleaningNearDup import NUM_PERM, LshIndex, deduplicate_near, optimal_bands
+
+
+def _candidate_probability(s, b, r):
+    return 1 - (1 - s ** r) ** b
+
+
+def test_optimal_bands_is_not_limited_to_divisors():
+    b, r = optimal_bands(0.8)
+    assert b * r <= NUM_PERM and (b, r) != (8, 16)
+    # El reparto antiguo (divisores de 128) daba (8, 16): ~20% de recall a J=0.8
+    assert _candidate_probability(0.8, b, r) > 0.6
+    assert _candidate_probability(0.9, b, r) > 0.95
+    assert _candidate_probability(0.5, b, r) < 0.02
+
+
+def test_optimal_bands_tracks_the_threshold():
+    thresholds = [(1 / b) ** (1 / r) for b, r in map(optimal_bands, (0.5, 0.7, 0.9))]
+    assert thresholds == sorted(thresholds)
+
+
+def test_bucket_keeps_every_member():
+    bands, rows = 8, 16
+    lsh = LshIndex(bands, rows)
+    a = np.arange(NUM_PERM, dtype=np.uint32)
+    b = a + 1000
+    b[:rows] = a[:rows]                  # b coincide con a solo en la banda 0
+    c = b.copy()
+    c[rows::rows] += 1                   # c se parece a b pero solo colisiona en la banda 0
+
+    assert lsh.add(lsh.keys(a), a, "a") == 0
+    assert lsh.add(lsh.keys(b), b, "b") == 1
+    assert lsh.candidates(lsh.keys(c)) == {0, 1}
+
+
+def test_index_spills_to_disk():
+    lsh = LshIndex(8, 16, max_in_memory=1)
+    sigs = [np.arange(NUM_PERM, dtype=np.uint32) + i * 1000 for i in range(3)]
+    for i, sig in enumerate(sigs):
+        lsh.add(lsh.keys(sig), sig, f"id{i}")
+    assert lsh._db is not None and len(lsh) == 3
+    assert lsh.candidates(lsh.keys(sigs[2])) == {2}
+    assert (lsh.signature(1) == sigs[1]).all() and lsh.item_id(1) == "id1"
+    lsh.close()
+
+
+@pytest.mark.parametrize("max_in_memory", [1000, 1])
+def test_deduplicate_near_end_to_end(tmp_path, max_in_memory):
+    base = " ".join(f"word{i}" for i in range(300))
+    rows = [
+        {"article_id": "a", "content": base},
+        {"article_id": "b", "content": base + " published by another agency"},
+        {"article_id": "c", "content": " ".join(f"other{i}" for i in range(300))},
+        {"article_id": "d", "content": ""},
+    ]
+    src, out, report = tmp_path / "in.jsonl", tmp_path / "out.jsonl", tmp_path / "report.jsonl"
+    lines = [json.dumps(r) + "\n" for r in rows]
+    lines.insert(2, '{"article_id": "broken", "content": \n')   # Línea cortada: se omite
+    src.write_text("".join(lines), encoding="utf-8")
+
+    deduplicate_near(src, out, report, processes=1, max_in_memory=max_in_memory)
+    assert [json.loads(l)["article_id"] for l in out.read_text().splitlines()] == ["a", "c", "d"]
+    cluster = json.loads(report.read_text())
+    assert cluster["kept"] == "a" and [d["id"] for d in cluster["duplicates"]] == ["b"]
@@ -0,0 +1,22 @@
+import pytest
+
+pytest.importorskip("requests")
+
+from newsdata_client import NewsDataScheduler
+
+
+def test_refund_returns_the_window_slot():
+    scheduler = NewsDataScheduler(credits=5, window_credits=2, window_seconds=3600)
+    assert scheduler._acquire() and scheduler._acquire()
+    assert scheduler._tokens < 1
+
+    scheduler._refund()
+    assert scheduler.remaining == 4
+    assert scheduler._tokens >= 1      # El siguiente _acquire no espera a que se rellene la ventana
+    assert scheduler._acquire()
+
+
+def test_budget_is_enforced():
+    scheduler = NewsDataScheduler(credits=1, window_credits=5, window_seconds=3600)
+    assert scheduler._acquire()
+    assert not scheduler._acquire()
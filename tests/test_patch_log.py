@@ -0,0 +1,30 @@
+import json
+
+from common.patch_log import append_patches, compact, iter_records, patch_path
+
+
+def _write(path, records):
+    path.write_text("".join(json.dumps(r) + "\n" for r in records), encoding="utf-8")
+
+
+def test_iter_records_applies_last_patch(tmp_path):
+    dataset = tmp_path / "multimodal_dataset.jsonl"
+    _write(dataset, [{"group_id": "a", "is_real": 1, "title": "t"},
+                     {"group_id": "a", "is_real": 0, "title": "f", "image_path": None}])
+    append_patches(dataset, [("a", 0, {"image_path": "x.png"})])
+    append_patches(dataset, [("a", 0, {"image_path": "y.png", "img_text": "c"})])
+
+    records = list(iter_records(dataset))
+    assert records[0] == {"group_id": "a", "is_real": 1, "title": "t"}
+    assert records[1]["image_path"] == "y.png" and records[1]["img_text"] == "c"
+
+
+def test_compact_is_idempotent(tmp_path):
+    dataset = tmp_path / "multimodal_dataset.jsonl"
+    _write(dataset, [{"group_id": "a", "is_real": 0, "image_path": None}])
+    append_patches(dataset, [("a", 0, {"image_path": "x.png"})])
+
+    assert compact(dataset) == 1
+    assert not patch_path(dataset).exists()
+    assert compact(dataset) == 0
+    assert [json.loads(l)["image_path"] for l in dataset.read_text().splitlines()] == ["x.png"]
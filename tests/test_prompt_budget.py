@@ -0,0 +1,64 @@
+from prompt_budget import PARAPHRASE_MAX_WORDS, PARAPHRASE_TOKEN_BUDGET, PromptBudget, split_sentences, target_words
+
+
+def _article(n=40):
+    filler = " ".join(f"word{i}" for i in range(12))
+    return " ".join(f"Sentence {i} {filler}." for i in range(n))
+
+
+def test_fit_lead_keeps_whole_leading_sentences():
+    budget = PromptBudget()
+    text = _article()
+    lead = budget.fit_lead(text, 100)
+
+    assert budget.count(lead) <= 100
+    kept = split_sentences(lead)
+    assert kept == split_sentences(text)[:len(kept)]
+    assert budget.count(budget.fit_lead(text, 100 + budget.count(kept[0]))) > budget.count(lead)
+
+
+def test_fit_lead_returns_short_text_untouched():
+    budget = PromptBudget()
+    assert budget.fit_lead("Short text. Two sentences.", 100) == "Short text. Two sentences."
+
+
+def test_fit_lead_truncates_a_single_long_sentence():
+    budget = PromptBudget()
+    text = " ".join(["palabra"] * 500) + "."
+    assert 0 < budget.count(budget.fit_lead(text, 50)) <= 50
+
+
+def test_extract_keeps_lead_and_salient_sentences():
+    budget = PromptBudget()
+    lead = ["Flood hits Valencia.", "Rescue teams arrive at dawn."]
+    noise = [f"Alpha{i} beta{i} gamma{i} delta{i}." for i in range(30)]
+    salient = "Valencia flood rescue teams evacuate Valencia flood victims."
+    text = " ".join(lead + noise[:15] + [salient] + noise[15:])
+
+    out = budget.extract(text, budget.count(" ".join(lead + [salient])) + 2)
+    assert split_sentences(out) == lead + [salient]
+
+
+def test_results_are_cached_per_group():
+    budget = PromptBudget()
+    text = _article()
+    calls = []
+    count = budget.count
+    budget.count = lambda s: calls.append(s) or count(s)
+
+    first = budget.fit_lead(text, 100, group_id="g")
+    n = len(calls)
+    assert budget.fit_lead(text, 100, group_id="g") == first
+    assert len(calls) == n                                    # acierto: no se vuelve a tokenizar
+    budget.fit_lead(text + " Extra sentence.", 100, group_id="g")
+    assert len(calls) > n                                     # el texto cambió: se recalcula
+
+
+def test_paraphrase_target_follows_the_real_article_length():
+    short, long_ = _article(20), _article(200)            # ~280 y ~2800 palabras
+    assert target_words(short) == len(short.split())
+    assert target_words(long_) == PARAPHRASE_MAX_WORDS == 800
+    # El objetivo no depende de lo que recorte el presupuesto de tokens
+    budget = PromptBudget()
+    assert budget.count(budget.fit_lead(long_)) <= PARAPHRASE_TOKEN_BUDGET == 1000
+    assert target_words(long_) > len(budget.fit_lead(long_, 100).split())
@@ -0,0 +1,51 @@
+import pytest
+
+import provider_pool
+from call_metrics import CallRecorder
+from throttle import QuotaExhausted
+
+
+class QuotaError(Exception):
+    code = 402
+
+
+class Client:
+    def __init__(self, key, fail_with=None):
+        self.key = key
+        self.fail_with = fail_with
+        self.calls = 0
+
+    def text_to_image(self, prompt, model=None):
+        self.calls += 1
+        if self.fail_with:
+            raise self.fail_with()
+        return f"{self.key}:{prompt}"
+
+
+def _pool(tmp_path, clients, **kwargs):
+    members = [provider_pool.PoolMember(c.key, c) for c in clients]
+    return provider_pool.HFPool("HF", members, recorder=CallRecorder(tmp_path / "calls.jsonl"), **kwargs)
+
+
+def test_failover_on_quota(tmp_path):
+    broke, ok = Client("a", fail_with=QuotaError), Client("b")
+    pool = _pool(tmp_path, [broke, ok])
+
+    assert pool.text_to_image(prompt="p") == "b:p"
+    assert pool.text_to_image(prompt="q") == "b:q"   # "a" sigue enfriándose
+    assert broke.calls == 1
+    assert [(r["key"], r["status"]) for r in pool.recorder.records] == [("a", 402), ("b", None), ("b", None)]
+
+
+def test_all_keys_exhausted(tmp_path):
+    pool = _pool(tmp_path, [Client("a", fail_with=QuotaError), Client("b", fail_with=QuotaError)], max_wait=0)
+    with pytest.raises(QuotaExhausted):
+        pool.text_to_image(prompt="p")
+
+
+def test_other_errors_are_not_retried(tmp_path):
+    bad = Client("a", fail_with=ValueError)
+    pool = _pool(tmp_path, [bad, Client("b", fail_with=ValueError)])
+    with pytest.raises(ValueError):
+        pool.text_to_image(prompt="p")
+    assert len(pool.recorder.records) == 1
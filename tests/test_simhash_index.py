@@ -0,0 +1,97 @@
+import json
+import random
+
+import pytest
+
+from common.simhash_index import (FP_BITS, MIN_KEY_BITS, SimHashIndex, _table_keys, hamming, simhash,
+                                  table_layout)
+
+
+def _text(seed, n=200):
+    rng = random.Random(seed)
+    return " ".join(f"w{rng.randint(0, 5000)}" for _ in range(n))
+
+
+def _append(path, rows):
+    with open(path, "a", encoding="utf-8") as f:
+        for aid, content in rows:
+            f.write(json.dumps({"article_id": aid, "content": content}) + "\n")
+
+
+def test_layout_keys_are_wide_enough():
+    for d in (1, 3, 5, 8):
+        n, tables = table_layout(d)
+        t = len(tables[0])
+        assert n == d + t
+        assert FP_BITS * t // n >= MIN_KEY_BITS
+    n, tables = table_layout(5)
+    assert (n, len(tables)) == (7, 21)
+
+
+@pytest.mark.parametrize("flips", range(6))
+def test_every_fingerprint_within_distance_shares_a_table_key(flips):
+    n, tables = table_layout(5)
+    rng = random.Random(flips)
+    for _ in range(200):
+        fp = rng.getrandbits(FP_BITS)
+        other = fp
+        for bit in rng.sample(range(FP_BITS), flips):
+            other ^= 1 << bit
+        assert hamming(fp, other) == flips
+        assert set(enumerate(_table_keys(fp, n, tables))) & set(enumerate(_table_keys(other, n, tables)))
+
+
+def test_near_duplicate_is_found_and_unrelated_is_not(tmp_path):
+    path = tmp_path / "news.jsonl"
+    base = _text(0)
+    _append(path, [("a", base), ("b", _text(1))])
+    index = SimHashIndex(path)
+
+    match, _ = index.is_near_duplicate(base + " w1")
+    assert match == "a"
+    assert index.is_near_duplicate(_text(2))[0] is None
+
+    fp = simhash(_text(3))
+    index.add("c", fp)
+    assert index.find(fp) == "c"
+    index.close()
+
+
+def test_rejects_none_id(tmp_path):
+    index = SimHashIndex(tmp_path / "news.jsonl")
+    with pytest.raises(ValueError):
+        index.add(None, simhash("some text here"))
+
+
+def test_rows_without_id_are_not_indexed(tmp_path):
+    path = tmp_path / "news.jsonl"
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(json.dumps({"article_id": None, "content": _text(0)}) + "\n")
+    index = SimHashIndex(path)
+    assert len(index) == 0 and index.find(simhash(_text(0))) is None
+
+
+def test_old_layout_is_rebuilt(tmp_path):
+    path = tmp_path / "news.jsonl"
+    _append(path, [("a", _text(0))])
+    index = SimHashIndex(path)
+    index._set_meta(config="article_id:content:5")  # Índice creado con el reparto antiguo
+    index.close()
+    assert SimHashIndex(path).is_near_duplicate(_text(0))[0] == "a"
+
+
+def test_cleaning_reuses_the_collectors_index(tmp_path):
+    from dataCleaning import deduplicate_news
+
+    src, out = tmp_path / "real_news.jsonl", tmp_path / "cleaned.jsonl"
+    base = _text(0)
+    _append(src, [("a", base), ("b", _text(1))])
+    SimHashIndex(src).close()                      # Índice mantenido por el colector
+    _append(src, [("c", base + " w1"), ("d", _text(2))])
+
+    deduplicate_news(src, out)
+    assert [json.loads(l)["article_id"] for l in out.read_text().splitlines()] == ["a", "b", "d"]
+    assert not out.with_suffix(".simhash.sqlite").exists()
+    index = SimHashIndex(src)                      # Puesto al día con el delta, no vaciado
+    assert len(index) == 4 and set(index.find_all(simhash(base))) == {"a", "c"}
+    index.close()
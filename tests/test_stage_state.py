@@ -0,0 +1,100 @@
+import json
+
+from stage_state import StageStore
+
+
+def _append(path, records):
+    with open(path, "a", encoding="utf-8") as f:
+        for r in records:
+            f.write(json.dumps(r) + "\n")
+
+
+def _news(*ids):
+    return [{"article_id": i, "title": f"t{i}", "content": "x" * 40} for i in ids]
+
+
+def _complete_text(store, n):
+    for row in store.claim("text", limit=n):
+        gid = row["group_id"]
+        store.complete(gid, "text", real={"group_id": gid, "is_real": 1}, fake={"group_id": gid, "is_real": 0})
+
+
+def test_export_multiple_of_flush_size_twice(tmp_path):
+    source, dataset = tmp_path / "pending.jsonl", tmp_path / "multimodal_dataset.jsonl"
+    _append(source, _news(*(f"g{i:03d}" for i in range(64))))
+    store = StageStore(tmp_path / "state.sqlite")
+    store.import_source(source)
+    _complete_text(store, 64)
+
+    assert store.export(dataset) == 64      # Justo un volcado de 64 pares
+    assert store.export(dataset) == 0
+    lines = dataset.read_text().splitlines()
+    assert len(lines) == 128
+    assert len({(json.loads(l)["group_id"], json.loads(l)["is_real"]) for l in lines}) == 128
+
+
+def test_export_is_incremental(tmp_path):
+    source, dataset = tmp_path / "pending.jsonl", tmp_path / "multimodal_dataset.jsonl"
+    _append(source, _news("a", "b", "c"))
+    store = StageStore(tmp_path / "state.sqlite")
+    store.import_source(source)
+    _complete_text(store, 2)
+    assert store.export(dataset) == 2
+    _complete_text(store, 1)
+    assert store.export(dataset) == 1
+    assert [json.loads(l)["group_id"] for l in dataset.read_text().splitlines()] == ["a", "a", "b", "b", "c", "c"]
+
+
+def test_import_source_reads_only_the_delta(tmp_path):
+    source = tmp_path / "pending.jsonl"
+    _append(source, _news("a", "b"))
+    store = StageStore(tmp_path / "state.sqlite")
+    assert store.import_source(source) == 2
+    _append(source, _news("c"))
+    assert store.import_source(source) == 1
+    assert store.import_source(source) == 0
+
+
+def test_import_source_survives_in_place_rewrite(tmp_path):
+    # getPendingNews --full reescribe la cola: quitar una fila intermedia y añadir
+    # otras no puede dejar la marca de agua a mitad de filas distintas
+    source = tmp_path / "pending.jsonl"
+    rows = _news(*(f"r{i:03d}" for i in range(100)))
+    _append(source, rows)
+    store = StageStore(tmp_path / "state.sqlite")
+    assert store.import_source(source) == 100
+
+    source.write_text("")
+    _append(source, rows[:80] + rows[81:] + _news("n0", "n1", "n2"))
+    assert store.import_source(source) == 3
+    assert all(store.get(f"n{i}") for i in range(3))
+
+
+def test_running_claims_are_released_on_reopen(tmp_path):
+    source = tmp_path / "pending.jsonl"
+    _append(source, _news("a"))
+    store = StageStore(tmp_path / "state.sqlite")
+    store.import_source(source)
+    assert [r["group_id"] for r in store.claim("text")] == ["a"]
+    store.close()
+
+    store = StageStore(tmp_path / "state.sqlite")
+    assert [r["group_id"] for r in store.claim("text")] == ["a"]
+
+
+def test_batched_rows_survive_reopen_until_merged_or_cancelled(tmp_path):
+    source = tmp_path / "pending.jsonl"
+    _append(source, _news("a", "b", "c"))
+    store = StageStore(tmp_path / "state.sqlite")
+    store.import_source(source)
+    store.mark_batched("text", "job-1", [r["group_id"] for r in store.claim("text", limit=2)])
+    store.close()
+
+    store = StageStore(tmp_path / "state.sqlite")      # reinicio: lo batched no vuelve a pending
+    assert store.count("text", "batched") == 2
+    assert [r["group_id"] for r in store.claim("text")] == ["c"]
+
+    store.complete("a", "text", real={"group_id": "a", "is_real": 1}, fake={"group_id": "a", "is_real": 0})
+    assert store.release_batch("text", "job-1") == 1    # cancelado: solo queda b
+    assert store.count("text", "batched") == 0
+    assert [r["group_id"] for r in store.claim("text")] == ["b"]